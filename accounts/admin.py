@@ -1,10 +1,14 @@
 from django.contrib import admin
 
+from config.pagination import EstimatedCountPaginator
+
 from .models import User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ("email", "created_at", "updated_at")
     search_fields = ("email",)
-    ordering = ("email",)
+    ordering = ("email", "id")
     list_filter = ("created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     """Django app configuration for the accounts app."""
     name = 'accounts'
+
+    def ready(self):
+        """Register signal handlers that invalidate the user cache."""
+        from . import signals  # noqa: F401
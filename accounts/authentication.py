@@ -5,7 +5,7 @@ from rest_framework import authentication, exceptions
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import AccessToken
 
-from .models import User
+from . import cache
 
 
 class UserJWTAuthentication(authentication.BaseAuthentication):
@@ -21,18 +21,24 @@ class UserJWTAuthentication(authentication.BaseAuthentication):
         if len(auth) != 2:
             raise exceptions.AuthenticationFailed("Invalid authorization header.")
 
-        token = auth[1].decode()
-        try:
-            validated = AccessToken(token)
-        except (InvalidToken, TokenError):
-            raise exceptions.AuthenticationFailed("Invalid token.")
+        return self.authenticate_credentials(auth[1].decode())
+
+    def authenticate_credentials(self, token: str):
+        """Verify a raw access token and resolve its user, or raise."""
+        validated = cache.get_token(token)
+        if validated is None:
+            try:
+                validated = AccessToken(token)
+            except (InvalidToken, TokenError):
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            cache.remember_token(token, validated)
 
         user_id = validated.get("user_id")
         if not user_id:
             raise exceptions.AuthenticationFailed("Invalid token payload.")
 
-        user = User.objects.filter(id=user_id).first()
-        if not user:
+        user = cache.get_user(user_id)
+        if not user or user.deleted_at:
             raise exceptions.AuthenticationFailed("User not found.")
 
         return (user, validated)
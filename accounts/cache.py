@@ -0,0 +1,145 @@
+"""
+Per-process caches for authenticated users and verified access tokens.
+
+Users are cached as tuples of their column values and rebuilt into a fresh
+instance on every hit, so no two callers ever share an object.
+
+Staleness: saving or deleting a user (including marking it deleted)
+invalidates this process and the shared tier at once. Other processes keep
+their local entry until it expires: ACCOUNTS_USER_CACHE_LOCAL_TTL seconds
+when ACCOUNTS_USER_CACHE_ALIAS names a shared cache, otherwise the full
+ACCOUNTS_USER_CACHE_TTL. Within that window a deleted or deactivated user
+may still authenticate there.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+
+from .models import User
+
+USER_CACHE_SIZE = getattr(settings, "ACCOUNTS_USER_CACHE_SIZE", 1024)
+USER_CACHE_TTL = getattr(settings, "ACCOUNTS_USER_CACHE_TTL", 60)
+USER_CACHE_ALIAS = getattr(settings, "ACCOUNTS_USER_CACHE_ALIAS", "")
+USER_CACHE_LOCAL_TTL = getattr(settings, "ACCOUNTS_USER_CACHE_LOCAL_TTL", 5)
+TOKEN_CACHE_SIZE = getattr(settings, "ACCOUNTS_TOKEN_CACHE_SIZE", 4096)
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Drop a single entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+
+# With a shared tier to fall back on, the local tier only absorbs bursts, so
+# an invalidation reaches every process within USER_CACHE_LOCAL_TTL seconds.
+_users = TTLCache(USER_CACHE_SIZE, min(USER_CACHE_TTL, USER_CACHE_LOCAL_TTL) if USER_CACHE_ALIAS else USER_CACHE_TTL)
+_tokens = TTLCache(TOKEN_CACHE_SIZE, USER_CACHE_TTL)
+
+_FIELDS = [field.attname for field in User._meta.concrete_fields]
+
+
+def _shared_key(user_id: str) -> str:
+    return f"accounts:user:{user_id}"
+
+
+def _snapshot(user: User) -> tuple:
+    return tuple(getattr(user, name) for name in _FIELDS)
+
+
+def _rebuild(values: tuple) -> User:
+    return User.from_db(router.db_for_read(User), _FIELDS, values)
+
+
+def get_user(user_id: str) -> Optional[User]:
+    """
+    Return the user for an id, consulting the local and shared caches first.
+
+    Each caller gets its own instance so request code can mutate it freely.
+    Missing users are not cached, so a fresh signup is visible immediately.
+    """
+    user_id = str(user_id)
+    values = _users.get(user_id)
+    if values is None and USER_CACHE_ALIAS:
+        values = caches[USER_CACHE_ALIAS].get(_shared_key(user_id))
+        if values is not None:
+            _users.set(user_id, values)
+    if values is None:
+        user = User.objects.filter(id=user_id).first()
+        if user is None:
+            return None
+        values = _snapshot(user)
+        _users.set(user_id, values)
+        if USER_CACHE_ALIAS:
+            caches[USER_CACHE_ALIAS].set(_shared_key(user_id), values, USER_CACHE_TTL)
+    return _rebuild(values)
+
+
+def invalidate_user(user_id: str) -> None:
+    """
+    Forget a cached user in this process and in the shared cache.
+
+    Other processes only share the second tier, so their local entries
+    expire on their own (see the module docstring for how long that takes).
+    """
+    user_id = str(user_id)
+    _users.delete(user_id)
+    if USER_CACHE_ALIAS:
+        caches[USER_CACHE_ALIAS].delete(_shared_key(user_id))
+
+
+def get_token(raw_token: str) -> Optional[Any]:
+    """Return a previously verified token, or None."""
+    return _tokens.get(raw_token)
+
+
+def remember_token(raw_token: str, validated: Any) -> None:
+    """Memoize a verified token for the rest of its lifetime."""
+    remaining = validated.get("exp", 0) - time.time()
+    if remaining > 0:
+        _tokens.set(raw_token, validated, ttl=remaining)
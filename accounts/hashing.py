@@ -0,0 +1,108 @@
+"""Password hashing on a bounded executor, off the request thread."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+HASHING_EXECUTOR = getattr(settings, "PASSWORD_HASHING_EXECUTOR", "process")
+HASHING_WORKERS = getattr(settings, "PASSWORD_HASHING_WORKERS", 2)
+HASHING_MAX_PENDING = getattr(settings, "PASSWORD_HASHING_MAX_PENDING", 16)
+HASHING_TIMEOUT = getattr(settings, "PASSWORD_HASHING_TIMEOUT", 10.0)
+
+
+class HashingUnavailable(APIException):
+    """Raised when the hashing pool is saturated; maps to 503 with Retry-After."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Authentication is busy, please retry shortly."
+    default_code = "hashing_unavailable"
+    wait = 1
+
+
+def _init_worker() -> None:
+    """Load Django settings in pool processes so the configured hashers apply."""
+    import django
+
+    django.setup()
+
+
+def _hash(raw_password: str) -> str:
+    return make_password(raw_password)
+
+
+def _verify(raw_password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+    upgraded = []
+    is_valid = check_password(
+        raw_password, encoded, setter=lambda raw: upgraded.append(make_password(raw))
+    )
+    return is_valid, (upgraded[0] if upgraded else None)
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASHING_MAX_PENDING)
+
+
+def get_executor() -> Executor:
+    """
+    Return the shared hashing executor, creating it on first use.
+
+    The default process pool keeps CPU-heavy hashers from holding the GIL
+    of the worker serving requests; ``thread`` is available where forking
+    is undesirable.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if HASHING_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(
+                    max_workers=HASHING_WORKERS, thread_name_prefix="password-hashing"
+                )
+            else:
+                _executor = ProcessPoolExecutor(
+                    max_workers=HASHING_WORKERS, initializer=_init_worker
+                )
+        return _executor
+
+
+def _run(fn, *args):
+    """Submit work if a slot is free and wait for it, or raise HashingUnavailable."""
+    if not _slots.acquire(blocking=False):
+        raise HashingUnavailable()
+    try:
+        future = get_executor().submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=HASHING_TIMEOUT)
+    except FutureTimeoutError:
+        # Work still queued is dropped, which frees its slot through the done
+        # callback; work already running keeps its slot until it finishes, as
+        # it still occupies a pool worker.
+        future.cancel()
+        raise HashingUnavailable()
+
+
+def hash_password(raw_password: str) -> str:
+    """Hash a password with the default hasher."""
+    return _run(_hash, raw_password)
+
+
+def verify_password(raw_password: str, encoded: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password against its stored hash.
+
+    Returns (is_valid, upgraded_hash). ``upgraded_hash`` is set when the
+    password is correct but was stored with an outdated hasher or work
+    factor, so the caller can persist the new hash.
+    """
+    return _run(_verify, raw_password, encoded)
@@ -0,0 +1,63 @@
+"""ASGI middleware that authenticates WebSocket handshakes with a JWT."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import exceptions
+
+from .authentication import UserJWTAuthentication
+
+TOKEN_QUERY_PARAM = "token"
+TOKEN_SUBPROTOCOL = "bearer"
+
+
+def _extract_token(scope: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (token, subprotocol) from the handshake.
+
+    Browsers cannot set headers on WebSocket requests, so the token comes
+    either from ``?token=`` or from ``Sec-WebSocket-Protocol: bearer, <token>``.
+    In the latter case the server must echo ``bearer`` back when accepting.
+    """
+    subprotocols = scope.get("subprotocols") or []
+    if len(subprotocols) >= 2 and subprotocols[0].lower() == TOKEN_SUBPROTOCOL:
+        return subprotocols[1], subprotocols[0]
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if values := query.get(TOKEN_QUERY_PARAM):
+        return values[0], None
+    return None, None
+
+
+@database_sync_to_async
+def _resolve_user(token: str):
+    """Validate the token and load its user through the accounts cache."""
+    user, _ = UserJWTAuthentication().authenticate_credentials(token)
+    return user
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Populate ``scope["user"]`` once per connection from a UserJWTAuthentication token.
+
+    Connections without a token stay anonymous. A token that fails
+    validation sets ``scope["auth_error"]`` so the consumer can refuse the
+    handshake; message frames never repeat this work.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        token, subprotocol = _extract_token(scope)
+        scope["user"] = AnonymousUser()
+        if token:
+            try:
+                scope["user"] = await _resolve_user(token)
+                scope["auth_subprotocol"] = subprotocol
+            except exceptions.AuthenticationFailed:
+                scope["auth_error"] = True
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 15:57
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from config.migration_operations import PortableAddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built CONCURRENTLY on PostgreSQL, outside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0002_user_deleted_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PortableAddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['email', 'id'], name='users_email_id_idx'),
+        ),
+        PortableAddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('email', models.TextField())), name='gin_trgm_ops'), name='users_email_trgm'),
+        ),
+    ]
@@ -1,7 +1,21 @@
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
-from django.db.models.functions import Lower
+from django.db.models.functions import Cast, Lower, Upper
+
+
+# Name of the case-insensitive unique index on users.email.
+EMAIL_UNIQUE_CONSTRAINT = "users_email_ci_unique"
+
+
+class UserQuerySet(models.QuerySet):
+    """Query helpers for accounts.User."""
+
+    def by_email(self, email: str):
+        """Match email case-insensitively through the Lower("email") unique index."""
+        return self.alias(email_ci=Lower("email")).filter(email_ci=email.lower())
+
 
 class User(models.Model):
     """Application user stored separately from Django's built-in auth user."""
@@ -12,12 +26,28 @@ class User(models.Model):
     phone = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+    # Set while a purge_account run owns this deleted account (accounts.tasks).
+    purge_lease_until = models.DateTimeField(blank=True, null=True)
+
+    objects = UserQuerySet.as_manager()
 
     class Meta:
         db_table = "users"
         constraints = [
-            models.UniqueConstraint(Lower("email"), name="users_email_ci_unique"),
+            models.UniqueConstraint(Lower("email"), name=EMAIL_UNIQUE_CONSTRAINT),
         ]
+        indexes = [
+            # Admin change list order.
+            models.Index(fields=["email", "id"], name="users_email_id_idx"),
+            # Trigram index on the expression PostgreSQL evaluates for email__icontains.
+            GinIndex(OpClass(Upper(Cast("email", models.TextField())), name="gin_trgm_ops"), name="users_email_trgm"),
+        ]
+
+    @property
+    def is_authenticated(self) -> bool:
+        """Always True so DRF and Channels treat a resolved user as logged in."""
+        return True
 
     def __str__(self) -> str:
         """Human-readable label for admin lists and logs."""
@@ -11,14 +11,6 @@ class RegisterSerializer(serializers.Serializer):
     password = serializers.CharField(min_length=8, write_only=True)
     phone = serializers.CharField(required=False, allow_blank=True, write_only=True)
 
-    def validate_email(self, value: str) -> str:
-        """Reject duplicate emails to preserve unique login identity."""
-        from .models import User
-
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("Email is already registered.")
-        return value
-
     def validate_password(self, value: str) -> str:
         """Enforce Django's password strength rules."""
         try:
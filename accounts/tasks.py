@@ -0,0 +1,103 @@
+"""Background jobs for the accounts app."""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.archive import ChatArchive
+from chat.constants import FILE_PATH_PREFIX
+from chat.data import ChatCollection, MessageCollection
+from chat.models import Chat
+from config.celery import app
+from forms import gcp_storage
+from forms.models import Form
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = getattr(settings, "ACCOUNTS_PURGE_BATCH_SIZE", 500)
+PURGE_LEASE = timedelta(seconds=getattr(settings, "ACCOUNTS_PURGE_LEASE_SECONDS", 1800))
+
+
+def _unleased(now):
+    return Q(purge_lease_until__isnull=True) | Q(purge_lease_until__lt=now)
+
+
+def _purge_chats(user_id: str) -> None:
+    """Delete the user's Mongo chats, their messages, archives and response files, batch by batch."""
+    while chat_ids := ChatCollection.find_user_chat_ids(user_id, limit=PURGE_BATCH_SIZE):
+        # Children first: a crash mid-batch leaves the chat documents in
+        # place, so the next run finds and finishes the same batch.
+        MessageCollection.delete_for_chats(chat_ids)
+        ChatArchive.delete_for_chats(chat_ids)
+        for chat_id in chat_ids:
+            _purge_storage(f"{FILE_PATH_PREFIX}/{chat_id}/")
+        ChatCollection.delete_chats(chat_ids)
+
+
+def _purge_storage(prefix: str) -> None:
+    try:
+        gcp_storage.delete_prefix(prefix=prefix)
+    except ValueError:
+        # No bucket configured (local development): nothing was uploaded.
+        logger.debug("Skipping storage purge, bucket not configured: prefix=%s", prefix)
+
+
+def _delete_in_chunks(queryset) -> None:
+    """Delete a queryset PURGE_BATCH_SIZE rows at a time to keep transactions short."""
+    while ids := list(queryset.values_list("pk", flat=True)[:PURGE_BATCH_SIZE]):
+        queryset.model.objects.filter(pk__in=ids).delete()
+
+
+@app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    max_retries=5,
+)
+def purge_account(user_id: str) -> None:
+    """
+    Remove everything owned by an account marked with ``deleted_at``.
+
+    Every step deletes whatever is still there, so the task is idempotent
+    and resumes where a failed or interrupted run stopped. The user row
+    goes last; once it is gone the task is a no-op.
+
+    A run first claims the account's purge lease with a conditional UPDATE,
+    so duplicate copies (the hourly sweep, a redelivery) skip an account
+    that is already being purged. A failure releases the lease before the
+    bounded retry; once retries run out, the sweep starts over.
+    """
+    now = timezone.now()
+    claimed = User.objects.filter(_unleased(now), id=user_id, deleted_at__isnull=False).update(
+        purge_lease_until=now + PURGE_LEASE
+    )
+    if not claimed:
+        return
+    user = User.objects.get(id=user_id)
+
+    try:
+        _purge_chats(user_id)
+        _purge_storage(f"forms/{user_id}/")
+        _delete_in_chunks(Form.objects.filter(user_id=user_id))
+        _delete_in_chunks(Chat.objects.filter(user_id=user_id))
+    except Exception:
+        User.objects.filter(id=user_id).update(purge_lease_until=None)
+        raise
+    user.delete()
+    logger.info("Purged account: user_id=%s", user_id)
+
+
+@app.task
+def purge_deleted_accounts() -> None:
+    """Re-enqueue purges for deleted accounts no run holds (scheduled by celery beat)."""
+    deleted = User.objects.filter(_unleased(timezone.now()), deleted_at__isnull=False)
+    for user_id in deleted.values_list("id", flat=True):
+        purge_account.delay(str(user_id))
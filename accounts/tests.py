@@ -1,3 +1,342 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from channels.testing import WebsocketCommunicator
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chat.constants import CHATS_COLLECTION
+from chat.fakes import install_fakes, restore_clients
+from config.asgi import application
+from config.mongo import get_mongo_db
+from forms.models import Form
+
+from . import cache, hashing
+from .authentication import UserJWTAuthentication
+from .models import User
+from .tasks import purge_account, purge_deleted_accounts
+
+
+@mock.patch("accounts.views.hash_password", return_value="hashed")
+class RegisterViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def register(self, email):
+        return self.client.post(
+            "/auth/register/", {"email": email, "password": "Sup3r-secret-pw"}, format="json"
+        )
+
+    def test_register_is_a_single_insert(self, _hash):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.register("client@example.com")
+
+        self.assertEqual(response.status_code, 201)
+        user_queries = [q["sql"] for q in ctx.captured_queries if '"users"' in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertTrue(user_queries[0].startswith("INSERT"))
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self, _hash):
+        with mock.patch("accounts.views.User.objects.create", side_effect=IntegrityError("NOT NULL constraint failed: users.full_name")):
+            with self.assertRaises(IntegrityError):
+                self.register("client@example.com")
+
+    def test_duplicate_email_is_rejected_case_insensitively(self, _hash):
+        self.register("client@example.com")
+        response = self.register("Client@Example.com")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.data)
+        self.assertEqual(User.objects.count(), 1)
+
+
+class HashingTests(TestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown, wait=True)
+        patcher = mock.patch.object(hashing, "_executor", self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    @mock.patch("accounts.views.hash_password", side_effect=hashing.HashingUnavailable())
+    def test_unavailable_pool_is_503_with_retry_after(self, _hash):
+        response = self.client.post(
+            "/auth/register/", {"email": "busy@example.com", "password": "Sup3r-secret-pw"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_login_upgrades_an_outdated_hash(self):
+        # A short salt is below the hasher's entropy target, so the hash must be updated.
+        user = User.objects.create(email="old@example.com", password_hash=make_password("pw", "abc", "md5"))
+
+        response = self.client.post("/auth/login/", {"email": "old@example.com", "password": "pw"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertNotEqual(user.password_hash.split("$")[1], "abc")
+
+    @mock.patch.object(hashing, "HASHING_TIMEOUT", 0.05)
+    def test_saturated_pool_refuses_and_releases_slots(self):
+        slots = threading.BoundedSemaphore(2)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with mock.patch.object(hashing, "_slots", slots):
+            self.executor.submit(release.wait)
+            # Queued behind the blocked worker: times out, is cancelled and frees its slot.
+            with self.assertRaises(hashing.HashingUnavailable):
+                hashing._run(len, "pw")
+            self.assertTrue(slots.acquire(blocking=False))
+            self.assertTrue(slots.acquire(blocking=False))
+            # With every slot taken, new work is refused without queueing.
+            with self.assertRaises(hashing.HashingUnavailable):
+                hashing._run(len, "pw")
+            slots.release()
+            slots.release()
+            release.set()
+            self.assertEqual(hashing._run(len, "pw"), 2)
+
+
+class UserQuerySetTests(TestCase):
+    def test_by_email_ignores_case(self):
+        user = User.objects.create(email="Client@Example.com")
+        self.assertEqual(User.objects.by_email("client@example.COM").get(), user)
+
+
+class DeleteAccountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="client@example.com")
+        token = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    @mock.patch("accounts.tasks.purge_account.delay")
+    def test_delete_marks_account_and_enqueues_purge(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete("/auth/deleteaccount/")
+
+        self.assertEqual(response.status_code, 202)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.deleted_at)
+        delay.assert_called_once_with(str(self.user.id))
+        self.assertEqual(self.client.post("/auth/logout/").status_code, 403)
+
+    @mock.patch("accounts.tasks.gcp_storage.delete_prefix")
+    @mock.patch("accounts.tasks.ChatArchive.delete_for_chats")
+    @mock.patch("accounts.tasks.MessageCollection.delete_for_chats")
+    @mock.patch("accounts.tasks.ChatCollection.delete_chats")
+    @mock.patch("accounts.tasks.ChatCollection.find_user_chat_ids", side_effect=[["c1", "c2"], []])
+    def test_purge_removes_everything_and_is_idempotent(
+        self, find_ids, delete_chats, delete_messages, delete_archives, delete_prefix
+    ):
+        Form.objects.create(user=self.user, title="N4", pdf_bucket_url="https://example.com/n4.pdf")
+        User.objects.filter(pk=self.user.pk).update(deleted_at=self.user.created_at)
+
+        purge_account(str(self.user.id))
+        purge_account(str(self.user.id))
+
+        delete_messages.assert_called_once_with(["c1", "c2"])
+        delete_archives.assert_called_once_with(["c1", "c2"])
+        delete_chats.assert_called_once_with(["c1", "c2"])
+        delete_prefix.assert_any_call(prefix=f"forms/{self.user.id}/")
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Form.objects.exists())
+
+    @mock.patch("accounts.tasks.ChatCollection.find_user_chat_ids")
+    def test_purge_skips_an_account_another_run_holds(self, find_ids):
+        User.objects.filter(pk=self.user.pk).update(
+            deleted_at=self.user.created_at, purge_lease_until=timezone.now() + timedelta(minutes=5)
+        )
+
+        purge_account(str(self.user.id))
+
+        find_ids.assert_not_called()
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    @mock.patch("accounts.tasks.ChatCollection.find_user_chat_ids", side_effect=RuntimeError("mongo down"))
+    def test_failed_purge_releases_its_lease(self, find_ids):
+        User.objects.filter(pk=self.user.pk).update(deleted_at=self.user.created_at)
+
+        with self.assertRaises(RuntimeError):
+            purge_account(str(self.user.id))
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.purge_lease_until)
+
+    @mock.patch("accounts.tasks.purge_account.delay")
+    def test_sweep_skips_leased_accounts(self, delay):
+        leased = User.objects.create(email="leased@example.com")
+        now = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(deleted_at=now, purge_lease_until=now - timedelta(minutes=1))
+        User.objects.filter(pk=leased.pk).update(deleted_at=now, purge_lease_until=now + timedelta(minutes=5))
+
+        purge_deleted_accounts()
+
+        delay.assert_called_once_with(str(self.user.id))
+
+
+class TTLCacheTests(SimpleTestCase):
+    @mock.patch("accounts.cache.time.monotonic", return_value=100.0)
+    def test_entries_expire_after_their_ttl(self, monotonic):
+        ttl_cache = cache.TTLCache(maxsize=4, ttl=10)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2, ttl=1)
+
+        monotonic.return_value = 105.0
+        self.assertEqual((ttl_cache.get("a"), ttl_cache.get("b")), (1, None))
+        monotonic.return_value = 110.0
+        self.assertIsNone(ttl_cache.get("a"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        ttl_cache = cache.TTLCache(maxsize=2, ttl=60)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2)
+        ttl_cache.get("a")
+        ttl_cache.set("c", 3)
+
+        self.assertEqual([ttl_cache.get(key) for key in "abc"], [1, None, 3])
+
+    def test_zero_size_disables_the_cache(self):
+        ttl_cache = cache.TTLCache(maxsize=0, ttl=60)
+        ttl_cache.set("a", 1)
+
+        self.assertIsNone(ttl_cache.get("a"))
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        cache._users.clear()
+        cache._tokens.clear()
+        self.user = User.objects.create(full_name="Tenant", email="cached@example.com")
+
+    def test_repeat_lookups_skip_the_database(self):
+        cache.get_user(self.user.id)
+
+        with self.assertNumQueries(0):
+            user = cache.get_user(str(self.user.id))
+
+        self.assertEqual((user.pk, user.email), (self.user.pk, "cached@example.com"))
+        self.assertFalse(user._state.adding)
+
+    def test_callers_get_independent_instances(self):
+        first = cache.get_user(self.user.id)
+        first.full_name = "Changed"
+        first.email = "changed@example.com"
+
+        second = cache.get_user(self.user.id)
+
+        self.assertIsNot(first, second)
+        self.assertEqual((second.full_name, second.email), ("Tenant", "cached@example.com"))
+
+    def test_saving_or_deleting_a_user_invalidates_it(self):
+        cache.get_user(self.user.id)
+        self.user.deleted_at = timezone.now()
+        self.user.save(update_fields=["deleted_at"])
+
+        self.assertIsNotNone(cache.get_user(self.user.id).deleted_at)
+
+        user_id = self.user.id
+        self.user.delete()
+        self.assertIsNone(cache.get_user(user_id))
+
+    def test_unknown_users_are_not_cached(self):
+        missing = User(email="late@example.com")
+        self.assertIsNone(cache.get_user(missing.id))
+
+        missing.save()
+        self.assertEqual(cache.get_user(missing.id).email, "late@example.com")
+
+    @mock.patch("accounts.cache.time.time", return_value=1000.0)
+    def test_tokens_are_remembered_until_they_expire(self, _time):
+        cache.remember_token("live", {"exp": 1060, "user_id": "u1"})
+        cache.remember_token("expired", {"exp": 999, "user_id": "u2"})
+
+        self.assertEqual(cache.get_token("live"), {"exp": 1060, "user_id": "u1"})
+        self.assertIsNone(cache.get_token("expired"))
+
+
+class SocketAuthTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.user = User.objects.create(email="socket@example.com")
+        self.token = str(UserJWTAuthentication.create_access_token(user_id=str(self.user.id)))
+
+    async def open(self, path="/ws/chat", subprotocols=None):
+        communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+        connected, subprotocol = await communicator.connect()
+        return communicator, connected, subprotocol
+
+    async def created_chat_owner(self, communicator):
+        created = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return get_mongo_db()[CHATS_COLLECTION].find_one({"_id": created["chat_id"]})["user"]
+
+    async def test_token_in_query_string(self):
+        communicator, connected, _ = await self.open(f"/ws/chat?token={self.token}")
+
+        self.assertTrue(connected)
+        self.assertEqual(await self.created_chat_owner(communicator), str(self.user.id))
+
+    async def test_bearer_subprotocol_is_echoed_on_accept(self):
+        communicator, connected, subprotocol = await self.open(subprotocols=["bearer", self.token])
+
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, "bearer")
+        self.assertEqual(await self.created_chat_owner(communicator), str(self.user.id))
+
+    async def test_invalid_or_expired_token_closes_the_handshake(self):
+        expired = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        expired.set_exp(lifetime=timedelta(seconds=-1))
+
+        for path in ("/ws/chat?token=not-a-jwt", f"/ws/chat?token={expired}"):
+            communicator, connected, _ = await self.open(path)
+            self.assertFalse(connected, path)
+
+    async def test_deleted_user_closes_the_handshake(self):
+        await User.objects.filter(pk=self.user.pk).aupdate(deleted_at=timezone.now())
+        cache.invalidate_user(self.user.id)
+
+        _, connected, _ = await self.open(f"/ws/chat?token={self.token}")
+
+        self.assertFalse(connected)
+
+    async def test_no_token_is_anonymous(self):
+        communicator, connected, subprotocol = await self.open()
+
+        self.assertTrue(connected)
+        self.assertIsNone(subprotocol)
+        self.assertIsNone(await self.created_chat_owner(communicator))
+
+
+class AdminListTests(TestCase):
+    def setUp(self):
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin_user)
+        self.user = User.objects.create(full_name="Tenant", email="tenant@example.com")
+        self.form = Form.objects.create(user=self.user, title="N4 notice", pdf_bucket_url="https://storage/n4.pdf")
+
+    def test_form_search_matches_id_title_and_email(self):
+        for term in (str(self.form.id), "n4 not", "TENANT@"):
+            response = self.client.get("/admin/forms/form/", {"q": term})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["cl"].result_count, 1, term)
+
+    def test_form_list_loads_users_in_the_same_query(self):
+        Form.objects.create(user=User.objects.create(email="other@example.com"), title="L1", pdf_bucket_url="https://storage/l1.pdf")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/admin/forms/form/")
+
+        self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith('SELECT "users"')])
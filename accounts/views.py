@@ -1,10 +1,13 @@
-from django.contrib.auth.hashers import check_password, make_password
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .authentication import UserJWTAuthentication
-from .models import User
+from .hashing import hash_password, verify_password
+from .models import EMAIL_UNIQUE_CONSTRAINT, User
 from .serializers import LoginSerializer, RegisterSerializer
 
 
@@ -15,10 +18,17 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = User.objects.create(
-            email=serializer.validated_data["email"],
-            password_hash=make_password(serializer.validated_data["password"]),
-        )
+        password_hash = hash_password(serializer.validated_data["password"])
+
+        # The case-insensitive unique constraint is the duplicate check, so a
+        # signup is a single insert; only that constraint means "registered".
+        try:
+            with transaction.atomic():
+                user = User.objects.create(email=serializer.validated_data["email"], password_hash=password_hash)
+        except IntegrityError as exc:
+            if EMAIL_UNIQUE_CONSTRAINT not in str(exc):
+                raise
+            raise ValidationError({"email": ["Email is already registered."]})
         access_token = UserJWTAuthentication.create_access_token(user_id=str(user.id))
         return Response(
             {
@@ -37,13 +47,18 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = User.objects.filter(email=serializer.validated_data["email"]).first()
+        user = User.objects.by_email(serializer.validated_data["email"]).filter(deleted_at__isnull=True).first()
         if not user or not user.password_hash:
             return Response({"detail": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        if not check_password(serializer.validated_data["password"], user.password_hash):
+        is_valid, upgraded_hash = verify_password(serializer.validated_data["password"], user.password_hash)
+        if not is_valid:
             return Response({"detail": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
 
+        if upgraded_hash:
+            user.password_hash = upgraded_hash
+            user.save(update_fields=["password_hash"])
+
         access_token = UserJWTAuthentication.create_access_token(user_id=str(user.id))
         return Response(
             {
@@ -68,7 +83,12 @@ class DeleteAccountView(APIView):
     authentication_classes = [UserJWTAuthentication]
 
     def delete(self, request):
-        """Permanently remove the authenticated user record."""
+        """Mark the account deleted and hand the purge to a background worker."""
         user: User = request.user
-        user.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        user.deleted_at = timezone.now()
+        user.save(update_fields=["deleted_at"])
+        # Imported lazily so Celery stays out of the web worker's boot path.
+        from .tasks import purge_account
+
+        transaction.on_commit(lambda: purge_account.delay(str(user.id)))
+        return Response(status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,157 @@
+"""
+Compressed archival of inactive chats.
+
+A chat nobody has touched for ``CHAT_ARCHIVE_AFTER_DAYS`` has its messages
+BSON-encoded and zlib-compressed into a single chat_archives document keyed
+by the chat id; the live message documents (or buckets) are then deleted and
+the chat is flagged with ``archived_at``. That keeps the messages working set
+limited to conversations people are actually having.
+
+Opening an archived chat again (a socket resuming it, or the REST history)
+calls :meth:`ChatArchive.rehydrate`, which writes the messages back into the
+current layout and drops the archive. Both directions merge with whatever is
+already stored and are safe to repeat, so an interrupted run is completed by
+the next one.
+"""
+
+from __future__ import annotations
+
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import bson
+from bson import Binary
+from bson.codec_options import CodecOptions
+from django.conf import settings
+from django.utils import timezone
+
+from config.mongo import get_mongo_db
+from .constants import (
+    ARCHIVES_COLLECTION, CHATS_COLLECTION, ARCHIVE_COMPRESSION_LEVEL,
+    FIELD_ID, FIELD_USER, FIELD_CHAT_ID, FIELD_CREATED_AT, FIELD_UPDATED_AT,
+    FIELD_EXPIRES_AT, FIELD_ARCHIVED_AT, FIELD_MESSAGES, FIELD_COUNT, FIELD_BLOB,
+)
+from .data import MessageCollection, to_mongo_time
+
+logger = logging.getLogger(__name__)
+
+_CODEC_OPTIONS = CodecOptions(tz_aware=True)
+
+
+def compress_messages(messages: List[Dict[str, Any]]) -> Binary:
+    """Pack messages (without their chat_id) into one compressed BSON blob."""
+    stripped = [{key: value for key, value in message.items() if key != FIELD_CHAT_ID} for message in messages]
+    return Binary(zlib.compress(bson.encode({FIELD_MESSAGES: stripped}), ARCHIVE_COMPRESSION_LEVEL))
+
+
+def decompress_messages(blob: bytes) -> List[Dict[str, Any]]:
+    """Inverse of compress_messages."""
+    return bson.decode(zlib.decompress(blob), codec_options=_CODEC_OPTIONS)[FIELD_MESSAGES]
+
+
+class ChatArchive:
+    """MongoDB operations for the chat_archives collection."""
+
+    @staticmethod
+    def find_inactive(cutoff: datetime, limit: int) -> List[str]:
+        """
+        Ids of up to ``limit`` chats with no activity since ``cutoff``.
+
+        Drafts still carrying ``expires_at`` are left to the TTL index. A chat
+        whose ``updated_at`` is old but which received messages since is
+        skipped, not archived.
+        """
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        cursor = collection.find(
+            {
+                FIELD_UPDATED_AT: {"$lt": to_mongo_time(cutoff)},
+                FIELD_ARCHIVED_AT: {"$exists": False},
+                FIELD_EXPIRES_AT: {"$exists": False},
+            },
+            {FIELD_ID: 1},
+        ).sort([(FIELD_UPDATED_AT, 1), (FIELD_ID, 1)])
+        chat_ids = []
+        for chat in cursor:
+            if len(chat_ids) >= limit:
+                break
+            if not MessageCollection.has_messages_since(chat[FIELD_ID], cutoff):
+                chat_ids.append(chat[FIELD_ID])
+        return chat_ids
+
+    @staticmethod
+    def archive_chat(chat_id: str, user_id: Optional[str] = None) -> int:
+        """
+        Move a chat's messages into its archive document; returns the number archived.
+
+        A chat that never got a message (a draft from before drafts expired)
+        is deleted instead. A chat that gets a message while it is being
+        archived keeps it and ends up live again.
+        """
+        db = get_mongo_db()
+        messages = MessageCollection.find_for_chat(chat_id)
+        previous = db[ARCHIVES_COLLECTION].find_one({FIELD_ID: chat_id})
+        if not messages and not previous:
+            db[CHATS_COLLECTION].delete_many({FIELD_ID: chat_id})
+            return 0
+        if previous:
+            merged = {message[FIELD_ID]: message for message in decompress_messages(previous[FIELD_BLOB])}
+            merged.update((message[FIELD_ID], message) for message in messages)
+            messages = sorted(merged.values(), key=lambda message: (message[FIELD_CREATED_AT], message[FIELD_ID]))
+        now = to_mongo_time(timezone.now())
+        db[ARCHIVES_COLLECTION].update_one(
+            {FIELD_ID: chat_id},
+            {"$set": {
+                FIELD_USER: user_id,
+                FIELD_COUNT: len(messages),
+                FIELD_BLOB: compress_messages(messages),
+                FIELD_ARCHIVED_AT: now,
+            }},
+            upsert=True,
+        )
+        # Flag before deleting so a crash in between never hides messages.
+        db[CHATS_COLLECTION].update_one({FIELD_ID: chat_id}, {"$set": {FIELD_ARCHIVED_AT: now}})
+        # Delete only what went into the archive. A message written since the
+        # read above stays live, and the chat (active after all) is restored.
+        MessageCollection.delete_messages(chat_id, [message[FIELD_ID] for message in messages])
+        if MessageCollection.find_for_chat(chat_id):
+            logger.info("Chat %s got a message while archiving; restoring it", chat_id)
+            ChatArchive.rehydrate(chat_id)
+        return len(messages)
+
+    @staticmethod
+    def rehydrate(chat_id: str) -> int:
+        """Restore an archived chat's messages into the live layout; returns the number restored."""
+        db = get_mongo_db()
+        archive = db[ARCHIVES_COLLECTION].find_one({FIELD_ID: chat_id})
+        messages = decompress_messages(archive[FIELD_BLOB]) if archive else []
+        MessageCollection.restore(chat_id, messages)
+        db[CHATS_COLLECTION].update_one({FIELD_ID: chat_id}, {"$unset": {FIELD_ARCHIVED_AT: ""}})
+        db[ARCHIVES_COLLECTION].delete_many({FIELD_ID: chat_id})
+        logger.debug("Rehydrated chat %s: %d messages", chat_id, len(messages))
+        return len(messages)
+
+    @staticmethod
+    def delete_for_chats(chat_ids: List[str]) -> int:
+        """Drop the archives of deleted chats (synchronous, for workers)."""
+        return get_mongo_db()[ARCHIVES_COLLECTION].delete_many({FIELD_ID: {"$in": chat_ids}}).deleted_count
+
+
+def archive_inactive(older_than: Optional[timedelta] = None, limit: Optional[int] = None) -> Dict[str, int]:
+    """Archive up to ``limit`` chats idle for longer than ``older_than``; returns what was done."""
+    older_than = older_than or timedelta(days=getattr(settings, "CHAT_ARCHIVE_AFTER_DAYS", 30))
+    limit = limit or getattr(settings, "CHAT_ARCHIVE_BATCH_SIZE", 200)
+    chat_ids = ChatArchive.find_inactive(timezone.now() - older_than, limit)
+    owners = {
+        chat[FIELD_ID]: chat.get(FIELD_USER)
+        for chat in get_mongo_db()[CHATS_COLLECTION].find({FIELD_ID: {"$in": chat_ids}}, {FIELD_USER: 1})
+    }
+    counts = [ChatArchive.archive_chat(chat_id, owners.get(chat_id)) for chat_id in chat_ids]
+    totals = {
+        "chats": sum(1 for count in counts if count),
+        "messages": sum(counts),
+        "empty_deleted": sum(1 for count in counts if not count),
+    }
+    logger.info("Archived %(chats)d chats (%(messages)d messages), deleted %(empty_deleted)d empty", totals)
+    return totals
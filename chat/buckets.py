@@ -0,0 +1,257 @@
+"""
+Bucketed message layout: each chat's messages packed into documents of up to N.
+
+With ``CHAT_MESSAGE_LAYOUT = "bucket"`` a message is ``$push``ed into the
+chat's open bucket (upserting a new one once the open bucket is full), so
+a whole intake session is read back in one or a few documents instead of
+one document per message. MessageCollection dispatches here; callers keep
+seeing per-message dicts with ``chat_id`` filled in, exactly like the
+document layout.
+
+Every bucket records ``first_at``/``last_at`` so reads can skip buckets
+outside a cursor window. Timestamps arrive already rendered as BSON dates
+(see chat.data.to_mongo_time).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from django.conf import settings
+
+from config.mongo import get_mongo_db
+from .constants import (
+    BUCKETS_COLLECTION, FIELD_ID, FIELD_CHAT_ID, FIELD_CREATED_AT, FIELD_RESPONSE_FILE_URL,
+    FIELD_MESSAGES, FIELD_COUNT, FIELD_FIRST_AT, FIELD_LAST_AT,
+)
+
+logger = logging.getLogger(__name__)
+
+Position = Tuple[Any, ObjectId]
+
+
+def bucket_size() -> int:
+    return getattr(settings, "CHAT_MESSAGE_BUCKET_SIZE", 50)
+
+
+def _key(message: Dict[str, Any]) -> Position:
+    return message[FIELD_CREATED_AT], message[FIELD_ID]
+
+
+def _unpack(bucket: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    for message in bucket.get(FIELD_MESSAGES, []):
+        yield {**message, FIELD_CHAT_ID: bucket[FIELD_CHAT_ID]}
+
+
+def _collect(
+    buckets: Iterable[Dict[str, Any]],
+    keep: Callable[[Dict[str, Any]], bool],
+    limit: Optional[int],
+    newest_first: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Merge messages from buckets into (created_at, _id) order and keep ``limit``.
+
+    Buckets must arrive ordered by ``first_at`` ascending (``last_at``
+    descending when ``newest_first``); reading stops as soon as the next
+    bucket cannot hold anything earlier (later) than the current page.
+    """
+    picked: List[Dict[str, Any]] = []
+    for bucket in buckets:
+        if limit and len(picked) >= limit:
+            edge = picked[limit - 1][FIELD_CREATED_AT]
+            boundary = bucket[FIELD_LAST_AT] if newest_first else bucket[FIELD_FIRST_AT]
+            if (boundary < edge) if newest_first else (boundary > edge):
+                break
+        picked.extend(message for message in _unpack(bucket) if keep(message))
+        picked.sort(key=_key, reverse=newest_first)
+        if limit:
+            del picked[limit:]
+    return picked
+
+
+def _after(position: Position) -> Callable[[Dict[str, Any]], bool]:
+    return lambda message: _key(message) > position
+
+
+def _before(position: Position) -> Callable[[Dict[str, Any]], bool]:
+    return lambda message: _key(message) < position
+
+
+class MessageBuckets:
+    """MongoDB operations for the message_buckets collection."""
+
+    @staticmethod
+    def insert(message_doc: Dict[str, Any]) -> ObjectId:
+        """Append a message to its chat's open bucket, opening a new bucket when full."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        message = {key: value for key, value in message_doc.items() if key != FIELD_CHAT_ID}
+        message.setdefault(FIELD_ID, ObjectId())
+        created_at = message[FIELD_CREATED_AT]
+        collection.update_one(
+            {FIELD_CHAT_ID: message_doc[FIELD_CHAT_ID], FIELD_COUNT: {"$lt": bucket_size()}},
+            {
+                "$push": {FIELD_MESSAGES: message},
+                "$inc": {FIELD_COUNT: 1},
+                "$max": {FIELD_LAST_AT: created_at},
+                "$min": {FIELD_FIRST_AT: created_at},
+            },
+            upsert=True,
+        )
+        message_doc[FIELD_ID] = message[FIELD_ID]
+        return message[FIELD_ID]
+
+    @staticmethod
+    def history(chat_id: str) -> List[Dict[str, Any]]:
+        """Every message of a chat, oldest first."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        buckets = collection.find({FIELD_CHAT_ID: chat_id}).sort([(FIELD_FIRST_AT, 1), (FIELD_ID, 1)])
+        return _collect(buckets, lambda message: True, None)
+
+    @staticmethod
+    def page(
+        chat_id: str,
+        after: Optional[Position] = None,
+        before: Optional[Position] = None,
+        latest: bool = False,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """One page of a chat's messages, oldest first; see MessageCollection.page_messages."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        if after is not None:
+            buckets = collection.find({FIELD_CHAT_ID: chat_id, FIELD_LAST_AT: {"$gte": after[0]}})
+            return _collect(buckets.sort([(FIELD_FIRST_AT, 1), (FIELD_ID, 1)]), _after(after), limit)
+        if before is not None or latest:
+            query: Dict[str, Any] = {FIELD_CHAT_ID: chat_id}
+            keep = lambda message: True
+            if before is not None:
+                query[FIELD_FIRST_AT] = {"$lte": before[0]}
+                keep = _before(before)
+            buckets = collection.find(query).sort([(FIELD_LAST_AT, -1), (FIELD_ID, -1)])
+            return _collect(buckets, keep, limit, newest_first=True)[::-1]
+        buckets = collection.find({FIELD_CHAT_ID: chat_id}).sort([(FIELD_FIRST_AT, 1), (FIELD_ID, 1)])
+        return _collect(buckets, lambda message: True, limit)
+
+    @staticmethod
+    def page_created_after(after: Optional[Position], until: Any, limit: int) -> List[Dict[str, Any]]:
+        """Messages of every chat after a sync position and before ``until``."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        query: Dict[str, Any] = {FIELD_FIRST_AT: {"$lt": until}}
+        if after is not None:
+            query[FIELD_LAST_AT] = {"$gte": after[0]}
+        keep = (lambda message: message[FIELD_CREATED_AT] < until and (after is None or _key(message) > after))
+        buckets = collection.find(query).sort([(FIELD_FIRST_AT, 1), (FIELD_ID, 1)])
+        return _collect(buckets, keep, limit)
+
+    @staticmethod
+    def get_response_file_url(message_id: ObjectId) -> Optional[str]:
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        bucket = collection.find_one(
+            {f"{FIELD_MESSAGES}.{FIELD_ID}": message_id}, {FIELD_MESSAGES: {"$elemMatch": {FIELD_ID: message_id}}}
+        )
+        messages = bucket.get(FIELD_MESSAGES) if bucket else None
+        return messages[0].get(FIELD_RESPONSE_FILE_URL) if messages else None
+
+    @staticmethod
+    def set_response_file_url(message_id: ObjectId, url: str) -> None:
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        collection.update_one(
+            {f"{FIELD_MESSAGES}.{FIELD_ID}": message_id},
+            {"$set": {f"{FIELD_MESSAGES}.$.{FIELD_RESPONSE_FILE_URL}": url}},
+        )
+
+    @staticmethod
+    def delete_for_chats(chat_ids: List[str]) -> int:
+        """Delete every bucket of the given chats; returns the number of messages removed."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        removed = sum(
+            bucket.get(FIELD_COUNT, 0)
+            for bucket in collection.find({FIELD_CHAT_ID: {"$in": chat_ids}}, {FIELD_COUNT: 1})
+        )
+        collection.delete_many({FIELD_CHAT_ID: {"$in": chat_ids}})
+        return removed
+
+    @staticmethod
+    def delete_messages(chat_id: str, message_ids: Iterable[ObjectId]) -> int:
+        """
+        Remove the given messages from a chat's buckets; returns how many were removed.
+
+        A bucket is rewritten (or deleted once empty) only if its ``count`` is
+        what was read, so a message ``$push``ed in between is never dropped:
+        the bucket is read again and the rewrite retried.
+        """
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        ids = set(message_ids)
+        removed = 0
+        for bucket_id in [bucket[FIELD_ID] for bucket in collection.find({FIELD_CHAT_ID: chat_id}, {FIELD_ID: 1})]:
+            while bucket := collection.find_one({FIELD_ID: bucket_id}):
+                messages = bucket.get(FIELD_MESSAGES, [])
+                kept = [message for message in messages if message[FIELD_ID] not in ids]
+                if len(kept) == len(messages):
+                    break
+                unchanged = {FIELD_ID: bucket_id, FIELD_COUNT: bucket.get(FIELD_COUNT, 0)}
+                if kept:
+                    times = [message[FIELD_CREATED_AT] for message in kept]
+                    written = collection.update_one(unchanged, {"$set": {
+                        FIELD_MESSAGES: kept, FIELD_COUNT: len(kept),
+                        FIELD_FIRST_AT: min(times), FIELD_LAST_AT: max(times),
+                    }}).matched_count
+                else:
+                    written = collection.delete_one(unchanged).deleted_count
+                if written:
+                    removed += len(messages) - len(kept)
+                    break
+        return removed
+
+    @staticmethod
+    def has_messages_since(chat_id: str, since: Any) -> bool:
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        return collection.find_one({FIELD_CHAT_ID: chat_id, FIELD_LAST_AT: {"$gte": since}}, {FIELD_ID: 1}) is not None
+
+    @staticmethod
+    def restore(chat_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Merge messages into a chat's buckets and repack them; a message already present is kept once."""
+        collection = get_mongo_db()[BUCKETS_COLLECTION]
+        merged = {message[FIELD_ID]: message for message in MessageBuckets.history(chat_id)}
+        merged.update((message[FIELD_ID], message) for message in messages)
+        buckets = MessageBuckets.pack(chat_id, sorted(merged.values(), key=_key))
+        collection.delete_many({FIELD_CHAT_ID: chat_id})
+        if buckets:
+            collection.insert_many(buckets)
+
+    @staticmethod
+    def pack(chat_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build full bucket documents for a chat's messages (already ordered), used by migrations."""
+        size = bucket_size()
+        buckets = []
+        for start in range(0, len(messages), size):
+            chunk = [
+                {key: value for key, value in message.items() if key != FIELD_CHAT_ID}
+                for message in messages[start:start + size]
+            ]
+            buckets.append({
+                FIELD_CHAT_ID: chat_id,
+                FIELD_COUNT: len(chunk),
+                FIELD_FIRST_AT: chunk[0][FIELD_CREATED_AT],
+                FIELD_LAST_AT: chunk[-1][FIELD_CREATED_AT],
+                FIELD_MESSAGES: chunk,
+            })
+        return buckets
+
+    @staticmethod
+    def create_indexes() -> List[str]:
+        db = get_mongo_db()
+        return [
+            db[BUCKETS_COLLECTION].create_index(
+                [(FIELD_CHAT_ID, 1), (FIELD_FIRST_AT, 1), (FIELD_ID, 1)], name="chat_first_at"
+            ),
+            db[BUCKETS_COLLECTION].create_index(
+                [(FIELD_CHAT_ID, 1), (FIELD_LAST_AT, -1), (FIELD_ID, -1)], name="chat_last_at"
+            ),
+            # page_created_after: chat.sync's walk over every chat's buckets.
+            db[BUCKETS_COLLECTION].create_index([(FIELD_FIRST_AT, 1), (FIELD_ID, 1)], name="first_at"),
+            db[BUCKETS_COLLECTION].create_index([(f"{FIELD_MESSAGES}.{FIELD_ID}", 1)], name="message_id"),
+            db[BUCKETS_COLLECTION].create_index([(FIELD_LAST_AT, 1)], name="last_at"),
+        ]
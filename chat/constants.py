@@ -3,16 +3,27 @@
 # MongoDB Collections
 CHATS_COLLECTION = "chats"
 MESSAGES_COLLECTION = "messages"
+BUCKETS_COLLECTION = "message_buckets"
+ARCHIVES_COLLECTION = "chat_archives"
+
+# Message storage layouts (settings.CHAT_MESSAGE_LAYOUT)
+MESSAGE_LAYOUT_DOCUMENT = "document"
+MESSAGE_LAYOUT_BUCKET = "bucket"
 
 # FastAPI Configuration
 FASTAPI_CHAT_ENDPOINT = "http://localhost:8000/ai/chat"
 FASTAPI_FORM_ENDPOINT = "http://localhost:8000/ai/file"
 FASTAPI_CONSULTANT_ENDPOINT = "http://localhost:8000/ai/consultant"
 FASTAPI_TIMEOUT = 30.0
+# Upstream answers worth another attempt (the consultant call is idempotent)
+FASTAPI_RETRY_STATUSES = frozenset({502, 503, 504})
 
 # Chat Status
 CHAT_STATUS_DRAFT = "draft"
 
+# Message roles
+ROLE_USER = "user"
+
 # Message Fields
 FIELD_CHAT_ID = "chat_id"
 FIELD_USER = "user"
@@ -25,10 +36,26 @@ FIELD_CONTENT = "content"
 FIELD_ID = "_id"
 FIELD_RESPONSE = "response"
 FIELD_RESPONSE_FILE_URL = "response_file_url"
+FIELD_RESPONSE_FILE_STATUS = "response_file_status"
 FIELD_FILE = "file"
 FIELD_DATA = "data"
 FIELD_FILENAME = "filename"
 FIELD_FORM = "form"
+FIELD_EXPIRES_AT = "expires_at"
+FIELD_ARCHIVED_AT = "archived_at"
+
+# Chat summary fields, maintained per message by ChatCollection.record_message
+FIELD_MESSAGE_COUNT = "message_count"
+FIELD_LAST_MESSAGE_AT = "last_message_at"
+FIELD_LAST_MESSAGE_PREVIEW = "last_message_preview"
+CHAT_PREVIEW_LENGTH = 120
+CHAT_TITLE_LENGTH = 80
+
+# Message bucket fields
+FIELD_MESSAGES = "messages"
+FIELD_COUNT = "count"
+FIELD_FIRST_AT = "first_at"
+FIELD_LAST_AT = "last_at"
 
 # FastAPI Payload Fields
 FIELD_SESSION_ID = "session_id"
@@ -36,12 +63,23 @@ FIELD_NEW_MESSAGE = "new_message"
 FIELD_MESSAGE = "message"
 FIELD_CHAT_HISTORY = "chat_history"
 FIELD_REFRESH_INDEX = "refresh_index"
+FIELD_TYPE = "type"
 FIELD_FORM = "form"
 
+# WebSocket Frame Types (inbound) and their rate-limit scopes; unknown types are messages
+FRAME_TYPE_MESSAGE = "message"
+FRAME_THROTTLE_SCOPES = {FRAME_TYPE_MESSAGE: "chat.message"}
+
 # WebSocket Response Types
 RESPONSE_TYPE_CHAT_CREATED = "chat.created"
+RESPONSE_TYPE_CHAT_SNAPSHOT = "chat.snapshot"
 RESPONSE_OK = "ok"
 RESPONSE_ERRORS = "errors"
+RESPONSE_RETRY_AFTER = "retry_after"
+RESPONSE_MESSAGES = "messages"
+RESPONSE_PREVIOUS = "previous"
+RESPONSE_NEXT = "next"
+RESPONSE_COMPLETE = "complete"
 FIELD_MESSAGE = "message"
 
 # Error Messages
@@ -49,6 +87,16 @@ ERROR_INVALID_JSON = "invalid_json"
 ERROR_INVALID_PAYLOAD = "invalid_payload"
 ERROR_CHAT_INIT_FAILED = "chat_init_failed"
 ERROR_MESSAGE_INSERT_FAILED = "message_insert_failed"
+ERROR_SERVER_DRAINING = "server_draining"
+ERROR_INVALID_MESSAGE = "invalid_message"
+ERROR_UPSTREAM_FAILED = "upstream_failed"
+ERROR_RATE_LIMITED = "rate_limited"
+ERROR_CHAT_NOT_FOUND = "chat_not_found"
+ERROR_DEADLINE_EXCEEDED = "deadline_exceeded"
+
+# WebSocket close codes
+CLOSE_SERVICE_RESTART = 1012
+CLOSE_RATE_LIMITED = 4429
 
 # File Paths
 FILE_PATH_PREFIX = "chat"
@@ -56,6 +104,45 @@ FILE_PATH_MESSAGES = "messages"
 FILE_PATH_RESPONSE_PREFIX = "response_"
 DEFAULT_FILENAME = "response.pdf"
 
+# Channel layer
+CHAT_GROUP_PREFIX = "chat_"
+EVENT_CHAT_MESSAGES = "chat.messages"
+
+# REST history API: fields returned to the UI and page sizes
+CHAT_LIST_PROJECTION = {
+    FIELD_ID: 1, FIELD_TITLE: 1, FIELD_STATUS: 1, FIELD_CREATED_AT: 1, FIELD_UPDATED_AT: 1,
+    FIELD_MESSAGE_COUNT: 1, FIELD_LAST_MESSAGE_AT: 1, FIELD_LAST_MESSAGE_PREVIEW: 1,
+}
+MESSAGE_HISTORY_PROJECTION = {
+    FIELD_ID: 1, FIELD_ROLE: 1, FIELD_CONTENT: 1, FIELD_CREATED_AT: 1, FIELD_RESPONSE_FILE_URL: 1,
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Message search (chat.search) over the PostgreSQL mirror
+SEARCH_CONFIG = "english"
+# ts_headline marks matches with control characters that cannot survive in
+# stored content; the snippet is HTML-escaped before they become <mark> tags.
+SEARCH_SNIPPET_START = "\x02"
+SEARCH_SNIPPET_STOP = "\x03"
+SEARCH_MARK_START = "<mark>"
+SEARCH_MARK_STOP = "</mark>"
+SEARCH_SNIPPET_WORDS = 30
+
+# Socket resume (connect with ?chat_id=...&after=<cursor>): most messages in the snapshot frame
+RESUME_PARAM_AFTER = "after"
+RESUME_SNAPSHOT_SIZE = 100
+
+# Background tasks
+RESPONSE_FILE_TASK_PREFIX = "response-file-"
+# FIELD_RESPONSE_FILE_STATUS on a reply frame: the upload is queued, or could not be queued.
+RESPONSE_FILE_PENDING = "pending"
+RESPONSE_FILE_FAILED = "failed"
+
+# Chat archives (chat.archive)
+FIELD_BLOB = "blob"
+ARCHIVE_COMPRESSION_LEVEL = 6
+
 # HTTP Status
 HTTP_OK = 200
 HTTP_ERROR = 500
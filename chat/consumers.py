@@ -4,10 +4,18 @@ import json
 import uuid
 import asyncio
 import logging
+from datetime import datetime
 from typing import Optional, Dict, Any, Tuple
+from urllib.parse import parse_qs
 
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
 
+from config import deadline, lifecycle, metrics
+from config.ratelimit import client_ident, get_limiter
+
+from .cursors import decode_message_cursor, encode_cursor
 from .serializers import MessageSerializer
 from .data import ChatCollection, MessageCollection
 from .fastapi_client import FastAPIClient
@@ -16,13 +24,37 @@ from .constants import (
     FASTAPI_CONSULTANT_ENDPOINT,
     # FASTAPI_FORM_ENDPOINT,
     # FIELD_FORM,
-    RESPONSE_TYPE_CHAT_CREATED, RESPONSE_OK, RESPONSE_ERRORS,
-    ERROR_INVALID_JSON, ERROR_INVALID_PAYLOAD, HTTP_OK,
-    FIELD_ID, FIELD_CHAT_ID, FIELD_MESSAGE, FIELD_RESPONSE, FIELD_FILE
+    CHAT_GROUP_PREFIX, RESPONSE_FILE_TASK_PREFIX, RESPONSE_FILE_PENDING, RESPONSE_FILE_FAILED,
+    RESPONSE_TYPE_CHAT_CREATED, RESPONSE_TYPE_CHAT_SNAPSHOT, RESPONSE_OK, RESPONSE_ERRORS,
+    RESPONSE_MESSAGES, RESPONSE_PREVIOUS, RESPONSE_NEXT, RESPONSE_COMPLETE,
+    RESUME_PARAM_AFTER, RESUME_SNAPSHOT_SIZE, ERROR_CHAT_NOT_FOUND, FIELD_CREATED_AT,
+    ERROR_INVALID_JSON, ERROR_INVALID_PAYLOAD, ERROR_SERVER_DRAINING, HTTP_OK,
+    ERROR_INVALID_MESSAGE, ERROR_MESSAGE_INSERT_FAILED, ERROR_UPSTREAM_FAILED, ERROR_RATE_LIMITED,
+    ERROR_DEADLINE_EXCEEDED,
+    CLOSE_SERVICE_RESTART, CLOSE_RATE_LIMITED, RESPONSE_RETRY_AFTER,
+    FIELD_ID, FIELD_CHAT_ID, FIELD_MESSAGE, FIELD_RESPONSE, FIELD_FILE, FIELD_TYPE,
+    FIELD_RESPONSE_FILE_STATUS, FRAME_TYPE_MESSAGE, FRAME_THROTTLE_SCOPES,
 )
 
 logger = logging.getLogger(__name__)
 
+TURN_SECONDS = metrics.histogram(
+    "chat_turn_seconds", "Wall time of one chat turn, from receive to reply.", ["outcome"]
+)
+STAGE_SECONDS = metrics.histogram(
+    "chat_turn_stage_seconds", "Wall time of each stage of a chat turn.", ["stage", "outcome"]
+)
+TURN_ERRORS = metrics.counter(
+    "chat_turn_errors_total", "Chat turns answered with an error frame.", ["reason"]
+)
+
+
+def _json_default(value: Any) -> Any:
+    """Render the BSON types that reach a frame (dates, ObjectIds) as strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for handling chat connections and messages."""
@@ -30,13 +62,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.chat_id: Optional[str] = None
+        self.group_name: Optional[str] = None
+        # The chat open_chat last ran for; it only needs to run once per chat.
+        self.open_chat_id: Optional[str] = None
+        self.idle = asyncio.Event()
+        self.idle.set()
     
     async def connect(self):
-        """Handle WebSocket connection: create chat document in MongoDB."""
-        await self.accept()
+        """
+        Handle WebSocket connection: resume the chat named in the query string,
+        or create a new chat document in MongoDB.
+        """
+        if self.scope.get("auth_error") or lifecycle.is_draining():
+            return await self.close()
+        await self.accept(subprotocol=self.scope.get("auth_subprotocol"))
+        lifecycle.register(self)
+        if retry_after := await get_limiter().ahit("chat.connect", self._identity()):
+            await self._send_json({RESPONSE_ERRORS: ERROR_RATE_LIMITED, RESPONSE_RETRY_AFTER: round(retry_after, 3)})
+            return await self.close(code=CLOSE_RATE_LIMITED)
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        if FIELD_CHAT_ID in params:
+            resume_after = params.get(RESUME_PARAM_AFTER, [""])[0]
+            if await self._resume(params[FIELD_CHAT_ID][0], resume_after):
+                return
         try:
             chat_doc = await ChatCollection.create_chat(user=self.scope.get("user"))
             self.chat_id = str(chat_doc[FIELD_ID])
+            await self._join_chat_group(self.chat_id)
             await self._send_json({
                 "type": RESPONSE_TYPE_CHAT_CREATED,
                 FIELD_CHAT_ID: self.chat_id
@@ -44,76 +96,206 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except Exception:
             logger.exception("Failed to create chat document on connection")
             await self._send_json({RESPONSE_ERRORS: "chat_init_failed"})
+
+    async def _resume(self, chat_id: str, after: str) -> bool:
+        """
+        Reattach to an existing chat and send one snapshot frame of what the
+        client is missing: the messages after its ``after`` cursor, or the
+        latest page without one. ``complete`` is false when more remain; the
+        REST history continues from ``next`` (or back from ``previous``).
+        Returns False, after an error frame, when the chat cannot be resumed.
+        """
+        try:
+            position = decode_message_cursor(after) if after else None
+        except ValidationError:
+            position = None
+        with metrics.timed(STAGE_SECONDS, stage="resume") as span:
+            try:
+                chat = await ChatCollection.find_resumable(chat_id, self.scope.get("user"))
+                if chat:
+                    await ChatCollection.open_chat(chat_id)
+                    messages = await asyncio.to_thread(
+                        MessageCollection.page_messages,
+                        chat_id,
+                        after=position,
+                        latest=position is None,
+                        limit=RESUME_SNAPSHOT_SIZE + 1,
+                    )
+            except Exception:
+                logger.exception("Failed to resume chat %s", chat_id)
+                chat = None
+            if not chat:
+                span.outcome = ERROR_CHAT_NOT_FOUND
+        if not chat:
+            await self._send_json({RESPONSE_ERRORS: ERROR_CHAT_NOT_FOUND, FIELD_CHAT_ID: chat_id})
+            return False
+
+        complete = len(messages) <= RESUME_SNAPSHOT_SIZE
+        if not complete:
+            # Keep the part adjacent to what the client has (after) or to now (latest).
+            messages = messages[:RESUME_SNAPSHOT_SIZE] if position else messages[-RESUME_SNAPSHOT_SIZE:]
+        self.chat_id = self.open_chat_id = chat_id
+        await self._join_chat_group(chat_id)
+        await self._send_json({
+            "type": RESPONSE_TYPE_CHAT_SNAPSHOT,
+            FIELD_CHAT_ID: chat_id,
+            RESPONSE_MESSAGES: messages,
+            RESPONSE_PREVIOUS: self._cursor(messages[0]) if messages else None,
+            RESPONSE_NEXT: self._cursor(messages[-1]) if messages else (after or None),
+            RESPONSE_COMPLETE: complete,
+        })
+        return True
+
+    async def disconnect(self, code):
+        """Leave the chat group so background notifications stop targeting this socket."""
+        lifecycle.unregister(self)
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
     
+    async def drain(self):
+        """Wait for the in-flight turn to finish, then ask the client to reconnect elsewhere."""
+        await self.idle.wait()
+        await self.close(code=CLOSE_SERVICE_RESTART)
+
     async def receive(self, text_data: str):
-        """Handle incoming WebSocket message."""
-        payload, error = self._parse_json(text_data)
+        """
+        Handle incoming WebSocket message, refusing new turns while draining.
+
+        The turn runs under CHAT_TURN_DEADLINE_SECONDS; once that is spent,
+        pending Mongo and consultant calls stop and the client gets
+        ``deadline_exceeded``.
+        """
+        if lifecycle.is_draining():
+            return await self._send_json({RESPONSE_ERRORS: ERROR_SERVER_DRAINING})
+        self.idle.clear()
+        try:
+            with metrics.timed(TURN_SECONDS) as span:
+                try:
+                    with deadline.budget(getattr(settings, "CHAT_TURN_DEADLINE_SECONDS", 0)):
+                        span.outcome = await self._handle_turn(text_data)
+                except Exception as exc:
+                    if not deadline.is_timeout(exc):
+                        raise
+                    logger.warning("Chat turn in %s ran out of time: %r", self.chat_id, exc)
+                    span.outcome = await self._reject(ERROR_DEADLINE_EXCEEDED)
+        finally:
+            self.idle.set()
+
+    async def _handle_turn(self, text_data: str) -> str:
+        """Run one chat turn and return its outcome: ``ok`` or the error reason sent to the client."""
+        with metrics.timed(STAGE_SECONDS, stage="parse"):
+            payload, error = self._parse_json(text_data)
         if error:
-            return await self._send_json({RESPONSE_ERRORS: error})
+            return await self._reject(error)
+        if retry_after := await self._throttle(payload):
+            return await self._reject(ERROR_RATE_LIMITED, retry_after=round(retry_after, 3))
         
         chat_id = self._resolve_chat_id(payload)
-        serializer = MessageSerializer(data=payload)
-        if not serializer.is_valid():
-            print(f"Validation errors: {serializer.errors}")
-            return await self._send_json({RESPONSE_ERRORS: serializer.errors})
+        if payload.get(FIELD_CHAT_ID) and chat_id != self.chat_id:
+            # Switching chats mid-socket gets the same owner check as a resume.
+            with metrics.timed(STAGE_SECONDS, stage="switch_chat") as span:
+                chat = await ChatCollection.find_resumable(chat_id, self.scope.get("user"))
+                if not chat:
+                    span.outcome = ERROR_CHAT_NOT_FOUND
+            if not chat:
+                return await self._reject(ERROR_CHAT_NOT_FOUND)
+            self.chat_id = chat_id
+        await self._join_chat_group(chat_id)
+        with metrics.timed(STAGE_SECONDS, stage="validate") as span:
+            serializer = MessageSerializer(data=payload)
+            valid = serializer.is_valid()
+            if not valid:
+                span.outcome = ERROR_INVALID_MESSAGE
+        if not valid:
+            logger.debug("Validation errors: %s", serializer.errors)
+            return await self._reject(ERROR_INVALID_MESSAGE, serializer.errors)
         
+        if chat_id != self.open_chat_id:
+            with metrics.timed(STAGE_SECONDS, stage="open_chat"):
+                await ChatCollection.open_chat(chat_id)
+            self.open_chat_id = chat_id
+
         # Create and persist message
         message_doc = MessageCollection.create_message_document(serializer.validated_data, chat_id)
         try:
-            message_id = await MessageCollection.insert_message(message_doc)
-        except Exception:
+            with metrics.timed(STAGE_SECONDS, stage="insert_message"):
+                message_id = await MessageCollection.insert_message(message_doc)
+        except Exception as exc:
+            if deadline.is_timeout(exc):
+                raise
             logger.exception("Failed to insert message")
-            return await self._send_json({RESPONSE_ERRORS: "message_insert_failed"})
+            return await self._reject(ERROR_MESSAGE_INSERT_FAILED)
         
         message_doc[FIELD_ID] = str(message_id)
         
         # Fetch history and get form data
-        history = await MessageCollection.get_chat_history(chat_id, exclude_message_id=message_id)
+        with metrics.timed(STAGE_SECONDS, stage="get_chat_history"):
+            history = await MessageCollection.get_chat_history(chat_id, exclude_message_id=message_id)
         chat_history = history if history else None
         session_id = chat_id
         new_message = message_doc["content"]
         # form_data = payload.get("form")
 
         # Get AI response from FastAPI
-        fastapi_response = await FastAPIClient.send_chat_request(
-            endpoint=FASTAPI_CONSULTANT_ENDPOINT,
-            message=new_message,
-            chat_history=chat_history,
-            refresh_index=True
-            # form=form_data
-        )
+        with metrics.timed(STAGE_SECONDS, stage="consultant") as span:
+            fastapi_response = await FastAPIClient.send_chat_request(
+                endpoint=FASTAPI_CONSULTANT_ENDPOINT,
+                message=new_message,
+                session_id=session_id,
+                chat_history=chat_history,
+                refresh_index=True
+                # form=form_data
+            )
+            if fastapi_response.status_code != HTTP_OK:
+                span.outcome = ERROR_UPSTREAM_FAILED
 
-        print(f"FastAPI raw response: {fastapi_response}")
+        logger.debug("FastAPI raw response: %s", fastapi_response)
         
         if fastapi_response.status_code != HTTP_OK:
-             return await self._send_json({RESPONSE_ERRORS: fastapi_response})
+            return await self._reject(ERROR_UPSTREAM_FAILED, fastapi_response.text)
 
         # Create and persist message from the FastAPI response
-        message_doc = MessageCollection.create_message_document(fastapi_response.json(), chat_id)
+        response_data = fastapi_response.json()
+        message_doc = MessageCollection.create_message_document(response_data, chat_id)
         try:
-            message_id = await MessageCollection.insert_message(message_doc)
-        except Exception:
+            with metrics.timed(STAGE_SECONDS, stage="insert_reply"):
+                message_id = await MessageCollection.insert_message(message_doc)
+        except Exception as exc:
+            if deadline.is_timeout(exc):
+                raise
             logger.exception("Failed to insert message")
-            return await self._send_json({RESPONSE_ERRORS: "message_insert_failed"})    
+            return await self._reject(ERROR_MESSAGE_INSERT_FAILED)
        
-        response_data = fastapi_response.json()
         message_doc[FIELD_RESPONSE] = response_data
         
-        # Handle file upload if present
-        # if response_data.get(FIELD_FILE):
-        #     asyncio.create_task(
-        #         MessageCollection.upload_response_file(response_data[FIELD_FILE], message_id, chat_id)
-        #     )
-        # # Send the file and also persist the form in mongodb and key to it in postgres
-        # message_doc = await MessageCollection.upload_response_file(message_doc, message_doc[FIELD_ID], chat_id)
-        # fastapi_response = await FastAPIClient.send_chat_request(
-        #     endpoint=FASTAPI_FORM_ENDPOINT,
-        #     new_message=message_doc,
-        #     chat_history=chat_history,
-        #     form=form_data
-        # )
-        
-        await self._send_json({RESPONSE_OK: True, FIELD_MESSAGE: message_doc})
+        # Hand file storage to a background worker; the socket is notified
+        # through the chat group once the upload is recorded.
+        if response_data.get(FIELD_FILE):
+            from .tasks import process_response_file
+
+            user = self.scope.get("user")
+            user_id = str(user.id) if user and getattr(user, "is_authenticated", False) else None
+            # The reply is already stored, so a broker outage must not lose it:
+            # send it anyway and tell the client the file will not follow.
+            try:
+                with metrics.timed(STAGE_SECONDS, stage="enqueue_file"):
+                    await asyncio.to_thread(
+                        process_response_file.apply_async,
+                        args=(str(message_id), chat_id, user_id, response_data[FIELD_FILE]),
+                        task_id=f"{RESPONSE_FILE_TASK_PREFIX}{message_id}",
+                    )
+                message_doc[FIELD_RESPONSE_FILE_STATUS] = RESPONSE_FILE_PENDING
+            except Exception:
+                logger.exception("Failed to enqueue response file: message_id=%s", message_id)
+                message_doc[FIELD_RESPONSE_FILE_STATUS] = RESPONSE_FILE_FAILED
+
+        with metrics.timed(STAGE_SECONDS, stage="send"):
+            await self._send_json({
+                RESPONSE_OK: True,
+                FIELD_MESSAGE: message_doc,
+                RESPONSE_NEXT: self._cursor({**message_doc, FIELD_ID: message_id}),
+            })
+        return metrics.OUTCOME_OK
     
     async def chat_messages(self, event):
         """Handle channel layer events for chat messages."""
@@ -121,12 +303,54 @@ class ChatConsumer(AsyncWebsocketConsumer):
     
     # utility functions
 
+    async def _join_chat_group(self, chat_id: str) -> None:
+        """Subscribe this socket to the chat's channel-layer group, leaving any previous one."""
+        group_name = f"{CHAT_GROUP_PREFIX}{chat_id}"
+        if group_name == self.group_name:
+            return
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await self.channel_layer.group_add(group_name, self.channel_name)
+        self.group_name = group_name
+
+    async def _reject(self, reason: str, errors: Any = None, retry_after: Optional[float] = None) -> str:
+        """Send an error frame for this turn, count it, and return ``reason`` as the turn outcome."""
+        TURN_ERRORS.inc(reason=reason)
+        frame = {RESPONSE_ERRORS: reason if errors is None else errors}
+        if retry_after is not None:
+            frame[RESPONSE_RETRY_AFTER] = retry_after
+        await self._send_json(frame)
+        return reason
+
+    @staticmethod
+    def _cursor(message: Dict[str, Any]) -> str:
+        """Resume/history cursor positioned at a message."""
+        return encode_cursor(message[FIELD_CREATED_AT], message[FIELD_ID])
+
+    def _identity(self) -> str:
+        """Rate-limit key for the peer: the user id, or the client address when anonymous."""
+        user = self.scope.get("user")
+        if user and getattr(user, "is_authenticated", False):
+            return str(user.id)
+        return client_ident(self.scope)
+
+    async def _throttle(self, payload: Dict[str, Any]) -> float:
+        """Charge a frame to this socket's and this user's buckets; return seconds to wait, or 0."""
+        limiter = get_limiter()
+        # The scope follows the frame types handled here, never the raw field:
+        # a made-up type must not reach another bucket such as chat.connect.
+        scope = FRAME_THROTTLE_SCOPES.get(payload.get(FIELD_TYPE), FRAME_THROTTLE_SCOPES[FRAME_TYPE_MESSAGE])
+        return (
+            await limiter.ahit(f"{scope}.connection", self.channel_name)
+            or await limiter.ahit(scope, self._identity())
+        )
+
     async def _send_json(self, payload: Dict[str, Any]) -> None:
         """Send JSON payload to WebSocket client, converting ObjectIds to strings."""
         message = payload.get(FIELD_MESSAGE)
         if isinstance(message, dict) and FIELD_ID in message:
             payload = {**payload, FIELD_MESSAGE: {**message, FIELD_ID: str(message[FIELD_ID])}}
-        await self.send(json.dumps(payload))
+        await self.send(json.dumps(payload, default=_json_default))
     
     def _parse_json(self, text_data: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
         """Parse JSON string and validate it's a dictionary."""
@@ -137,10 +361,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None, ERROR_INVALID_JSON
     
     def _resolve_chat_id(self, payload: Dict[str, Any]) -> str:
-        """Resolve chat_id from payload or use existing session chat_id."""
+        """Resolve chat_id from payload or use existing session chat_id; the caller checks a named chat."""
         if provided_chat_id := payload.get(FIELD_CHAT_ID):
             chat_id = str(provided_chat_id)
-            self.chat_id = chat_id
             payload[FIELD_CHAT_ID] = chat_id
             return chat_id
         if self.chat_id:
@@ -0,0 +1,55 @@
+"""Opaque (timestamp, _id) cursors shared by the REST history API and socket resume."""
+
+import base64
+import json
+import uuid
+from typing import Any, List, Tuple
+
+from bson import ObjectId
+from rest_framework.exceptions import ValidationError
+
+from .data import from_mongo_time
+
+
+def _pack(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _unpack(value: str) -> Any:
+    return json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+
+
+def encode_cursor(timestamp: Any, doc_id: Any) -> str:
+    """Opaque, URL-safe cursor for a (timestamp, _id) position."""
+    return _pack([from_mongo_time(timestamp).isoformat(), str(doc_id)])
+
+
+def decode_cursor(value: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor; raises ValidationError for anything it did not produce."""
+    try:
+        timestamp, doc_id = _unpack(value)
+        return from_mongo_time(timestamp), str(doc_id)
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
+
+
+def decode_message_cursor(value: str) -> Tuple[Any, str]:
+    """decode_cursor for message positions, whose id must be an ObjectId."""
+    position = decode_cursor(value)
+    if not ObjectId.is_valid(position[1]):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
+    return position
+
+
+def encode_search_cursor(rank: float, timestamp: Any, row_id: Any) -> str:
+    """Cursor for a search result position: (rank, created_at, id) in the mirror."""
+    return _pack([rank, from_mongo_time(timestamp).isoformat(), str(row_id)])
+
+
+def decode_search_cursor(value: str) -> Tuple[float, Any, uuid.UUID]:
+    """Inverse of encode_search_cursor; raises ValidationError for anything it did not produce."""
+    try:
+        rank, timestamp, row_id = _unpack(value)
+        return float(rank), from_mongo_time(timestamp), uuid.UUID(row_id)
+    except (ValueError, TypeError, AttributeError):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
@@ -4,24 +4,94 @@ import uuid
 import asyncio
 import logging
 import base64
-from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
 from bson import ObjectId
 
+from django.conf import settings
 from django.utils import timezone
 
 from config.mongo import get_mongo_db
-from forms import gcp_storage
+from .buckets import MessageBuckets
 from .constants import (
     CHATS_COLLECTION, FIELD_FORM, MESSAGES_COLLECTION,
     CHAT_STATUS_DRAFT, FIELD_CHAT_ID, FIELD_USER, FIELD_TITLE, FIELD_STATUS,
     FIELD_CREATED_AT, FIELD_UPDATED_AT, FIELD_ROLE, FIELD_CONTENT, FIELD_ID,
-    FIELD_RESPONSE_FILE_URL, FIELD_DATA, FIELD_FILENAME,
+    FIELD_RESPONSE_FILE_URL, FIELD_DATA, FIELD_FILENAME, FIELD_EXPIRES_AT, FIELD_ARCHIVED_AT,
+    FIELD_MESSAGE_COUNT, FIELD_LAST_MESSAGE_AT, FIELD_LAST_MESSAGE_PREVIEW, CHAT_PREVIEW_LENGTH, CHAT_TITLE_LENGTH,
+    ROLE_USER, CHAT_LIST_PROJECTION, MESSAGE_HISTORY_PROJECTION, MESSAGE_LAYOUT_BUCKET,
     DEFAULT_FILENAME, FILE_PATH_PREFIX, FILE_PATH_MESSAGES, FILE_PATH_RESPONSE_PREFIX
 )
 
 logger = logging.getLogger(__name__)
 
 
+def to_mongo_time(value: datetime) -> datetime:
+    """
+    Render a datetime the way chat documents store timestamps: a BSON date.
+
+    BSON dates hold milliseconds, so the value is truncated here; documents
+    built in memory then compare equal to what a read returns.
+    """
+    value = from_mongo_time(value)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def from_mongo_time(value: Any) -> datetime:
+    """Parse a stored chat timestamp (BSON date or legacy ISO string) into an aware datetime."""
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, timezone.utc)
+
+
+def shorten(text: Any, length: int) -> str:
+    """Collapse whitespace and cut ``text`` to ``length`` characters for previews and titles."""
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= length else text[:length - 1].rstrip() + "…"
+
+
+def bucketed() -> bool:
+    """True when messages are stored in per-chat buckets (see chat.buckets)."""
+    return getattr(settings, "CHAT_MESSAGE_LAYOUT", "") == MESSAGE_LAYOUT_BUCKET
+
+
+def _keyset(field: str, position: Tuple[Any, Any], operator: str) -> Dict[str, Any]:
+    """Filter for documents strictly after (``$gt``) or before (``$lt``) a (field, _id) position."""
+    value, last_id = position
+    return {"$or": [
+        {field: {operator: value}},
+        {field: value, FIELD_ID: {operator: last_id}},
+    ]}
+
+
+def _page_after(collection, field: str, after: Optional[Tuple[Any, Any]], until: datetime, limit: int) -> List[Dict[str, Any]]:
+    """Documents ordered by (field, _id) strictly after ``after`` and with ``field`` before ``until``."""
+    query: Dict[str, Any] = {field: {"$lt": to_mongo_time(until)}}
+    if after is not None:
+        query.update(_keyset(field, after, "$gt"))
+    return list(collection.find(query).sort([(field, 1), (FIELD_ID, 1)]).limit(limit))
+
+
+def ensure_indexes() -> List[str]:
+    """Create the indexes the chat reads rely on; safe to call on every boot."""
+    db = get_mongo_db()
+    return [
+        # Chat list: a user's chats, most recently updated first.
+        db[CHATS_COLLECTION].create_index(
+            [(FIELD_USER, 1), (FIELD_UPDATED_AT, -1), (FIELD_ID, -1)], name="user_updated_at"
+        ),
+        # History paging and get_chat_history: one chat's messages in order.
+        db[MESSAGES_COLLECTION].create_index(
+            [(FIELD_CHAT_ID, 1), (FIELD_CREATED_AT, 1), (FIELD_ID, 1)], name="chat_created_at"
+        ),
+        # High-water marks followed by chat.sync; also the archiver's scan.
+        db[CHATS_COLLECTION].create_index([(FIELD_UPDATED_AT, 1), (FIELD_ID, 1)], name="updated_at"),
+        db[MESSAGES_COLLECTION].create_index([(FIELD_CREATED_AT, 1), (FIELD_ID, 1)], name="created_at"),
+        # Drafts that never received a message are removed by the TTL monitor.
+        db[CHATS_COLLECTION].create_index(FIELD_EXPIRES_AT, expireAfterSeconds=0, name="draft_expiry"),
+        *MessageBuckets.create_indexes(),
+    ]
+
+
 class ChatCollection:
     """MongoDB operations for the chats collection."""
     
@@ -31,19 +101,118 @@ class ChatCollection:
         collection = get_mongo_db()[CHATS_COLLECTION]
         chat_id = str(uuid.uuid4())
         user_id = str(user.id) if user and getattr(user, "is_authenticated", False) else None
+        now = to_mongo_time(timezone.now())
         
         chat_doc = {
             FIELD_ID: chat_id,
             FIELD_USER: user_id,
             FIELD_TITLE: title,
             FIELD_STATUS: status,
-            FIELD_CREATED_AT: timezone.now().isoformat(),
-            FIELD_UPDATED_AT: timezone.now().isoformat(),
+            FIELD_CREATED_AT: now,
+            FIELD_UPDATED_AT: now,
         }
+        # Cleared by the first record_message; until then the TTL index may drop it.
+        if ttl := getattr(settings, "CHAT_DRAFT_TTL_SECONDS", 0):
+            chat_doc[FIELD_EXPIRES_AT] = now + timedelta(seconds=ttl)
         await asyncio.to_thread(collection.insert_one, chat_doc)
         logger.debug("Created chat document: _id=%s", chat_id)
         return chat_doc
 
+    @staticmethod
+    async def find_resumable(chat_id: str, user=None) -> Optional[Dict[str, Any]]:
+        """Return a chat the socket's user may resume: their own, or an anonymous one for anonymous sockets."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        user_id = str(user.id) if user and getattr(user, "is_authenticated", False) else None
+        return await asyncio.to_thread(
+            collection.find_one, {FIELD_ID: str(chat_id), FIELD_USER: user_id}, {FIELD_ID: 1}
+        )
+
+    @staticmethod
+    async def open_chat(chat_id: str) -> None:
+        """Make a chat ready to take a message: restore its messages if it was archived."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        doc = await asyncio.to_thread(collection.find_one, {FIELD_ID: str(chat_id)}, {FIELD_ARCHIVED_AT: 1})
+        if doc and FIELD_ARCHIVED_AT in doc:
+            from .archive import ChatArchive
+
+            await asyncio.to_thread(ChatArchive.rehydrate, str(chat_id))
+
+    @staticmethod
+    def record_message(message_doc: Dict[str, Any]) -> None:
+        """
+        Fold a new message into its chat's summary fields (synchronous, for workers).
+
+        One pipeline update bumps ``message_count``, advances
+        ``last_message_at``/``updated_at``, refreshes the preview unless a
+        newer message already did, titles an untitled chat after its first
+        user message and clears the draft expiry.
+        """
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        created_at = message_doc[FIELD_CREATED_AT]
+        content = message_doc.get(FIELD_CONTENT)
+        summary: Dict[str, Any] = {
+            FIELD_MESSAGE_COUNT: {"$add": [{"$ifNull": [f"${FIELD_MESSAGE_COUNT}", 0]}, 1]},
+            FIELD_LAST_MESSAGE_AT: {"$max": [f"${FIELD_LAST_MESSAGE_AT}", created_at]},
+            FIELD_UPDATED_AT: {"$max": [f"${FIELD_UPDATED_AT}", created_at]},
+            FIELD_LAST_MESSAGE_PREVIEW: {"$cond": [
+                {"$gte": [created_at, {"$ifNull": [f"${FIELD_LAST_MESSAGE_AT}", created_at]}]},
+                {"$literal": shorten(content, CHAT_PREVIEW_LENGTH)},
+                f"${FIELD_LAST_MESSAGE_PREVIEW}",
+            ]},
+        }
+        if message_doc.get(FIELD_ROLE) == ROLE_USER:
+            summary[FIELD_TITLE] = {"$cond": [
+                {"$eq": [{"$ifNull": [f"${FIELD_TITLE}", ""]}, ""]},
+                {"$literal": shorten(content, CHAT_TITLE_LENGTH)},
+                f"${FIELD_TITLE}",
+            ]}
+        collection.update_one(
+            {FIELD_ID: str(message_doc[FIELD_CHAT_ID])},
+            [{"$set": summary}, {"$unset": [FIELD_EXPIRES_AT]}],
+        )
+
+    @staticmethod
+    def find_user_chat_ids(user_id: str, limit: int) -> List[str]:
+        """Return up to ``limit`` chat ids owned by a user (synchronous, for workers)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        cursor = collection.find({FIELD_USER: str(user_id)}, {FIELD_ID: 1}).limit(limit)
+        return [doc[FIELD_ID] for doc in cursor]
+
+    @staticmethod
+    def get_user_chat(chat_id: str, user_id: str, projection: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+        """Return a chat only if it belongs to the user (synchronous, for views)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        return collection.find_one({FIELD_ID: str(chat_id), FIELD_USER: str(user_id)}, projection or CHAT_LIST_PROJECTION)
+
+    @staticmethod
+    def page_user_chats(user_id: str, before: Optional[Tuple[datetime, str]], limit: int) -> List[Dict[str, Any]]:
+        """A user's chats, most recently updated first, after a list cursor (synchronous, for views)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        query: Dict[str, Any] = {FIELD_USER: str(user_id)}
+        if before is not None:
+            query.update(_keyset(FIELD_UPDATED_AT, (to_mongo_time(before[0]), before[1]), "$lt"))
+        cursor = collection.find(query, CHAT_LIST_PROJECTION).sort([(FIELD_UPDATED_AT, -1), (FIELD_ID, -1)])
+        return list(cursor.limit(limit))
+
+    @staticmethod
+    def find_chats(chat_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetch chat documents by id (synchronous, for workers)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        return list(collection.find({FIELD_ID: {"$in": chat_ids}}))
+
+    @staticmethod
+    def page_updated_after(after: Optional[Tuple[datetime, str]], until: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Chats ordered by (updated_at, _id) after a sync position (synchronous, for workers)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        position = (to_mongo_time(after[0]), after[1]) if after else None
+        return _page_after(collection, FIELD_UPDATED_AT, position, until, limit)
+
+    @staticmethod
+    def delete_chats(chat_ids: List[str]) -> int:
+        """Delete chat documents by id in one round trip (synchronous, for workers)."""
+        collection = get_mongo_db()[CHATS_COLLECTION]
+        return collection.delete_many({FIELD_ID: {"$in": chat_ids}}).deleted_count
+
 
 class MessageCollection:
     """MongoDB operations for the messages collection."""
@@ -55,56 +224,176 @@ class MessageCollection:
             FIELD_CHAT_ID: str(chat_id),
             FIELD_ROLE: validated_data.get(FIELD_ROLE),
             FIELD_CONTENT: validated_data.get(FIELD_CONTENT),
-            FIELD_CREATED_AT: timezone.now().isoformat(),
+            FIELD_CREATED_AT: to_mongo_time(timezone.now()),
             FIELD_FORM: None
         }
     
     @staticmethod
     async def insert_message(message_doc: Dict[str, Any]) -> ObjectId:
-        """Insert a message document into MongoDB."""
-        collection = get_mongo_db()[MESSAGES_COLLECTION]
-        result = await asyncio.to_thread(collection.insert_one, message_doc)
-        logger.debug("Message inserted: _id=%s", result.inserted_id)
-        return result.inserted_id
+        """Insert a message document into MongoDB and update its chat's summary."""
+        return await asyncio.to_thread(MessageCollection._insert_and_record, message_doc)
+
+    @staticmethod
+    def _insert_and_record(message_doc: Dict[str, Any]) -> ObjectId:
+        if bucketed():
+            message_id = MessageBuckets.insert(message_doc)
+        else:
+            collection = get_mongo_db()[MESSAGES_COLLECTION]
+            message_id = collection.insert_one(message_doc).inserted_id
+        logger.debug("Message inserted: _id=%s", message_id)
+        ChatCollection.record_message(message_doc)
+        return message_id
     
     @staticmethod
     async def get_chat_history(chat_id: str, exclude_message_id: Optional[ObjectId] = None) -> List[Dict[str, Any]]:
         """Retrieve chat history (all previous messages) for a given chat_id."""
-        collection = get_mongo_db()[MESSAGES_COLLECTION]
-        query = {FIELD_CHAT_ID: str(chat_id)}
-        if exclude_message_id:
-            query[FIELD_ID] = {"$ne": exclude_message_id}
-        
-        messages = await asyncio.to_thread(
-            lambda: list(collection.find(query).sort(FIELD_CREATED_AT, 1))
-        )
+        if bucketed():
+            messages = await asyncio.to_thread(MessageBuckets.history, str(chat_id))
+            messages = [msg for msg in messages if msg[FIELD_ID] != exclude_message_id]
+        else:
+            collection = get_mongo_db()[MESSAGES_COLLECTION]
+            query = {FIELD_CHAT_ID: str(chat_id)}
+            if exclude_message_id:
+                query[FIELD_ID] = {"$ne": exclude_message_id}
+            messages = await asyncio.to_thread(
+                lambda: list(collection.find(query).sort([(FIELD_CREATED_AT, 1), (FIELD_ID, 1)]))
+            )
         
-        # Convert ObjectIds to strings and remove internal fields
+        # Convert ObjectIds and dates to strings and remove internal fields
         history = []
         for msg in messages:
-            msg_copy = {**msg, FIELD_ID: str(msg[FIELD_ID])}
+            msg_copy = {
+                **msg,
+                FIELD_ID: str(msg[FIELD_ID]),
+                FIELD_CREATED_AT: from_mongo_time(msg[FIELD_CREATED_AT]).isoformat(),
+            }
             msg_copy.pop(FIELD_RESPONSE_FILE_URL, None)
             history.append(msg_copy)
         return history
     
     @staticmethod
-    async def upload_response_file(response_file: Dict[str, Any], message_id: ObjectId, chat_id: str) -> None:
-        """Upload response file from FastAPI to GCP storage and update message document."""
-        try:
-            base64_data = response_file.get(FIELD_DATA) if isinstance(response_file, dict) else response_file
-            filename = response_file.get(FIELD_FILENAME, DEFAULT_FILENAME) if isinstance(response_file, dict) else DEFAULT_FILENAME
-            
-            file_bytes = base64.b64decode(base64_data)
-            destination_path = f"{FILE_PATH_PREFIX}/{chat_id}/{FILE_PATH_MESSAGES}/{message_id}/{FILE_PATH_RESPONSE_PREFIX}{filename}"
-            pdf_url = await asyncio.to_thread(
-                gcp_storage.upload_pdf, file_bytes=file_bytes, destination_path=destination_path
-            )
-            
-            collection = get_mongo_db()[MESSAGES_COLLECTION]
-            message_obj_id = message_id if isinstance(message_id, ObjectId) else ObjectId(str(message_id))
-            await asyncio.to_thread(
-                collection.update_one, {FIELD_ID: message_obj_id}, {"$set": {FIELD_RESPONSE_FILE_URL: pdf_url}}
+    def page_messages(
+        chat_id: str,
+        after: Optional[Tuple[datetime, str]] = None,
+        before: Optional[Tuple[datetime, str]] = None,
+        latest: bool = False,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        One page of a chat's messages in (created_at, _id) order (synchronous, for views).
+
+        ``after`` pages forward from a cursor; ``before`` returns the page that
+        precedes it and ``latest`` the final page (both still oldest first).
+        In the document layout every variant rides the chat_created_at index.
+        """
+        if bucketed():
+            messages = MessageBuckets.page(
+                str(chat_id),
+                after=(to_mongo_time(after[0]), ObjectId(after[1])) if after else None,
+                before=(to_mongo_time(before[0]), ObjectId(before[1])) if before else None,
+                latest=latest,
+                limit=limit,
             )
-            logger.debug("Response file uploaded: message_id=%s", message_id)
-        except Exception as exc:
-            logger.exception("Failed to upload response file: message_id=%s", message_id)
+            return [{field: msg[field] for field in MESSAGE_HISTORY_PROJECTION if field in msg} for msg in messages]
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        query: Dict[str, Any] = {FIELD_CHAT_ID: str(chat_id)}
+        order = 1
+        if after is not None:
+            query.update(_keyset(FIELD_CREATED_AT, (to_mongo_time(after[0]), ObjectId(after[1])), "$gt"))
+        elif before is not None:
+            query.update(_keyset(FIELD_CREATED_AT, (to_mongo_time(before[0]), ObjectId(before[1])), "$lt"))
+            order = -1
+        elif latest:
+            order = -1
+        cursor = collection.find(query, MESSAGE_HISTORY_PROJECTION).sort([(FIELD_CREATED_AT, order), (FIELD_ID, order)])
+        messages = list(cursor.limit(limit))
+        return messages[::order]
+
+    @staticmethod
+    def page_created_after(after: Optional[Tuple[datetime, str]], until: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Messages ordered by (created_at, _id) after a sync position (synchronous, for workers)."""
+        position = (to_mongo_time(after[0]), ObjectId(after[1])) if after else None
+        if bucketed():
+            return MessageBuckets.page_created_after(position, to_mongo_time(until), limit)
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        return _page_after(collection, FIELD_CREATED_AT, position, until, limit)
+
+    @staticmethod
+    def find_for_chat(chat_id: str) -> List[Dict[str, Any]]:
+        """Every message of a chat from either layout, oldest first (synchronous, for workers)."""
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        messages = list(collection.find({FIELD_CHAT_ID: str(chat_id)}))
+        messages.extend(MessageBuckets.history(str(chat_id)))
+        return sorted(messages, key=lambda msg: (msg[FIELD_CREATED_AT], msg[FIELD_ID]))
+
+    @staticmethod
+    def has_messages_since(chat_id: str, since: datetime) -> bool:
+        """True if the chat got a message at or after ``since`` in either layout (synchronous, for workers)."""
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        since = to_mongo_time(since)
+        query = {FIELD_CHAT_ID: str(chat_id), FIELD_CREATED_AT: {"$gte": since}}
+        return bool(
+            collection.find_one(query, {FIELD_ID: 1}) or MessageBuckets.has_messages_since(str(chat_id), since)
+        )
+
+    @staticmethod
+    def restore(chat_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        Write previously stored messages back into the current layout
+        (synchronous, for workers). Messages already present are replaced, so
+        an interrupted restore can simply be repeated.
+        """
+        messages = [{**msg, FIELD_CHAT_ID: str(chat_id)} for msg in messages]
+        if bucketed():
+            MessageBuckets.restore(str(chat_id), messages)
+            return
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        collection.delete_many({FIELD_CHAT_ID: str(chat_id), FIELD_ID: {"$in": [msg[FIELD_ID] for msg in messages]}})
+        if messages:
+            collection.insert_many(messages)
+
+    @staticmethod
+    def delete_for_chats(chat_ids: List[str]) -> int:
+        """Delete every message of the given chats, in either layout (synchronous, for workers)."""
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        deleted = collection.delete_many({FIELD_CHAT_ID: {"$in": chat_ids}}).deleted_count
+        return deleted + MessageBuckets.delete_for_chats(chat_ids)
+
+    @staticmethod
+    def delete_messages(chat_id: str, message_ids: List[Any]) -> int:
+        """Delete only the given messages of one chat, in either layout (synchronous, for workers)."""
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        deleted = collection.delete_many({FIELD_CHAT_ID: str(chat_id), FIELD_ID: {"$in": list(message_ids)}}).deleted_count
+        return deleted + MessageBuckets.delete_messages(str(chat_id), message_ids)
+
+    @staticmethod
+    def decode_response_file(response_file: Any) -> Tuple[bytes, str]:
+        """Decode an AI file payload (base64 string or {data, filename} dict) into (bytes, filename)."""
+        if isinstance(response_file, dict):
+            return base64.b64decode(response_file.get(FIELD_DATA)), response_file.get(FIELD_FILENAME, DEFAULT_FILENAME)
+        return base64.b64decode(response_file), DEFAULT_FILENAME
+
+    @staticmethod
+    def response_file_path(chat_id: str, message_id: str, filename: str) -> str:
+        """Deterministic bucket path for a message's response file, so re-uploads overwrite."""
+        return f"{FILE_PATH_PREFIX}/{chat_id}/{FILE_PATH_MESSAGES}/{message_id}/{FILE_PATH_RESPONSE_PREFIX}{filename}"
+
+    @staticmethod
+    def get_response_file_url(message_id: str) -> Optional[str]:
+        """Return the stored response file URL for a message, if any (synchronous, for workers)."""
+        if bucketed():
+            return MessageBuckets.get_response_file_url(ObjectId(str(message_id)))
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        doc = collection.find_one({FIELD_ID: ObjectId(str(message_id))}, {FIELD_RESPONSE_FILE_URL: 1})
+        return doc.get(FIELD_RESPONSE_FILE_URL) if doc else None
+
+    @staticmethod
+    def set_response_file_url(message_id: str, url: str) -> None:
+        """Record the uploaded response file URL on a message (synchronous, for workers)."""
+        if bucketed():
+            MessageBuckets.set_response_file_url(ObjectId(str(message_id)), url)
+            logger.debug("Response file URL set: message_id=%s", message_id)
+            return
+        collection = get_mongo_db()[MESSAGES_COLLECTION]
+        collection.update_one({FIELD_ID: ObjectId(str(message_id))}, {"$set": {FIELD_RESPONSE_FILE_URL: url}})
+        logger.debug("Response file URL set: message_id=%s", message_id)
@@ -0,0 +1,355 @@
+"""In-process stand-ins for MongoDB and the FastAPI consultant, used by tests and benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import random
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# ``$type`` aliases the chat code queries for.
+_BSON_TYPES = {"string": str, "date": datetime}
+
+
+class _InsertOneResult:
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class _UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id: Any = None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class _DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+def _matches_operator(value: Any, operator: str, operand: Any, present: bool) -> bool:
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if operator == "$exists":
+        return present == bool(operand)
+    if operator == "$type":
+        return present and isinstance(value, _BSON_TYPES[operand])
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise NotImplementedError(f"Unsupported query operator: {operator}")
+
+
+def _resolve(doc: Dict[str, Any], field: str) -> Tuple[bool, List[Any]]:
+    """Values at a dotted path, fanning out over arrays like MongoDB does."""
+    values: List[Any] = [doc]
+    for part in field.split("."):
+        found = []
+        for value in values:
+            items = value if isinstance(value, list) else [value]
+            found.extend(item[part] for item in items if isinstance(item, dict) and part in item)
+        values = found
+    return bool(values), values
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluate the subset of the MongoDB query language the chat code uses."""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        if field == "$and":
+            if not all(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        if "." in field:
+            present, values = _resolve(doc, field)
+            if not any(_matches({"value": value}, {"value": condition}) for value in values or [None]):
+                return False
+            continue
+        present = field in doc
+        value = doc.get(field)
+        if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+            if not all(_matches_operator(value, op, operand, present) for op, operand in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _evaluate(doc: Dict[str, Any], expression: Any) -> Any:
+    """Evaluate the aggregation expressions used in pipeline updates."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:])
+    if not isinstance(expression, dict):
+        return expression
+    (operator, operand), = expression.items()
+    if operator == "$literal":
+        return operand
+    args = [_evaluate(doc, arg) for arg in operand]
+    if operator == "$add":
+        return sum(args)
+    if operator == "$ifNull":
+        return args[0] if args[0] is not None else args[1]
+    if operator == "$max":
+        return max((arg for arg in args if arg is not None), default=None)
+    if operator == "$cond":
+        return args[1] if args[0] else args[2]
+    if operator == "$eq":
+        return args[0] == args[1]
+    if operator == "$gte":
+        return args[0] >= args[1]
+    raise NotImplementedError(f"Unsupported expression operator: {operator}")
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    included = {field for field, flag in projection.items() if flag}
+    if included:
+        keep = included | ({"_id"} if projection.get("_id", 1) else set())
+        out = {field: copy.deepcopy(value) for field, value in doc.items() if field in keep}
+        for field, flag in projection.items():
+            if isinstance(flag, dict) and "$elemMatch" in flag and isinstance(out.get(field), list):
+                out[field] = [item for item in out[field] if _matches(item, flag["$elemMatch"])][:1]
+        return out
+    return {field: copy.deepcopy(value) for field, value in doc.items() if field not in projection}
+
+
+class FakeCursor:
+    """Eager cursor supporting sort/skip/limit chaining and iteration."""
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+
+    def sort(self, key_or_list, direction: int = 1) -> "FakeCursor":
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda doc: (doc.get(field) is not None, doc.get(field)), reverse=order < 0)
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._docs = self._docs[count:]
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class FakeCollection:
+    """Thread-safe, dict-backed subset of ``pymongo.collection.Collection``."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def insert_one(self, document: Dict[str, Any]) -> _InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        with self._lock:
+            self._docs.append(copy.deepcopy(document))
+        return _InsertOneResult(document["_id"])
+
+    def insert_many(self, documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            self.insert_one(document)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        with self._lock:
+            docs = [_project(doc, projection) for doc in self._docs if _matches(doc, query or {})]
+        return FakeCursor(docs)
+
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None):
+        return next(iter(self.find(query, projection).limit(1)), None)
+
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        with self._lock:
+            return sum(1 for doc in self._docs if _matches(doc, query))
+
+    def update_one(self, query: Dict[str, Any], update, upsert: bool = False) -> _UpdateResult:
+        with self._lock:
+            for doc in self._docs:
+                if _matches(doc, query):
+                    if isinstance(update, list):
+                        self._apply_pipeline(doc, update)
+                    else:
+                        self._apply(doc, update, inserting=False, query=query)
+                    return _UpdateResult(1, 1)
+            if not upsert:
+                return _UpdateResult(0, 0)
+            doc = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            self._apply(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._docs.append(doc)
+            return _UpdateResult(0, 0, doc["_id"])
+
+    def delete_one(self, query: Dict[str, Any]) -> _DeleteResult:
+        with self._lock:
+            for index, doc in enumerate(self._docs):
+                if _matches(doc, query):
+                    del self._docs[index]
+                    return _DeleteResult(1)
+        return _DeleteResult(0)
+
+    def delete_many(self, query: Dict[str, Any]) -> _DeleteResult:
+        with self._lock:
+            kept = [doc for doc in self._docs if not _matches(doc, query)]
+            deleted = len(self._docs) - len(kept)
+            self._docs = kept
+        return _DeleteResult(deleted)
+
+    def create_index(self, keys, **kwargs) -> str:
+        fields = keys if isinstance(keys, list) else [(keys, 1)]
+        return kwargs.get("name") or "_".join(f"{field}_{order}" for field, order in fields)
+
+    @staticmethod
+    def _apply_pipeline(doc: Dict[str, Any], pipeline: List[Dict[str, Any]]) -> None:
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            if operator == "$set":
+                # Every expression in a stage sees the document as it was before the stage.
+                values = {field: _evaluate(doc, expression) for field, expression in spec.items()}
+                doc.update(copy.deepcopy(values))
+            elif operator == "$unset":
+                for field in spec:
+                    doc.pop(field, None)
+            else:
+                raise NotImplementedError(f"Unsupported pipeline stage: {operator}")
+
+    @staticmethod
+    def _apply(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool, query: Optional[Dict[str, Any]] = None) -> None:
+        for operator, fields in update.items():
+            if operator == "$setOnInsert" and not inserting:
+                continue
+            for field, value in fields.items():
+                if ".$." in field:
+                    # Positional update: the first array element matched by the query.
+                    array, rest = field.split(".$.", 1)
+                    conditions = {
+                        key[len(array) + 1:]: condition for key, condition in (query or {}).items()
+                        if key.startswith(f"{array}.")
+                    }
+                    element = next(item for item in doc[array] if _matches(item, conditions))
+                    element[rest] = copy.deepcopy(value)
+                elif operator in ("$set", "$setOnInsert"):
+                    doc[field] = copy.deepcopy(value)
+                elif operator == "$unset":
+                    doc.pop(field, None)
+                elif operator == "$inc":
+                    doc[field] = doc.get(field, 0) + value
+                elif operator == "$push":
+                    doc.setdefault(field, []).append(copy.deepcopy(value))
+                elif operator == "$max":
+                    doc[field] = value if field not in doc else max(doc[field], value)
+                elif operator == "$min":
+                    doc[field] = value if field not in doc else min(doc[field], value)
+                else:
+                    raise NotImplementedError(f"Unsupported update operator: {operator}")
+
+
+class FakeDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, FakeCollection] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(name)
+            return self._collections[name]
+
+    def command(self, name: str, *args, **kwargs) -> Dict[str, Any]:
+        if name != "ping":
+            raise NotImplementedError(f"Unsupported command: {name}")
+        return {"ok": 1.0}
+
+
+class InMemoryMongoClient:
+    """Drop-in for ``pymongo.MongoClient``; assign to ``config.mongo._client``."""
+
+    def __init__(self):
+        self._databases: Dict[str, FakeDatabase] = {}
+        self._lock = threading.Lock()
+        self.admin = self["admin"]
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = FakeDatabase(name)
+            return self._databases[name]
+
+    def drop_database(self, name: str) -> None:
+        with self._lock:
+            self._databases.pop(name, None)
+
+    def close(self) -> None:
+        self._databases.clear()
+
+
+def fake_consultant_transport(latency_ms: float = 0.0, jitter_ms: float = 0.0, reply: str = "Noted."):
+    """
+    Build an ``httpx.MockTransport`` that answers like the FastAPI consultant.
+
+    Each request sleeps ``latency_ms`` (plus up to ``jitter_ms``) without
+    blocking the event loop, then echoes back a chatbot message. Install it
+    with ``chat.fastapi_client._client = httpx.AsyncClient(transport=...)``.
+    """
+    import httpx
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        payload = json.loads(request.content or b"{}")
+        return httpx.Response(200, json={
+            "role": "chatbot",
+            "content": f"{reply} ({len(payload.get('chat_history') or [])} earlier messages)",
+        })
+
+    return httpx.MockTransport(handler)
+
+
+def install_fakes(latency_ms: float = 0.0, jitter_ms: float = 0.0) -> Tuple[Any, Any]:
+    """Point the Mongo and FastAPI module clients at the stand-ins and return the previous ones."""
+    import httpx
+
+    from config import mongo
+    from . import fastapi_client
+
+    previous = (mongo._client, fastapi_client._client)
+    mongo._client = InMemoryMongoClient()
+    fastapi_client._client = httpx.AsyncClient(transport=fake_consultant_transport(latency_ms, jitter_ms))
+    fastapi_client._coalescer.clear()
+    return previous
+
+
+def restore_clients(previous: Tuple[Any, Any]) -> None:
+    """Undo :func:`install_fakes`."""
+    from config import mongo
+    from . import fastapi_client
+
+    mongo._client, fastapi_client._client = previous
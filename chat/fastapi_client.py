@@ -1,23 +1,75 @@
 """FastAPI client for chat AI service."""
 
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import json
 import logging
-from typing import Optional, Dict, Any, List
+import random
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Awaitable, Callable, Tuple
+
+from urllib.parse import urlsplit
 
-import httpx
 from django.conf import settings
 
+from config import deadline, metrics
+
 from .constants import (
-    FASTAPI_TIMEOUT,
+    FASTAPI_TIMEOUT, FASTAPI_RETRY_STATUSES,
     FIELD_CHAT_ID,
     FIELD_MESSAGE,
     FIELD_NEW_MESSAGE, FIELD_CHAT_HISTORY, FIELD_FORM,
     FIELD_REFRESH_INDEX,
     FIELD_SESSION_ID,
-    HTTP_ERROR
+    FIELD_ID, FIELD_ROLE, FIELD_CONTENT, ROLE_USER, ERROR_DEADLINE_EXCEEDED,
+    HTTP_ERROR, HTTP_OK
 )
 
+if TYPE_CHECKING:
+    import httpx
+
 logger = logging.getLogger(__name__)
 
+_client: Optional[httpx.AsyncClient] = None
+
+REQUEST_SECONDS = metrics.histogram(
+    "fastapi_request_seconds",
+    "Latency of calls to the FastAPI AI service; outcome is the HTTP status or ``error``.",
+    ["endpoint", "outcome"],
+)
+COALESCED = metrics.counter(
+    "fastapi_coalesced_total",
+    "Consultant calls answered by an identical in-flight call or the recent-result cache.",
+    ["source"],
+)
+EXTRA_ATTEMPTS = metrics.counter(
+    "fastapi_extra_attempts_total",
+    "Consultant attempts beyond the first: ``retry`` after a failure, ``hedge`` after a slow answer.",
+    ["kind"],
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide AsyncClient so keep-alive connections are reused across turns."""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx
+
+        _client = httpx.AsyncClient(timeout=FASTAPI_TIMEOUT)
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client (called on lifespan shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 class ErrorResponse:
     """Mock response object for FastAPI errors."""
@@ -30,6 +82,108 @@ class ErrorResponse:
         return {"error": self.text}
 
 
+def request_key(endpoint: str, session_id: str, message: str, chat_history, refresh_index: bool) -> str:
+    """
+    Identity of a consultant call for coalescing.
+
+    The history is reduced to its message ids. Trailing user messages
+    identical to ``message`` are dropped first: a double submit inserts the
+    same question twice, and the second copy sees the first in its history.
+    """
+    history = list(chat_history or [])
+    while history and history[-1].get(FIELD_ROLE) == ROLE_USER and history[-1].get(FIELD_CONTENT) == message:
+        history.pop()
+    identity = [endpoint, session_id, message, [str(item.get(FIELD_ID)) for item in history], refresh_index]
+    return hashlib.sha256(json.dumps(identity).encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Run one call per key at a time and share its result with identical callers.
+
+    The call runs in its own task, so a caller that goes away (a closed
+    socket) does not cancel it for the others; it is cancelled once the last
+    caller has gone. That task starts from an empty context rather than the
+    first caller's, under its own budget of ``budget`` seconds (a whole turn),
+    so it outlives a first caller that was already short on time while its
+    attempts stay bounded. Each caller bounds its own wait by its own
+    ``deadline.remaining()``. Results accepted by ``keep`` are then served for
+    ``ttl`` seconds, which covers retries that land just after completion.
+    State is per process.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024, budget: Optional[Callable[[], float]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.budget = budget or (lambda: 0)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._recent: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]], keep: Callable[[Any], bool]) -> Any:
+        recent = self._recent.get(key)
+        if recent is not None:
+            if recent[0] > time.monotonic():
+                COALESCED.inc(source="cache")
+                return recent[1]
+            del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            COALESCED.inc(source="inflight")
+        else:
+            deadline.check()
+            task = asyncio.get_running_loop().create_task(self._bounded(call), context=contextvars.Context())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done, keep))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await self._wait(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                task.cancel()
+
+    async def _bounded(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        with deadline.budget(self.budget()):
+            return await call()
+
+    @staticmethod
+    async def _wait(task: asyncio.Task) -> Any:
+        left = deadline.remaining()
+        if left is None:
+            return await asyncio.shield(task)
+        deadline.check()
+        try:
+            async with asyncio.timeout(left) as wait:
+                return await asyncio.shield(task)
+        except TimeoutError:
+            if not wait.expired():
+                raise
+            raise deadline.DeadlineExceeded() from None
+
+    def _finished(self, key: str, task: asyncio.Task, keep: Callable[[Any], bool]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if self.ttl <= 0 or task.cancelled() or task.exception() is not None or not keep(task.result()):
+            return
+        self._recent[key] = (time.monotonic() + self.ttl, task.result())
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    def clear(self) -> None:
+        self._recent.clear()
+
+
+_coalescer = SingleFlight(
+    ttl=getattr(settings, "FASTAPI_COALESCE_TTL", 5.0),
+    max_entries=getattr(settings, "FASTAPI_COALESCE_MAX_ENTRIES", 1024),
+    budget=lambda: getattr(settings, "CHAT_TURN_DEADLINE_SECONDS", 0),
+)
+
+
 class FastAPIClient:
     """Client for communicating with FastAPI chat service."""
     
@@ -44,6 +198,9 @@ class FastAPIClient:
     ) -> httpx.Response:
         """
         Send message and chat history to FastAPI service and get AI response.
+
+        Identical calls (see ``request_key``) share one upstream request, and
+        a successful answer is reused for FASTAPI_COALESCE_TTL seconds.
         
         Args:
             message: Current message document
@@ -59,12 +216,98 @@ class FastAPIClient:
             FIELD_CHAT_HISTORY: chat_history if chat_history else None,
             FIELD_REFRESH_INDEX: refresh_index
         }
+        key = request_key(endpoint, session_id, message, chat_history, refresh_index)
+        return await _coalescer.run(
+            key,
+            lambda: FastAPIClient._post(endpoint, payload),
+            keep=lambda response: response.status_code == HTTP_OK,
+        )
+
+    @staticmethod
+    async def _post(endpoint: str, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        POST with up to FASTAPI_RETRIES retries on transport errors and 502/503/504.
 
+        Retries wait a full-jitter exponential backoff (FASTAPI_RETRY_BACKOFF
+        doubled per attempt) and are skipped when the wait would outlast the
+        current deadline; the last failure is returned as is.
+        """
+        retries = getattr(settings, "FASTAPI_RETRIES", 2)
+        backoff = getattr(settings, "FASTAPI_RETRY_BACKOFF", 0.2)
+        attempt = 0
+        while True:
+            response = await FastAPIClient._hedged(endpoint, payload)
+            if not _retryable(response) or attempt >= retries:
+                return response
+            delay = random.uniform(0, backoff * 2 ** attempt)
+            left = deadline.remaining()
+            if left is not None and left <= delay:
+                return response
+            EXTRA_ATTEMPTS.inc(kind="retry")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def _hedged(endpoint: str, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        One attempt, hedged with a second identical one when the first has not
+        answered after FASTAPI_HEDGE_AFTER seconds (0 disables hedging). The
+        first usable answer wins and the other request is cancelled.
+        """
+        hedge_after = getattr(settings, "FASTAPI_HEDGE_AFTER", 0.0)
+        if hedge_after <= 0:
+            return await FastAPIClient._attempt(endpoint, payload)
+        pending = {asyncio.ensure_future(FastAPIClient._attempt(endpoint, payload))}
         try:
-            async with httpx.AsyncClient(timeout=FASTAPI_TIMEOUT) as client:
-                return await client.post(endpoint, json=payload)
-        except httpx.RequestError as exc:
-            logger.exception("Failed to send request to FastAPI service")
-            return ErrorResponse(str(exc))
+            done, pending = await asyncio.wait(pending, timeout=hedge_after)
+            left = deadline.remaining()
+            if not done and (left is None or left > 0):
+                EXTRA_ATTEMPTS.inc(kind="hedge")
+                pending.add(asyncio.ensure_future(FastAPIClient._attempt(endpoint, payload)))
+            while True:
+                for task in done:
+                    if task.exception() is None and not _retryable(task.result()):
+                        return task.result()
+                if not pending:
+                    return task.result()
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
 
-    
+    @staticmethod
+    async def _attempt(endpoint: str, payload: Dict[str, Any]) -> httpx.Response:
+        """
+        A single POST bounded by the remaining deadline, capped at FASTAPI_TIMEOUT.
+
+        httpx applies its timeout to each phase (connect, each read); the
+        outer ``asyncio.timeout`` bounds the request as a whole.
+        """
+        import httpx
+
+        timeout = FASTAPI_TIMEOUT
+        left = deadline.remaining()
+        if left is not None:
+            deadline.check()
+            timeout = min(timeout, left)
+        with metrics.timed(REQUEST_SECONDS, endpoint=urlsplit(endpoint).path) as span:
+            try:
+                async with asyncio.timeout(timeout):
+                    response = await get_http_client().post(endpoint, json=payload, timeout=timeout)
+            except (TimeoutError, httpx.TimeoutException) as exc:
+                if timeout < FASTAPI_TIMEOUT:
+                    span.outcome = ERROR_DEADLINE_EXCEEDED
+                    raise deadline.DeadlineExceeded() from exc
+                span.outcome = metrics.OUTCOME_ERROR
+                logger.exception("FastAPI service timed out")
+                return ErrorResponse(str(exc))
+            except httpx.RequestError as exc:
+                span.outcome = metrics.OUTCOME_ERROR
+                logger.exception("Failed to send request to FastAPI service")
+                return ErrorResponse(str(exc))
+            span.outcome = str(response.status_code)
+            return response
+
+
+def _retryable(response: httpx.Response) -> bool:
+    return isinstance(response, ErrorResponse) or response.status_code in FASTAPI_RETRY_STATUSES
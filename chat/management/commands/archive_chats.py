@@ -0,0 +1,28 @@
+"""Compress inactive chats into chat_archives, or restore one."""
+
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from chat.archive import ChatArchive, archive_inactive
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive chats idle for longer than CHAT_ARCHIVE_AFTER_DAYS (or --older-than-days) "
+        "into compressed chat_archives documents. --rehydrate <chat_id> restores one chat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=None, help="Idle age to archive.")
+        parser.add_argument("--limit", type=int, default=None, help="Chats to archive in this run.")
+        parser.add_argument("--rehydrate", metavar="CHAT_ID", help="Restore one archived chat instead.")
+
+    def handle(self, *args, **options):
+        if options["rehydrate"]:
+            restored = ChatArchive.rehydrate(options["rehydrate"])
+            self.stdout.write(json.dumps({"restored": restored}))
+            return
+        older_than = timedelta(days=options["older_than_days"]) if options["older_than_days"] is not None else None
+        self.stdout.write(json.dumps(archive_inactive(older_than=older_than, limit=options["limit"])))
@@ -0,0 +1,42 @@
+"""Fill the per-chat summary fields for chats written before they existed."""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from chat.constants import (
+    CHATS_COLLECTION, CHAT_PREVIEW_LENGTH, CHAT_TITLE_LENGTH, ROLE_USER,
+    FIELD_ID, FIELD_TITLE, FIELD_ROLE, FIELD_CONTENT, FIELD_CREATED_AT, FIELD_UPDATED_AT,
+    FIELD_MESSAGE_COUNT, FIELD_LAST_MESSAGE_AT, FIELD_LAST_MESSAGE_PREVIEW,
+)
+from chat.data import MessageCollection, shorten
+from config.mongo import get_mongo_db
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute message_count, last_message_at, the preview and a missing title for chats that "
+        "have no message_count yet. New messages maintain these fields themselves; safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=0, help="Chats to backfill; 0 means all.")
+
+    def handle(self, *args, **options):
+        chats = get_mongo_db()[CHATS_COLLECTION]
+        cursor = chats.find({FIELD_MESSAGE_COUNT: {"$exists": False}}, {FIELD_TITLE: 1, FIELD_UPDATED_AT: 1})
+        filled = 0
+        for chat in cursor.limit(options["limit"]):
+            messages = MessageCollection.find_for_chat(chat[FIELD_ID])
+            summary = {FIELD_MESSAGE_COUNT: len(messages)}
+            if messages:
+                last = messages[-1]
+                summary[FIELD_LAST_MESSAGE_AT] = last[FIELD_CREATED_AT]
+                summary[FIELD_LAST_MESSAGE_PREVIEW] = shorten(last.get(FIELD_CONTENT), CHAT_PREVIEW_LENGTH)
+                summary[FIELD_UPDATED_AT] = max(chat[FIELD_UPDATED_AT], last[FIELD_CREATED_AT])
+                first_question = next((m for m in messages if m.get(FIELD_ROLE) == ROLE_USER), None)
+                if not chat.get(FIELD_TITLE) and first_question:
+                    summary[FIELD_TITLE] = shorten(first_question.get(FIELD_CONTENT), CHAT_TITLE_LENGTH)
+            chats.update_one({FIELD_ID: chat[FIELD_ID]}, {"$set": summary})
+            filled += 1
+        self.stdout.write(json.dumps({"chats": filled}))
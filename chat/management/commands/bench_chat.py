@@ -0,0 +1,183 @@
+"""End-to-end WebSocket load test for ChatConsumer against local stand-ins."""
+
+import asyncio
+import functools
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chat.consumers import ChatConsumer
+from chat.constants import RESPONSE_OK, RESPONSE_TYPE_CHAT_CREATED
+from chat.data import ChatCollection, MessageCollection
+from chat.fakes import install_fakes, restore_clients
+from chat.fastapi_client import FastAPIClient
+from config import metrics, mongo
+from config.bench import summarize
+
+# (owner, attribute, stage label) for every awaited step of a turn.
+STAGES = (
+    (ChatCollection, "create_chat", "create_chat"),
+    (ChatCollection, "open_chat", "open_chat"),
+    (MessageCollection, "insert_message", "insert_message"),
+    (MessageCollection, "get_chat_history", "get_chat_history"),
+    (FastAPIClient, "send_chat_request", "consultant"),
+    (ChatConsumer, "_send_json", "send"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Open concurrent WebSocket chats against the ASGI application with an in-process "
+        "fake consultant and an in-memory (or local) MongoDB, then report turns/sec, "
+        "per-stage p50/p95/p99 and memory per connection."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=50, help="Concurrent WebSocket connections.")
+        parser.add_argument("--turns", type=int, default=10, help="Chat turns per connection.")
+        parser.add_argument("--upstream-latency-ms", type=float, default=50.0, help="Fake consultant latency.")
+        parser.add_argument("--upstream-jitter-ms", type=float, default=0.0, help="Extra random consultant latency.")
+        parser.add_argument("--mongo-uri", default="", help="Use this MongoDB instead of the in-memory stand-in.")
+        parser.add_argument("--no-metrics", action="store_true", help="Disable config.metrics recording for an A/B run.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for any single frame.")
+        parser.add_argument("--output", default="", help="Also write the JSON result to this file.")
+        parser.add_argument("--json", action="store_true", help="Print a single JSON result.")
+
+    def handle(self, *args, **options):
+        metrics.ENABLED = not options["no_metrics"]
+        previous = install_fakes(options["upstream_latency_ms"], options["upstream_jitter_ms"])
+        if options["mongo_uri"]:
+            from pymongo import MongoClient
+
+            mongo._client = MongoClient(options["mongo_uri"])
+        try:
+            # Every simulated client shares one address; rate limits would cap the run.
+            with override_settings(RATE_LIMITS={}):
+                result = asyncio.run(self._run(options))
+        finally:
+            if options["mongo_uri"]:
+                mongo._client.close()
+            restore_clients(previous)
+
+        output = json.dumps(result) if options["json"] else json.dumps(result, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(json.dumps(result, indent=2))
+        self.stdout.write(output)
+
+    async def _run(self, options):
+        from config.asgi import application
+
+        stages = defaultdict(list)
+        with _timed_stages(stages):
+            # Only the connect phase is traced: tracemalloc slows every
+            # allocation and would skew the turn timings.
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            connected = await asyncio.gather(
+                *(self._connect(application, options["timeout"]) for _ in range(options["connections"]))
+            )
+            per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / max(1, options["connections"])
+            tracemalloc.stop()
+
+            communicators = [communicator for communicator in connected if communicator]
+            spans_before = _span_count()
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(
+                *(self._chat(communicator, options["turns"], options["timeout"]) for communicator in communicators)
+            )
+            elapsed = time.perf_counter() - started
+            spans = _span_count() - spans_before
+            await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+
+        turns = [latency for latencies, _ in outcomes for latency in latencies]
+        turn_mean = sum(turns) / len(turns) if turns else 0.0
+        spans_per_turn = spans / len(turns) if turns else 0.0
+        return {
+            "mongo": "local" if options["mongo_uri"] else "in-memory",
+            "connections": options["connections"],
+            "connect_failures": options["connections"] - len(communicators),
+            "turns_per_connection": options["turns"],
+            "upstream_latency_ms": options["upstream_latency_ms"],
+            "turns_per_sec": round(len(turns) / elapsed, 1) if elapsed else 0.0,
+            "errors": sum(errors for _, errors in outcomes),
+            "memory_per_connection_kib": round(per_connection / 1024, 1),
+            "turn": summarize(turns),
+            "stages": {stage: summarize(latencies) for stage, latencies in sorted(stages.items())},
+            "metrics": {
+                "enabled": metrics.ENABLED,
+                "spans_per_turn": round(spans_per_turn, 1),
+                "span_cost_us": round(_span_cost() * 1e6, 3),
+                "overhead_pct": round(spans_per_turn * _span_cost() / turn_mean * 100, 4) if turn_mean else 0.0,
+            },
+        }
+
+    async def _connect(self, application, timeout):
+        """Open one socket and wait for its chat.created frame; None on failure."""
+        communicator = WebsocketCommunicator(application, "/ws/chat")
+        connected, _ = await communicator.connect(timeout=timeout)
+        if not connected:
+            return None
+        frame = await communicator.receive_json_from(timeout=timeout)
+        if frame.get("type") != RESPONSE_TYPE_CHAT_CREATED:
+            await communicator.disconnect()
+            return None
+        return communicator
+
+    async def _chat(self, communicator, turns, timeout):
+        """Send ``turns`` user messages back to back, returning (latencies, error count)."""
+        latencies, errors = [], 0
+        for turn in range(turns):
+            started = time.perf_counter()
+            await communicator.send_json_to({"role": "user", "content": f"Benchmark question {turn}"})
+            frame = await communicator.receive_json_from(timeout=timeout)
+            latencies.append(time.perf_counter() - started)
+            errors += not frame.get(RESPONSE_OK)
+        return latencies, errors
+
+
+def _span_count() -> int:
+    """Observations recorded so far across every registered histogram."""
+    return sum(metric.total_count() for metric in metrics.registered() if isinstance(metric, metrics.Histogram))
+
+
+@functools.cache
+def _span_cost(iterations: int = 20000) -> float:
+    """Seconds spent by one metrics.timed span, measured on a throwaway histogram."""
+    histogram = metrics.Histogram("bench_span_seconds", "", ["stage", "outcome"])
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with metrics.timed(histogram, stage="bench"):
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+@contextmanager
+def _timed_stages(stages):
+    """Wrap each pipeline step so its wall time lands in ``stages[label]``."""
+    originals = []
+    for owner, attribute, label in STAGES:
+        raw = owner.__dict__[attribute]
+        func = raw.__func__ if isinstance(raw, staticmethod) else raw
+
+        @functools.wraps(func)
+        async def wrapper(*args, _func=func, _label=label, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await _func(*args, **kwargs)
+            finally:
+                stages[_label].append(time.perf_counter() - started)
+
+        originals.append((owner, attribute, raw))
+        setattr(owner, attribute, staticmethod(wrapper) if isinstance(raw, staticmethod) else wrapper)
+    try:
+        yield
+    finally:
+        for owner, attribute, raw in originals:
+            setattr(owner, attribute, raw)
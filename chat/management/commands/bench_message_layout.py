@@ -0,0 +1,140 @@
+"""
+Compare history read latency and storage between the document and bucket message layouts.
+
+The command empties and finally drops the database it seeds, so it refuses
+to run unless that database's name marks it as a bench or test database,
+or --allow-any-database is given.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from chat.buckets import MessageBuckets, bucket_size
+from chat.constants import (
+    BUCKETS_COLLECTION, MESSAGES_COLLECTION, MESSAGE_LAYOUT_BUCKET, MESSAGE_LAYOUT_DOCUMENT,
+)
+from chat.data import MessageCollection, ensure_indexes, to_mongo_time
+from chat.fakes import InMemoryMongoClient
+from config import mongo
+from config.bench import is_scratch_database, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed identical chats in both message layouts of a scratch database, then time full-history "
+        "reads and latest-page reads for each and report collection/index sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chats", type=int, default=200, help="Chats to seed.")
+        parser.add_argument("--messages", type=int, default=200, help="Messages per chat.")
+        parser.add_argument("--reads", type=int, default=500, help="Reads per layout and query.")
+        parser.add_argument("--mongo-uri", default="", help="Use this MongoDB instead of the in-memory stand-in.")
+        parser.add_argument("--database", default="", help="Scratch database (default: <MONGODB_DB_NAME>_bench).")
+        parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards.")
+        parser.add_argument(
+            "--allow-any-database", action="store_true",
+            help="Wipe and drop --database even though its name does not contain 'bench' or 'test'.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print a single JSON result.")
+
+    def handle(self, *args, **options):
+        database = options["database"] or f"{settings.MONGODB_DB_NAME}_bench"
+        if not options["allow_any_database"] and not is_scratch_database(database):
+            raise CommandError(
+                f"Refusing to wipe {database!r}: use a database named for benchmarks or tests, "
+                "or pass --allow-any-database."
+            )
+        previous = mongo._client
+        if options["mongo_uri"]:
+            from pymongo import MongoClient
+
+            mongo._client = MongoClient(options["mongo_uri"], **mongo.client_options())
+        else:
+            mongo._client = InMemoryMongoClient()
+        try:
+            with override_settings(MONGODB_DB_NAME=database):
+                result = self._run(options)
+        finally:
+            if not options["keep"]:
+                mongo._client.drop_database(database)
+            if options["mongo_uri"]:
+                mongo._client.close()
+            mongo._client = previous
+        self.stdout.write(json.dumps(result) if options["json"] else json.dumps(result, indent=2))
+
+    def _run(self, options):
+        db = mongo.get_mongo_db()
+        db[MESSAGES_COLLECTION].delete_many({})
+        db[BUCKETS_COLLECTION].delete_many({})
+        ensure_indexes()
+        chat_ids = self._seed(db, options["chats"], options["messages"])
+
+        result = {"chats": options["chats"], "messages_per_chat": options["messages"], "layouts": {}}
+        for layout in (MESSAGE_LAYOUT_DOCUMENT, MESSAGE_LAYOUT_BUCKET):
+            with override_settings(CHAT_MESSAGE_LAYOUT=layout):
+                history = self._time(
+                    lambda chat_id: asyncio.run(MessageCollection.get_chat_history(chat_id)), chat_ids, options["reads"]
+                )
+                latest = self._time(
+                    lambda chat_id: MessageCollection.page_messages(chat_id, latest=True), chat_ids, options["reads"]
+                )
+            bucketed = layout == MESSAGE_LAYOUT_BUCKET
+            collection = BUCKETS_COLLECTION if bucketed else MESSAGES_COLLECTION
+            result["layouts"][layout] = {
+                "documents_per_history": math.ceil(options["messages"] / bucket_size()) if bucketed else options["messages"],
+                "full_history": summarize(history),
+                "latest_page": summarize(latest),
+                **self._sizes(db, collection),
+            }
+        return result
+
+    @staticmethod
+    def _seed(db, chats, per_chat):
+        """Write the same messages to both layouts and return the chat ids."""
+        start = timezone.now() - timedelta(days=1)
+        chat_ids = []
+        for number in range(chats):
+            chat_id = f"bench-{number}"
+            messages = [
+                {
+                    "chat_id": chat_id,
+                    "role": "user" if index % 2 == 0 else "chatbot",
+                    "content": f"Benchmark message {index} " + "lorem ipsum " * 20,
+                    "created_at": to_mongo_time(start + timedelta(seconds=number * per_chat + index)),
+                    "form": None,
+                }
+                for index in range(per_chat)
+            ]
+            db[MESSAGES_COLLECTION].insert_many(messages)
+            db[BUCKETS_COLLECTION].insert_many(MessageBuckets.pack(chat_id, messages))
+            chat_ids.append(chat_id)
+        return chat_ids
+
+    @staticmethod
+    def _time(read, chat_ids, reads):
+        latencies = []
+        for _ in range(reads):
+            chat_id = random.choice(chat_ids)
+            started = time.perf_counter()
+            read(chat_id)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    @staticmethod
+    def _sizes(db, collection):
+        """collStats sizes in KiB (None on the in-memory stand-in)."""
+        try:
+            stats = db.command("collStats", collection)
+        except NotImplementedError:
+            return {"storage_kib": None, "index_kib": None}
+        return {"storage_kib": round(stats["storageSize"] / 1024, 1), "index_kib": round(stats["totalIndexSize"] / 1024, 1)}
@@ -0,0 +1,52 @@
+"""Rewrite legacy ISO-string timestamps in chat documents as BSON dates."""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from chat.constants import (
+    BUCKETS_COLLECTION, CHATS_COLLECTION, MESSAGES_COLLECTION,
+    FIELD_ID, FIELD_CREATED_AT, FIELD_UPDATED_AT, FIELD_MESSAGES, FIELD_FIRST_AT, FIELD_LAST_AT,
+)
+from chat.data import to_mongo_time
+from config.mongo import get_mongo_db
+
+# collection -> top-level timestamp fields
+FIELDS = {
+    CHATS_COLLECTION: (FIELD_CREATED_AT, FIELD_UPDATED_AT),
+    MESSAGES_COLLECTION: (FIELD_CREATED_AT,),
+    BUCKETS_COLLECTION: (FIELD_FIRST_AT, FIELD_LAST_AT),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert created_at/updated_at strings left by older releases to BSON dates so "
+        "range queries, cursors and the TTL index see them. Idempotent; run once after deploying."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count documents to convert.")
+
+    def handle(self, *args, **options):
+        db = get_mongo_db()
+        converted = {}
+        for name, fields in FIELDS.items():
+            converted[name] = 0
+            for field in fields:
+                for doc in db[name].find({field: {"$type": "string"}}, {field: 1}):
+                    if not options["dry_run"]:
+                        db[name].update_one({FIELD_ID: doc[FIELD_ID]}, {"$set": {field: to_mongo_time(doc[field])}})
+                    converted[name] += 1
+
+        # Bucketed messages carry their own created_at inside the array.
+        buckets = db[BUCKETS_COLLECTION]
+        for bucket in buckets.find({f"{FIELD_MESSAGES}.{FIELD_CREATED_AT}": {"$type": "string"}}, {FIELD_MESSAGES: 1}):
+            messages = [
+                {**message, FIELD_CREATED_AT: to_mongo_time(message[FIELD_CREATED_AT])}
+                for message in bucket[FIELD_MESSAGES]
+            ]
+            if not options["dry_run"]:
+                buckets.update_one({FIELD_ID: bucket[FIELD_ID]}, {"$set": {FIELD_MESSAGES: messages}})
+            converted[BUCKETS_COLLECTION] += len(messages)
+        self.stdout.write(json.dumps(converted))
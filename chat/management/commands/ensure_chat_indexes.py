@@ -0,0 +1,13 @@
+"""Create the MongoDB indexes used by chat reads and the Postgres mirror."""
+
+from django.core.management.base import BaseCommand
+
+from chat.data import ensure_indexes
+
+
+class Command(BaseCommand):
+    help = "Create the chats/messages indexes (idempotent; also run at ASGI startup)."
+
+    def handle(self, *args, **options):
+        for name in ensure_indexes():
+            self.stdout.write(name)
@@ -0,0 +1,82 @@
+"""Convert stored chat messages between the document and bucket layouts."""
+
+from django.core.management.base import BaseCommand
+
+from chat.buckets import MessageBuckets
+from chat.constants import (
+    BUCKETS_COLLECTION, MESSAGES_COLLECTION, MESSAGE_LAYOUT_BUCKET, MESSAGE_LAYOUT_DOCUMENT,
+    FIELD_CHAT_ID, FIELD_CREATED_AT, FIELD_FIRST_AT, FIELD_ID, FIELD_MESSAGES,
+)
+from config.mongo import get_mongo_db
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every chat's messages into the target layout, one chat at a time. Re-running is safe: "
+        "messages already in the target (by _id) are skipped and the target is never cleared, so "
+        "messages written there after the switch are kept. Set CHAT_MESSAGE_LAYOUT to the target "
+        "afterwards, then re-run once to pick up messages written in between and pass --delete-source."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", required=True, choices=[MESSAGE_LAYOUT_BUCKET, MESSAGE_LAYOUT_DOCUMENT])
+        parser.add_argument("--delete-source", action="store_true", help="Remove each chat's source data once copied.")
+
+    def handle(self, *args, **options):
+        db = get_mongo_db()
+        source, target = (
+            (db[MESSAGES_COLLECTION], db[BUCKETS_COLLECTION])
+            if options["to"] == MESSAGE_LAYOUT_BUCKET
+            else (db[BUCKETS_COLLECTION], db[MESSAGES_COLLECTION])
+        )
+        chats = messages = 0
+        for chat_id, chat_messages in self._by_chat(options["to"], source):
+            if not chat_messages:
+                continue
+            present = self._present(options["to"], target, chat_id)
+            missing = [message for message in chat_messages if message[FIELD_ID] not in present]
+            if missing:
+                if options["to"] == MESSAGE_LAYOUT_BUCKET:
+                    # Reads merge overlapping buckets, so the copies can sit beside the live ones.
+                    target.insert_many(MessageBuckets.pack(chat_id, missing))
+                else:
+                    target.insert_many(missing)
+            if options["delete_source"]:
+                source.delete_many({FIELD_CHAT_ID: chat_id})
+            chats += 1
+            messages += len(missing)
+        self.stdout.write(f"Migrated {messages} messages in {chats} chats to the {options['to']} layout.")
+
+    @staticmethod
+    def _present(to, target, chat_id):
+        """Ids of the chat's messages the target already holds."""
+        if to == MESSAGE_LAYOUT_BUCKET:
+            return {
+                message[FIELD_ID]
+                for bucket in target.find({FIELD_CHAT_ID: chat_id}, {FIELD_MESSAGES: 1})
+                for message in bucket.get(FIELD_MESSAGES, [])
+            }
+        return {doc[FIELD_ID] for doc in target.find({FIELD_CHAT_ID: chat_id}, {FIELD_ID: 1})}
+
+    @staticmethod
+    def _by_chat(to, source):
+        """Yield (chat_id, ordered messages) by streaming the source in chat order."""
+        if to == MESSAGE_LAYOUT_BUCKET:
+            # Rides the messages (chat_id, created_at, _id) index.
+            cursor = source.find({}).sort([(FIELD_CHAT_ID, 1), (FIELD_CREATED_AT, 1), (FIELD_ID, 1)])
+            rows = ((doc[FIELD_CHAT_ID], [doc]) for doc in cursor)
+        else:
+            cursor = source.find({}).sort([(FIELD_CHAT_ID, 1), (FIELD_FIRST_AT, 1), (FIELD_ID, 1)])
+            rows = (
+                (bucket[FIELD_CHAT_ID], [{**message, FIELD_CHAT_ID: bucket[FIELD_CHAT_ID]} for message in bucket.get(FIELD_MESSAGES, [])])
+                for bucket in cursor
+            )
+        current, batch = None, []
+        for chat_id, docs in rows:
+            if chat_id != current:
+                if batch:
+                    yield current, sorted(batch, key=lambda doc: (doc[FIELD_CREATED_AT], doc[FIELD_ID]))
+                current, batch = chat_id, []
+            batch.extend(docs)
+        if batch:
+            yield current, sorted(batch, key=lambda doc: (doc[FIELD_CREATED_AT], doc[FIELD_ID]))
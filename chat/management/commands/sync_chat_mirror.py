@@ -0,0 +1,27 @@
+"""Mirror MongoDB chats and messages into the PostgreSQL Chat/Message tables."""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.sync import sync_once
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert Mongo chats and messages into PostgreSQL from the stored checkpoint. "
+        "Runs one pass by default; --interval keeps following the collections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Documents per upsert batch.")
+        parser.add_argument("--interval", type=float, default=0, help="Seconds between passes; 0 runs once.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = sync_once(batch_size=options["batch_size"])
+            self.stdout.write(json.dumps(totals))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
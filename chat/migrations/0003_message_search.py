@@ -0,0 +1,43 @@
+# Generated by Django 6.1.2 on 2026-10-19 15:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from config.migration_operations import PortableAddIndexConcurrently
+
+
+def copy_chat_owners(apps, schema_editor):
+    Chat = apps.get_model("chat", "Chat")
+    Message = apps.get_model("chat", "Message")
+    Message.objects.filter(user__isnull=True).update(
+        user_id=Subquery(Chat.objects.filter(id=OuterRef("chat_id")).values("user_id")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    # The search index is built CONCURRENTLY on PostgreSQL, outside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('chat', '0002_mirror_sync'),
+    ]
+
+    operations = [
+        BtreeGinExtension(),
+        migrations.AddField(
+            model_name='message',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.user'),
+        ),
+        migrations.RunPython(copy_chat_owners, migrations.RunPython.noop),
+        PortableAddIndexConcurrently(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GinIndex(models.F('user'), django.contrib.postgres.search.SearchVector('content', config='english'), name='chat_messages_user_fts'),
+        ),
+    ]
@@ -1,5 +1,10 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.utils import timezone
+
+from .constants import SEARCH_CONFIG
 
 
 class Chat(models.Model):
@@ -7,8 +12,9 @@ class Chat(models.Model):
     user = models.ForeignKey("accounts.User", on_delete=models.CASCADE, related_name="chats")
     title = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=32, default="draft")
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    # Mirrored from MongoDB by chat.sync, so timestamps are copied, not generated.
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = "chats"
@@ -25,12 +31,35 @@ class Message(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     chat = models.ForeignKey("chat.Chat", on_delete=models.CASCADE, related_name="messages")
+    # The chat owner, copied by chat.sync so search can filter without a join.
+    user = models.ForeignKey(
+        "accounts.User", on_delete=models.CASCADE, related_name="+", null=True, db_index=False
+    )
     role = models.CharField(max_length=16, choices=ROLE_CHOICES)
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = "chat_messages"
+        indexes = [
+            # One GIN scan answers "this user's messages matching the query" (btree_gin for user_id).
+            GinIndex(models.F("user"), SearchVector("content", config=SEARCH_CONFIG), name="chat_messages_user_fts"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.role}: {self.content[:50]}"
+
+
+class SyncCheckpoint(models.Model):
+    """High-water mark of a MongoDB collection mirrored into PostgreSQL by chat.sync."""
+    name = models.CharField(max_length=64, primary_key=True)
+    position_at = models.DateTimeField(null=True, blank=True)
+    position_id = models.CharField(max_length=64, blank=True)
+    synced = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "chat_sync_checkpoints"
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.position_at} / {self.position_id}"
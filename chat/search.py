@@ -0,0 +1,94 @@
+"""
+Full-text search over a user's chat messages.
+
+Search reads the PostgreSQL mirror (chat.sync) rather than MongoDB: archived
+chats keep their rows there, and each row carries its owner, so one scan of
+the chat_messages_user_fts GIN index finds "this user's messages matching
+the query". Queries use websearch syntax ("quoted phrases", or, -excluded),
+results are ranked with ts_rank and paged by (rank, created_at, id)
+cursors. Snippets come from ts_headline, which PostgreSQL only evaluates for
+the rows on the returned page.
+
+Snippets are HTML: the message text is escaped and only the matched terms
+are wrapped in <mark>, so clients can render them without sanitizing.
+
+Other databases (SQLite in development and tests) fall back to a
+case-insensitive substring match, newest first, with escaped snippets that
+carry no marks.
+
+Results trail the socket by the mirror's sync interval.
+"""
+
+from __future__ import annotations
+
+import html
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast, Replace
+
+from .constants import (
+    CHAT_PREVIEW_LENGTH, SEARCH_CONFIG, SEARCH_MARK_START, SEARCH_MARK_STOP,
+    SEARCH_SNIPPET_START, SEARCH_SNIPPET_STOP, SEARCH_SNIPPET_WORDS,
+)
+from .data import shorten
+from .models import Message
+
+SearchPosition = Tuple[float, datetime, UUID]
+
+
+def highlight(snippet: str) -> str:
+    """Escape a ts_headline snippet and turn its match markers into <mark> tags."""
+    return (
+        html.escape(snippet)
+        .replace(SEARCH_SNIPPET_START, SEARCH_MARK_START)
+        .replace(SEARCH_SNIPPET_STOP, SEARCH_MARK_STOP)
+    )
+
+
+def search_queryset(user_id: Any, query: str, after: Optional[SearchPosition] = None):
+    """The user's messages matching ``query``, best match first, after the ``after`` position."""
+    queryset = Message.objects.filter(user_id=user_id)
+    if connections[queryset.db].vendor == "postgresql":
+        search = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        vector = SearchVector("content", config=SEARCH_CONFIG)
+        queryset = queryset.alias(document=vector).filter(document=search).annotate(
+            # ts_rank is a real; as double precision it survives the JSON cursor exactly.
+            rank=Cast(SearchRank(vector, search), FloatField()),
+            snippet=SearchHeadline(
+                # Strip stray marker characters so only real matches become tags.
+                Replace(Replace("content", Value(SEARCH_SNIPPET_START)), Value(SEARCH_SNIPPET_STOP)), search, config=SEARCH_CONFIG, start_sel=SEARCH_SNIPPET_START,
+                stop_sel=SEARCH_SNIPPET_STOP, max_words=SEARCH_SNIPPET_WORDS,
+            ),
+        )
+    else:
+        queryset = queryset.filter(content__icontains=query).annotate(
+            rank=Value(0.0, output_field=FloatField()), snippet=F("content"),
+        )
+    if after is not None:
+        rank, created_at, row_id = after
+        queryset = queryset.filter(
+            Q(rank__lt=rank)
+            | Q(rank=rank, created_at__lt=created_at)
+            | Q(rank=rank, created_at=created_at, id__lt=row_id)
+        )
+    return queryset.order_by("-rank", "-created_at", "-id")
+
+
+def search_messages(
+    user_id: Any, query: str, after: Optional[SearchPosition] = None, limit: int = 50
+) -> List[Dict[str, Any]]:
+    """One page of the user's messages matching ``query``, best match first."""
+    queryset = search_queryset(user_id, query, after)
+    full_text = connections[queryset.db].vendor == "postgresql"
+    rows = list(queryset.values("id", "chat_id", "chat__title", "role", "created_at", "rank", "snippet")[:limit])
+    for row in rows:
+        if full_text:
+            row["snippet"] = highlight(row["snippet"])
+        else:
+            row["snippet"] = html.escape(shorten(row["snippet"], CHAT_PREVIEW_LENGTH))
+    return rows
@@ -0,0 +1,161 @@
+"""
+Mirror MongoDB chats and messages into the PostgreSQL Chat/Message tables.
+
+The chat hot path only writes to MongoDB. This worker follows each
+collection by a (timestamp, _id) high-water mark, upserts a batch with
+``bulk_create(update_conflicts=True)`` and advances its SyncCheckpoint in
+the same transaction, so a crash replays at most one batch. Documents
+newer than ``CHAT_SYNC_LAG_SECONDS`` are left for the next pass because
+concurrent inserts can become visible slightly out of timestamp order.
+
+Chats are followed by ``updated_at`` so later title/status changes are
+picked up; messages are immutable and followed by ``created_at``.
+Anonymous chats have no owner row to point at and are skipped along with
+their messages.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+
+from .constants import (
+    CHATS_COLLECTION, MESSAGES_COLLECTION, CHAT_STATUS_DRAFT,
+    FIELD_ID, FIELD_USER, FIELD_TITLE, FIELD_STATUS, FIELD_CREATED_AT, FIELD_UPDATED_AT,
+    FIELD_CHAT_ID, FIELD_ROLE, FIELD_CONTENT,
+)
+from .data import ChatCollection, MessageCollection, from_mongo_time
+from .models import Chat, Message, SyncCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# Message primary keys are derived from the Mongo ObjectId so replays upsert
+# the same row instead of inserting a duplicate.
+MESSAGE_ID_NAMESPACE = uuid.UUID("6f1c4b8e-2d0a-5c53-9a5e-7d3f1b2c8e41")
+
+
+def message_uuid(object_id: Any) -> uuid.UUID:
+    """Stable Postgres id for a Mongo message id."""
+    return uuid.uuid5(MESSAGE_ID_NAMESPACE, str(object_id))
+
+
+def _parse_uuid(value: Any) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _chat_rows(docs: List[Dict[str, Any]]) -> List[Chat]:
+    owner_ids = {_parse_uuid(doc.get(FIELD_USER)) for doc in docs} - {None}
+    live_owners = set(
+        User.objects.filter(id__in=owner_ids, deleted_at__isnull=True).values_list("id", flat=True)
+    )
+    rows = []
+    for doc in docs:
+        chat_id, owner_id = _parse_uuid(doc[FIELD_ID]), _parse_uuid(doc.get(FIELD_USER))
+        if chat_id is None or owner_id not in live_owners:
+            continue
+        rows.append(Chat(
+            id=chat_id,
+            user_id=owner_id,
+            title=(doc.get(FIELD_TITLE) or "")[:255],
+            status=doc.get(FIELD_STATUS) or CHAT_STATUS_DRAFT,
+            created_at=from_mongo_time(doc[FIELD_CREATED_AT]),
+            updated_at=from_mongo_time(doc.get(FIELD_UPDATED_AT) or doc[FIELD_CREATED_AT]),
+        ))
+    return rows
+
+
+def _message_rows(docs: List[Dict[str, Any]]) -> List[Message]:
+    chat_ids = {_parse_uuid(doc.get(FIELD_CHAT_ID)) for doc in docs} - {None}
+    # chat id -> owner id, copied onto each message for search.
+    mirrored = dict(Chat.objects.filter(id__in=chat_ids).values_list("id", "user_id"))
+    if missing := chat_ids - mirrored.keys():
+        # A chat touched after the lag horizon is not mirrored yet even though
+        # its older messages are; pull those parents in directly.
+        parents = _chat_rows(ChatCollection.find_chats([str(chat_id) for chat_id in missing]))
+        Chat.objects.bulk_create(
+            parents, update_conflicts=True, unique_fields=["id"], update_fields=_CHAT_UPDATE_FIELDS
+        )
+        mirrored.update((chat.id, chat.user_id) for chat in parents)
+    roles = {role for role, _ in Message.ROLE_CHOICES}
+    rows = []
+    for doc in docs:
+        chat_id = _parse_uuid(doc.get(FIELD_CHAT_ID))
+        if chat_id not in mirrored or doc.get(FIELD_ROLE) not in roles:
+            continue
+        rows.append(Message(
+            id=message_uuid(doc[FIELD_ID]),
+            chat_id=chat_id,
+            user_id=mirrored[chat_id],
+            role=doc[FIELD_ROLE],
+            content=doc.get(FIELD_CONTENT) or "",
+            created_at=from_mongo_time(doc[FIELD_CREATED_AT]),
+        ))
+    return rows
+
+
+_CHAT_UPDATE_FIELDS = ["title", "status", "updated_at"]
+
+# name -> (page reader, position field, row builder, model, fields refreshed on conflict)
+_STREAMS: Dict[str, Tuple[Callable, str, Callable, type, List[str]]] = {
+    CHATS_COLLECTION: (
+        ChatCollection.page_updated_after, FIELD_UPDATED_AT, _chat_rows, Chat, _CHAT_UPDATE_FIELDS,
+    ),
+    MESSAGES_COLLECTION: (
+        MessageCollection.page_created_after, FIELD_CREATED_AT, _message_rows, Message,
+        ["role", "content"],
+    ),
+}
+
+
+def sync_batch(name: str, batch_size: int, until) -> int:
+    """Mirror one batch of a collection and advance its checkpoint; return documents read."""
+    read_page, position_field, build_rows, model, update_fields = _STREAMS[name]
+    with transaction.atomic():
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(name=name)
+        # Serializes concurrent workers on the same stream.
+        checkpoint = SyncCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+        after = (checkpoint.position_at, checkpoint.position_id) if checkpoint.position_at else None
+        docs = read_page(after, until, batch_size)
+        if not docs:
+            return 0
+        rows = build_rows(docs)
+        if rows:
+            model.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=["id"], update_fields=update_fields
+            )
+        last = docs[-1]
+        checkpoint.position_at = from_mongo_time(last[position_field])
+        checkpoint.position_id = str(last[FIELD_ID])
+        checkpoint.synced += len(rows)
+        checkpoint.save()
+    logger.debug("Mirrored %s: read=%d upserted=%d", name, len(docs), len(rows))
+    return len(docs)
+
+
+def sync_once(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, int]:
+    """Drain chats, then messages, up to the lag horizon; return documents read per stream."""
+    batch_size = batch_size or getattr(settings, "CHAT_SYNC_BATCH_SIZE", 500)
+    lag = getattr(settings, "CHAT_SYNC_LAG_SECONDS", 5)
+    until = timezone.now() - timedelta(seconds=lag)
+    totals = {}
+    # Chats first so messages in the same pass find their parent row.
+    for name in (CHATS_COLLECTION, MESSAGES_COLLECTION):
+        totals[name] = batches = 0
+        while max_batches is None or batches < max_batches:
+            read = sync_batch(name, batch_size, until)
+            totals[name] += read
+            batches += 1
+            if read < batch_size:
+                break
+    return totals
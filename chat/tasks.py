@@ -0,0 +1,92 @@
+"""Background jobs for the chat app."""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from typing import Any, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from config.celery import app
+from forms import gcp_storage
+from forms.models import Form, form_title
+
+from .constants import (
+    CHAT_GROUP_PREFIX, EVENT_CHAT_MESSAGES,
+    FIELD_CHAT_ID, FIELD_ID, FIELD_MESSAGE, FIELD_RESPONSE_FILE_URL,
+)
+from .data import MessageCollection
+
+logger = logging.getLogger(__name__)
+
+# Namespace for the ids of Forms recorded from AI response files.
+RESPONSE_FORM_NAMESPACE = uuid.UUID("4f1c2b7e-93a5-4d0e-8c61-2a9e5f0b7d13")
+
+
+def response_form_id(message_id: str) -> uuid.UUID:
+    """Deterministic Form id for a message's response file."""
+    return uuid.uuid5(RESPONSE_FORM_NAMESPACE, str(message_id))
+
+
+@app.task(
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    max_retries=5,
+)
+def process_response_file(message_id: str, chat_id: str, user_id: Optional[str], response_file: Any) -> str:
+    """
+    Store an AI-generated file and attach it to its chat message.
+
+    Decodes the payload, uploads it to a path derived from the message id,
+    ``$set``s the URL on the message, records a Form for the owner and
+    notifies the chat group. The message id is the idempotency key: the
+    object path is deterministic, a message that already has a URL is not
+    re-uploaded, and the Form row's primary key is derived from the message
+    id, so concurrent or repeated runs converge on one row (the loser of an
+    insert race gets an IntegrityError, which get_or_create turns into a get).
+    """
+    file_bytes, filename = MessageCollection.decode_response_file(response_file)
+
+    pdf_url = MessageCollection.get_response_file_url(message_id)
+    if not pdf_url:
+        pdf_url = gcp_storage.upload_pdf(
+            file_bytes=file_bytes,
+            destination_path=MessageCollection.response_file_path(chat_id, message_id, filename),
+        )
+        MessageCollection.set_response_file_url(message_id, pdf_url)
+
+    if user_id:
+        Form.objects.get_or_create(
+            id=response_form_id(message_id),
+            defaults={"user_id": user_id, "pdf_bucket_url": pdf_url, "title": form_title(filename)},
+        )
+
+    async_to_sync(get_channel_layer().group_send)(
+        f"{CHAT_GROUP_PREFIX}{chat_id}",
+        {
+            "type": EVENT_CHAT_MESSAGES,
+            FIELD_MESSAGE: {FIELD_ID: message_id, FIELD_CHAT_ID: chat_id, FIELD_RESPONSE_FILE_URL: pdf_url},
+        },
+    )
+    logger.debug("Response file processed: message_id=%s", message_id)
+    return pdf_url
+
+
+@app.task(ignore_result=True)
+def archive_inactive_chats() -> dict:
+    """Compress chats idle for CHAT_ARCHIVE_AFTER_DAYS into chat_archives (scheduled by celery beat)."""
+    from .archive import archive_inactive
+
+    return archive_inactive()
+
+
+@app.task(ignore_result=True)
+def sync_chat_mirror() -> dict:
+    """Mirror new and changed Mongo chats/messages into PostgreSQL (scheduled by celery beat)."""
+    from .sync import sync_once
+
+    return sync_once()
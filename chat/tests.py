@@ -1,3 +1,780 @@
-from django.test import TestCase
+import base64
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import asyncio
+
+import httpx
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.authentication import UserJWTAuthentication
+from accounts.models import User
+from forms.models import Form
+
+from config import deadline, lifecycle
+from config.asgi import application
+from config.mongo import get_mongo_db
+
+from .consumers import TURN_SECONDS
+from .constants import (
+    ARCHIVES_COLLECTION, BUCKETS_COLLECTION, CHATS_COLLECTION, MESSAGES_COLLECTION,
+    RESPONSE_ERRORS, RESPONSE_TYPE_CHAT_CREATED,
+)
+from .archive import ChatArchive, archive_inactive
+from .buckets import MessageBuckets
+from .data import MessageCollection, to_mongo_time
+from . import fastapi_client
+from .fakes import fake_consultant_transport, install_fakes, restore_clients
+from .models import Chat, Message, SyncCheckpoint
+from .search import highlight, search_queryset
+from .sync import message_uuid, sync_once
+from .tasks import process_response_file, response_form_id
+
+
+async def open_chat(test_case):
+    """Connect a socket and return it with the chat id from its chat_created frame."""
+    communicator = WebsocketCommunicator(application, "/ws/chat")
+    connected, _ = await communicator.connect()
+    test_case.assertTrue(connected)
+    created = await communicator.receive_json_from()
+    test_case.assertEqual(created["type"], RESPONSE_TYPE_CHAT_CREATED)
+    return communicator, created["chat_id"]
+
+
+class ChatConsumerTests(SimpleTestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+
+    async def test_turn_persists_both_messages_and_sends_history(self):
+        communicator, chat_id = await open_chat(self)
+        turns_before = TURN_SECONDS.count(outcome="ok")
+
+        for content in ("First question", "Second question"):
+            await communicator.send_json_to({"role": "user", "content": content})
+            reply = await communicator.receive_json_from()
+            self.assertTrue(reply["ok"])
+        await communicator.disconnect()
+
+        self.assertIn("2 earlier messages", reply["message"]["content"])
+        stored = list(get_mongo_db()[MESSAGES_COLLECTION].find({"chat_id": chat_id}))
+        self.assertEqual([m["role"] for m in stored], ["user", "chatbot", "user", "chatbot"])
+        self.assertEqual(TURN_SECONDS.count(outcome="ok") - turns_before, 2)
+
+    async def test_turn_updates_the_chat_summary(self):
+        communicator, chat_id = await open_chat(self)
+
+        await communicator.send_json_to({"role": "user", "content": "  Can my landlord\n keep the deposit?"})
+        reply = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        chat = get_mongo_db()[CHATS_COLLECTION].find_one({"_id": chat_id})
+        self.assertEqual(chat["message_count"], 2)
+        self.assertEqual(chat["title"], "Can my landlord keep the deposit?")
+        self.assertEqual(chat["last_message_preview"], reply["message"]["content"])
+        self.assertEqual(chat["last_message_at"].isoformat(), reply["message"]["created_at"])
+        self.assertEqual(chat["updated_at"], chat["last_message_at"])
+
+    @override_settings(RATE_LIMITS={"chat.message.connection": "1/m"})
+    async def test_frames_over_the_limit_are_refused_before_any_work(self):
+        communicator, chat_id = await open_chat(self)
+
+        await communicator.send_json_to({"role": "user", "content": "One"})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "anything", "role": "user", "content": "Two"})
+        refused = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(refused["errors"], "rate_limited")
+        self.assertGreater(refused["retry_after"], 0)
+        self.assertEqual(get_mongo_db()[MESSAGES_COLLECTION].count_documents({"chat_id": chat_id}), 2)
+
+    @override_settings(RATE_LIMITS={"chat.connect": "30/m", "chat.message.connection": "1/m"})
+    async def test_frame_type_cannot_pick_another_bucket(self):
+        communicator, chat_id = await open_chat(self)
+
+        await communicator.send_json_to({"type": "connect", "role": "user", "content": "One"})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "connect", "role": "user", "content": "Two"})
+        refused = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(refused["errors"], "rate_limited")
+        self.assertEqual(get_mongo_db()[MESSAGES_COLLECTION].count_documents({"chat_id": chat_id}), 2)
+
+    @override_settings(RATE_LIMITS={"chat.connect": "1/m"}, REST_FRAMEWORK={"NUM_PROXIES": 1})
+    async def test_anonymous_sockets_behind_a_proxy_are_limited_per_client(self):
+        async def connect(address):
+            communicator = WebsocketCommunicator(
+                application, "/ws/chat", headers=[(b"x-forwarded-for", address.encode())],
+            )
+            await communicator.connect()
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return frame
+
+        # Every socket arrives from the proxy's address; only the forwarded one differs.
+        self.assertIn("chat_id", await connect("203.0.113.7"))
+        self.assertIn("chat_id", await connect("198.51.100.4"))
+        self.assertEqual((await connect("203.0.113.7"))["errors"], "rate_limited")
+
+    async def test_resume_sends_only_the_missing_messages(self):
+        communicator, chat_id = await open_chat(self)
+        await communicator.send_json_to({"role": "user", "content": "First question"})
+        seen = await communicator.receive_json_from()
+        await communicator.send_json_to({"role": "user", "content": "Second question"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        resumed = WebsocketCommunicator(application, f"/ws/chat?chat_id={chat_id}&after={seen['next']}")
+        connected, _ = await resumed.connect()
+        self.assertTrue(connected)
+        snapshot = await resumed.receive_json_from()
+        await resumed.send_json_to({"role": "user", "content": "Third question"})
+        reply = await resumed.receive_json_from()
+        await resumed.disconnect()
+
+        self.assertEqual(snapshot["type"], "chat.snapshot")
+        self.assertEqual([m["content"] for m in snapshot["messages"]][:1], ["Second question"])
+        self.assertEqual(len(snapshot["messages"]), 2)
+        self.assertTrue(snapshot["complete"])
+        self.assertIn("4 earlier messages", reply["message"]["content"])
+        self.assertEqual(get_mongo_db()[CHATS_COLLECTION].count_documents({}), 1)
+
+    async def test_resuming_an_unknown_chat_starts_a_new_one(self):
+        communicator = WebsocketCommunicator(application, "/ws/chat?chat_id=missing")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        refused = await communicator.receive_json_from()
+        created = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(refused["errors"], "chat_not_found")
+        self.assertEqual(created["type"], RESPONSE_TYPE_CHAT_CREATED)
+        self.assertNotEqual(created["chat_id"], "missing")
+
+    async def test_frames_naming_another_users_chat_are_refused(self):
+        get_mongo_db()[CHATS_COLLECTION].insert_one({"_id": "theirs", "user": "u-other", "title": ""})
+        communicator, own_chat_id = await open_chat(self)
+
+        await communicator.send_json_to({"chat_id": "theirs", "role": "user", "content": "Let me in"})
+        refused = await communicator.receive_json_from()
+        await get_channel_layer().group_send("chat_theirs", {"type": "chat.messages", "message": {"content": "private"}})
+        leaked = await communicator.receive_nothing()
+        await communicator.send_json_to({"role": "user", "content": "Back to mine"})
+        reply = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(refused, {RESPONSE_ERRORS: "chat_not_found"})
+        self.assertTrue(leaked)
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["message"]["chat_id"], own_chat_id)
+        self.assertEqual(get_mongo_db()[MESSAGES_COLLECTION].count_documents({"chat_id": "theirs"}), 0)
+
+    async def test_invalid_json_is_rejected(self):
+        communicator, _ = await open_chat(self)
+
+        await communicator.send_to(text_data="not json")
+        reply = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertEqual(reply, {RESPONSE_ERRORS: "invalid_json"})
+
+    @mock.patch("chat.tasks.process_response_file.apply_async", side_effect=OSError("broker down"))
+    async def test_reply_is_sent_when_the_file_cannot_be_queued(self, apply_async):
+        async def with_file(request):
+            return httpx.Response(200, json={"role": "chatbot", "content": "Here it is", "file": "JVBERi0="})
+
+        fastapi_client._client = httpx.AsyncClient(transport=httpx.MockTransport(with_file))
+        communicator, chat_id = await open_chat(self)
+        with self.assertLogs("chat.consumers", "ERROR"):
+            await communicator.send_json_to({"role": "user", "content": "Send the lease"})
+            reply = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        apply_async.assert_called_once()
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["message"]["response_file_status"], "failed")
+        self.assertEqual(get_mongo_db()[MESSAGES_COLLECTION].count_documents({"chat_id": chat_id}), 2)
+
+
+class DrainTests(SimpleTestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        fastapi_client._client = httpx.AsyncClient(transport=fake_consultant_transport(latency_ms=200))
+        self.addCleanup(setattr, lifecycle, "_draining", False)
+
+    async def test_drain_lets_the_turn_finish_then_closes(self):
+        communicator, _ = await open_chat(self)
+        await communicator.send_json_to({"role": "user", "content": "Busy question"})
+        await asyncio.sleep(0.05)
+
+        await lifecycle.drain(timeout=2)
+
+        reply = await communicator.receive_json_from()
+        self.assertTrue(reply["ok"])
+        self.assertEqual(await communicator.receive_output(), {"type": "websocket.close", "code": 1012})
+
+    async def test_drain_gives_up_after_its_timeout(self):
+        communicator, _ = await open_chat(self)
+        await communicator.send_json_to({"role": "user", "content": "Busy question"})
+        await asyncio.sleep(0.05)
+
+        started = asyncio.get_running_loop().time()
+        await lifecycle.drain(timeout=0.05)
+
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.15)
+        # New frames are refused while draining; the in-flight turn still answers.
+        await communicator.send_json_to({"role": "user", "content": "Another"})
+        self.assertTrue((await communicator.receive_json_from())["ok"])
+        self.assertEqual(await communicator.receive_json_from(), {RESPONSE_ERRORS: "server_draining"})
+        await communicator.disconnect()
+
+
+class ConsultantCoalescingTests(SimpleTestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.calls = 0
+        transport = fake_consultant_transport(latency_ms=20)
+
+        async def counting(request):
+            self.calls += 1
+            return await transport.handle_async_request(request)
+
+        fastapi_client._client = httpx.AsyncClient(transport=httpx.MockTransport(counting))
+        self.history = [{"_id": "a1", "role": "user", "content": "Hi"}, {"_id": "a2", "role": "chatbot", "content": "Hello"}]
+
+    def ask(self, history):
+        return fastapi_client.FastAPIClient.send_chat_request(
+            endpoint="http://ai/consultant", message="Deposit?", session_id="s1", chat_history=history,
+        )
+
+    async def test_double_submit_reaches_the_consultant_once(self):
+        # The second copy of the question sees the first one in its history.
+        duplicate = self.history + [{"_id": "a3", "role": "user", "content": "Deposit?"}]
+        first, second = await asyncio.gather(self.ask(self.history), self.ask(duplicate))
+        retry = await self.ask(self.history)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first.json(), second.json())
+        self.assertIs(retry, first)
+
+    async def test_new_history_is_a_new_request(self):
+        await self.ask(self.history)
+        await self.ask(self.history + [{"_id": "a4", "role": "chatbot", "content": "More?"}])
+
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(FASTAPI_RETRY_BACKOFF=0, FASTAPI_COALESCE_TTL=0)
+class ConsultantDeadlineTests(SimpleTestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.delays = []
+
+        async def scripted(request):
+            delay, status = self.delays.pop(0) if self.delays else (0, 200)
+            await asyncio.sleep(delay)
+            return httpx.Response(status, json={"role": "chatbot", "content": f"after {delay}s"})
+
+        fastapi_client._client = httpx.AsyncClient(transport=httpx.MockTransport(scripted))
+
+    def ask(self, message="Deposit?"):
+        return fastapi_client.FastAPIClient.send_chat_request(
+            endpoint="http://ai/consultant", message=message, session_id="s1",
+        )
+
+    async def test_unavailable_upstream_is_retried(self):
+        self.delays = [(0, 503), (0, 502)]
+        retries = fastapi_client.EXTRA_ATTEMPTS.value(kind="retry")
+
+        response = await self.ask()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fastapi_client.EXTRA_ATTEMPTS.value(kind="retry") - retries, 2)
+
+    @override_settings(FASTAPI_HEDGE_AFTER=0.02)
+    async def test_slow_attempt_is_hedged(self):
+        self.delays = [(5, 200), (0, 200)]
+
+        response = await asyncio.wait_for(self.ask(), timeout=1)
+
+        self.assertEqual(response.json()["content"], "after 0s")
+
+    async def test_shared_call_is_bounded_by_each_callers_deadline(self):
+        self.delays = [(0.2, 200)]
+
+        async def turn(seconds):
+            with deadline.budget(seconds):
+                return await self.ask()
+
+        short, long = await asyncio.gather(turn(0.05), turn(2), return_exceptions=True)
+
+        # The short turn gives up alone; the call it started still answers the long one.
+        self.assertIsInstance(short, deadline.DeadlineExceeded)
+        self.assertEqual(long.json()["content"], "after 0.2s")
+
+    @override_settings(CHAT_TURN_DEADLINE_SECONDS=2)
+    async def test_httpx_timeout_shrinks_with_the_budget(self):
+        self.delays = [(0.1, 503), (0, 200)]
+        timeouts = []
+        transport = fastapi_client._client._transport
+
+        async def recording(request):
+            timeouts.append(request.extensions["timeout"]["read"])
+            return await transport.handle_async_request(request)
+
+        fastapi_client._client = httpx.AsyncClient(transport=httpx.MockTransport(recording))
+        response = await self.ask()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(timeouts[0], 2)
+        self.assertLess(timeouts[1], timeouts[0] - 0.05)
+
+    async def test_shared_call_is_cancelled_when_its_last_caller_leaves(self):
+        cancelled = asyncio.Event()
+
+        async def hanging(request):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        fastapi_client._client = httpx.AsyncClient(transport=httpx.MockTransport(hanging))
+        with deadline.budget(0.05):
+            with self.assertRaises(deadline.DeadlineExceeded):
+                await self.ask()
+
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    @override_settings(CHAT_TURN_DEADLINE_SECONDS=0.05)
+    async def test_turn_past_its_deadline_fails_fast(self):
+        communicator, chat_id = await open_chat(self)
+        self.delays = [(5, 200)]
+
+        await communicator.send_json_to({"role": "user", "content": "Slow question"})
+        reply = await communicator.receive_json_from(timeout=1)
+        await communicator.disconnect()
+
+        self.assertEqual(reply, {RESPONSE_ERRORS: "deadline_exceeded"})
+        self.assertGreater(TURN_SECONDS.count(outcome="deadline_exceeded"), 0)
+
+
+@mock.patch("chat.tasks.gcp_storage.upload_pdf", return_value="https://storage/chat/c1/response.pdf")
+class ResponseFileTaskTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.user = User.objects.create(email="files@example.com")
+        self.message_id = str(get_mongo_db()[MESSAGES_COLLECTION].insert_one(
+            {"chat_id": "c1", "role": "chatbot", "content": "Here it is"},
+        ).inserted_id)
+        self.payload = {"data": base64.b64encode(b"%PDF-1.4").decode(), "filename": "lease-" + "x" * 300 + ".pdf"}
+
+    def run_task(self):
+        return process_response_file.apply(args=(self.message_id, "c1", str(self.user.id), self.payload)).get()
+
+    def test_records_the_url_and_a_form(self, upload_pdf):
+        url = self.run_task()
+
+        self.assertEqual(MessageCollection.get_response_file_url(self.message_id), url)
+        form = Form.objects.get()
+        self.assertEqual(form.id, response_form_id(self.message_id))
+        self.assertEqual((form.user_id, form.pdf_bucket_url), (self.user.id, url))
+        self.assertEqual(len(form.title), 255)
+
+    def test_rerun_does_not_upload_or_insert_again(self, upload_pdf):
+        first = self.run_task()
+        second = self.run_task()
+
+        self.assertEqual(first, second)
+        upload_pdf.assert_called_once()
+        self.assertEqual(Form.objects.count(), 1)
+
+    def test_notifies_the_chat_group(self, upload_pdf):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)("chat_c1", channel)
+        self.addCleanup(async_to_sync(layer.group_discard), "chat_c1", channel)
+
+        url = self.run_task()
+        event = async_to_sync(layer.receive)(channel)
+
+        self.assertEqual(event["type"], "chat.messages")
+        self.assertEqual(event["message"], {"_id": self.message_id, "chat_id": "c1", "response_file_url": url})
+
+
+@override_settings(CHAT_SYNC_LAG_SECONDS=0)
+class ChatMirrorTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.user = User.objects.create(email="mirror@example.com")
+        self.db = get_mongo_db()
+
+    def add_chat(self, chat_id, user_id, at):
+        self.db[CHATS_COLLECTION].insert_one({
+            "_id": chat_id, "user": user_id, "title": "", "status": "draft",
+            "created_at": at, "updated_at": at,
+        })
+
+    def add_message(self, chat_id, content, at):
+        return self.db[MESSAGES_COLLECTION].insert_one({
+            "chat_id": chat_id, "role": "user", "content": content, "created_at": at,
+        }).inserted_id
+
+    def test_sync_upserts_and_resumes_from_checkpoint(self):
+        start = to_mongo_time(timezone.now() - timedelta(minutes=5))
+        chat_id = "7b0c3f9a-3c1e-4e0e-9b59-1d2f6d3f7a10"
+        self.add_chat(chat_id, str(self.user.id), start)
+        self.add_chat("0d8f2b64-5a8c-4c8b-a1a4-5cfe8b7b2e33", None, start)
+        first = self.add_message(chat_id, "hello", start + timedelta(seconds=1))
+
+        self.assertEqual(sync_once(batch_size=1), {"chats": 2, "messages": 1})
+        self.assertEqual(Chat.objects.get().created_at, start)
+        self.assertEqual(Message.objects.get().id, message_uuid(first))
+
+        self.add_message(chat_id, "again", start + timedelta(seconds=2))
+        self.db[CHATS_COLLECTION].update_one(
+            {"_id": chat_id}, {"$set": {"title": "Lease", "updated_at": start + timedelta(seconds=3)}}
+        )
+
+        self.assertEqual(sync_once(), {"chats": 1, "messages": 1})
+        self.assertEqual(Chat.objects.get().title, "Lease")
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(SyncCheckpoint.objects.get(name="messages").synced, 2)
+
+
+@override_settings(CHAT_SYNC_LAG_SECONDS=0)
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.user = User.objects.create(email="search@example.com")
+        other = User.objects.create(email="other@example.com")
+        db = get_mongo_db()
+        start = to_mongo_time(timezone.now() - timedelta(minutes=5))
+        for owner, chat_id, contents in (
+            (self.user, "5a3c8e1f-2b4d-4c6a-8e0f-1a2b3c4d5e6f", ["N4 notice for unpaid rent", "Hello", "Was the n4 served?", "<img src=x onerror=alert(1)>"]),
+            (other, "9c8b7a6f-5e4d-4c3b-8a1f-0e9d8c7b6a5f", ["My N4 question"]),
+        ):
+            db[CHATS_COLLECTION].insert_one({
+                "_id": chat_id, "user": str(owner.id), "title": "Arrears", "status": "draft",
+                "created_at": start, "updated_at": start,
+            })
+            for i, content in enumerate(contents):
+                db[MESSAGES_COLLECTION].insert_one({
+                    "chat_id": chat_id, "role": "user", "content": content,
+                    "created_at": start + timedelta(seconds=i),
+                })
+        sync_once()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {UserJWTAuthentication.create_access_token(user_id=str(self.user.id))}"
+        )
+
+    def test_search_pages_through_the_users_matches(self):
+        first = self.client.get("/chats/search/", {"q": "n4", "page_size": 1})
+        second = self.client.get("/chats/search/", {"q": "n4", "page_size": 1, "cursor": first.data["next"]})
+        rest = self.client.get("/chats/search/", {"q": "n4", "page_size": 1, "cursor": second.data["next"]})
+
+        self.assertEqual(
+            [row["snippet"] for row in first.data["results"] + second.data["results"]],
+            ["Was the n4 served?", "N4 notice for unpaid rent"],
+        )
+        self.assertEqual(first.data["results"][0]["chat_title"], "Arrears")
+        self.assertEqual(rest.data, {"results": [], "next": None})
+
+    def test_snippets_are_escaped(self):
+        response = self.client.get("/chats/search/", {"q": "onerror"})
+
+        self.assertEqual(response.data["results"][0]["snippet"], "&lt;img src=x onerror=alert(1)&gt;")
+
+    def test_highlight_escapes_before_marking(self):
+        self.assertEqual(
+            highlight("<b>rent</b> \x02N4\x03 & \x02notice\x03"),
+            "&lt;b&gt;rent&lt;/b&gt; <mark>N4</mark> &amp; <mark>notice</mark>",
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "full-text search needs PostgreSQL")
+    def test_postgres_plan_uses_the_user_fts_index(self):
+        # Tiny test tables would otherwise be scanned sequentially.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = search_queryset(self.user.id, "n4").explain()
+        self.assertIn("chat_messages_user_fts", plan)
+        response = self.client.get("/chats/search/", {"q": "<b>n4</b>"})
+        self.assertIn("<mark>", response.data["results"][0]["snippet"])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get("/chats/search/", {"q": " "}).status_code, 400)
+        self.assertEqual(self.client.get("/chats/search/", {"q": "n4", "cursor": "junk"}).status_code, 400)
+
+
+class ChatHistoryApiTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.user = User.objects.create(email="history@example.com")
+        self.client = APIClient()
+        token = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.db = get_mongo_db()
+        self.start = to_mongo_time(timezone.now() - timedelta(hours=1))
+        self.chat_id = "3f2b7c1e-8a4d-4f6b-9c2e-5d1a7b8c9e01"
+        self.db[CHATS_COLLECTION].insert_one({
+            "_id": self.chat_id, "user": str(self.user.id), "title": "Lease", "status": "draft",
+            "created_at": self.start, "updated_at": self.start,
+        })
+        for i in range(5):
+            self.db[MESSAGES_COLLECTION].insert_one({
+                "chat_id": self.chat_id, "role": "user", "content": f"m{i}", "form": None,
+                "created_at": self.start + timedelta(seconds=i),
+            })
+
+    def contents(self, response):
+        return [message["content"] for message in response.data["results"]]
+
+    def test_list_returns_projected_chats(self):
+        response = self.client.get("/chats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.chat_id, "title": "Lease", "status": "draft",
+              "created_at": self.start, "updated_at": self.start}],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_messages_page_backwards_from_latest(self):
+        url = f"/chats/{self.chat_id}/messages/"
+        latest = self.client.get(url, {"latest": 1, "page_size": 2})
+        older = self.client.get(url, {"before": latest.data["previous"], "page_size": 2})
+        newer = self.client.get(url, {"after": older.data["next"], "page_size": 2})
+
+        self.assertEqual(self.contents(latest), ["m3", "m4"])
+        self.assertEqual(self.contents(older), ["m1", "m2"])
+        self.assertEqual(self.contents(newer), ["m3", "m4"])
+        self.assertNotIn("form", latest.data["results"][0])
+
+    def test_latest_flag_is_parsed_not_just_present(self):
+        url = f"/chats/{self.chat_id}/messages/"
+
+        for value in ("0", "false", "False", ""):
+            self.assertEqual(self.contents(self.client.get(url, {"latest": value, "page_size": 2})), ["m0", "m1"], value)
+        for value in ("1", "true", "TRUE"):
+            self.assertEqual(self.contents(self.client.get(url, {"latest": value, "page_size": 2})), ["m3", "m4"], value)
+
+    def test_polling_with_etag_returns_304_until_a_new_message(self):
+        url = f"/chats/{self.chat_id}/messages/"
+        first = self.client.get(url, {"latest": 1})
+        cursor = first.data["next"]
+
+        poll = self.client.get(url, {"after": cursor})
+        self.assertEqual(poll.data["results"], [])
+        self.assertEqual(
+            self.client.get(url, {"after": cursor}, HTTP_IF_NONE_MATCH=poll["ETag"]).status_code, 304
+        )
+
+        self.db[MESSAGES_COLLECTION].insert_one({
+            "chat_id": self.chat_id, "role": "chatbot", "content": "new",
+            "created_at": to_mongo_time(timezone.now()),
+        })
+        fresh = self.client.get(url, {"after": cursor}, HTTP_IF_NONE_MATCH=poll["ETag"])
+        self.assertEqual(self.contents(fresh), ["new"])
+
+    def test_other_users_chat_is_not_found(self):
+        other = User.objects.create(email="other@example.com")
+        token = UserJWTAuthentication.create_access_token(user_id=str(other.id))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(self.client.get(f"/chats/{self.chat_id}/messages/").status_code, 404)
+        self.assertEqual(self.client.get("/chats/").data["results"], [])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(f"/chats/{self.chat_id}/messages/", {"after": "bogus"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CHAT_MESSAGE_LAYOUT="bucket", CHAT_MESSAGE_BUCKET_SIZE=2)
+class BucketLayoutTests(SimpleTestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.db = get_mongo_db()
+        start = to_mongo_time(timezone.now())
+        self.ids = [
+            async_to_sync(MessageCollection.insert_message)({
+                "chat_id": "c1", "role": "user", "content": f"m{i}", "form": None,
+                "created_at": start + timedelta(seconds=i),
+            })
+            for i in range(5)
+        ]
+
+    def test_messages_are_packed_into_buckets(self):
+        self.assertEqual([b["count"] for b in self.db[BUCKETS_COLLECTION].find({})], [2, 2, 1])
+        history = async_to_sync(MessageCollection.get_chat_history)("c1", exclude_message_id=self.ids[-1])
+        self.assertEqual([m["content"] for m in history], ["m0", "m1", "m2", "m3"])
+
+    def test_paging_matches_document_layout(self):
+        latest = MessageCollection.page_messages("c1", latest=True, limit=2)
+        cursor = (latest[0]["created_at"], str(latest[0]["_id"]))
+        older = MessageCollection.page_messages("c1", before=cursor, limit=2)
+        newer = MessageCollection.page_messages("c1", after=(cursor[0], str(older[0]["_id"])), limit=3)
+
+        self.assertEqual([m["content"] for m in latest], ["m3", "m4"])
+        self.assertEqual([m["content"] for m in older], ["m1", "m2"])
+        self.assertEqual([m["content"] for m in newer], ["m3", "m4"])
+
+    def test_response_file_url_is_set_in_place(self):
+        MessageCollection.set_response_file_url(str(self.ids[2]), "https://example.com/r.pdf")
+
+        self.assertEqual(MessageCollection.get_response_file_url(str(self.ids[2])), "https://example.com/r.pdf")
+        self.assertIsNone(MessageCollection.get_response_file_url(str(self.ids[1])))
+
+    def test_migration_round_trip(self):
+        call_command("migrate_message_layout", "--to", "document", "--delete-source", stdout=StringIO())
+        self.assertEqual(self.db[MESSAGES_COLLECTION].count_documents({"chat_id": "c1"}), 5)
+        self.assertEqual(self.db[BUCKETS_COLLECTION].count_documents({}), 0)
+
+        call_command("migrate_message_layout", "--to", "bucket", stdout=StringIO())
+        history = async_to_sync(MessageCollection.get_chat_history)("c1")
+        self.assertEqual([m["_id"] for m in history], [str(i) for i in self.ids])
+
+    def test_layout_bench_refuses_a_database_not_named_for_benchmarks(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "bench_message_layout", "--mongo-uri", "mongodb://db.internal", "--database", "mylittlelawyer",
+                stdout=StringIO(),
+            )
+
+        self.assertIs(get_mongo_db(), self.db)
+        self.assertEqual(self.db[BUCKETS_COLLECTION].count_documents({}), 3)
+
+    def test_rerun_after_the_switch_keeps_new_messages(self):
+        call_command("migrate_message_layout", "--to", "document", "--delete-source", stdout=StringIO())
+        self.db[MESSAGES_COLLECTION].delete_many({"content": {"$in": ["m3", "m4"]}})
+        call_command("migrate_message_layout", "--to", "bucket", stdout=StringIO())
+        # Switched to buckets; two more messages arrive before the documented re-run.
+        start = to_mongo_time(timezone.now()) + timedelta(minutes=1)
+        for i in (5, 6):
+            async_to_sync(MessageCollection.insert_message)({
+                "chat_id": "c1", "role": "user", "content": f"m{i}", "form": None,
+                "created_at": start + timedelta(seconds=i),
+            })
+
+        out = StringIO()
+        call_command("migrate_message_layout", "--to", "bucket", "--delete-source", stdout=out)
+
+        history = async_to_sync(MessageCollection.get_chat_history)("c1")
+        self.assertEqual([m["content"] for m in history], ["m0", "m1", "m2", "m5", "m6"])
+        self.assertIn("Migrated 0 messages", out.getvalue())
+        self.assertEqual(self.db[MESSAGES_COLLECTION].count_documents({}), 0)
+
+
+class ChatRetentionTests(TestCase):
+    def setUp(self):
+        previous = install_fakes()
+        self.addCleanup(restore_clients, previous)
+        self.db = get_mongo_db()
+        self.user = User.objects.create(email="retention@example.com")
+        self.old = to_mongo_time(timezone.now() - timedelta(days=90))
+        self.chat_id = "5c1d9e2a-7b3f-4a8e-b6d0-2e9f4c7a1b58"
+        self.db[CHATS_COLLECTION].insert_one({
+            "_id": self.chat_id, "user": str(self.user.id), "title": "", "status": "draft",
+            "created_at": self.old, "updated_at": self.old,
+        })
+        for i in range(3):
+            self.db[MESSAGES_COLLECTION].insert_one({
+                "chat_id": self.chat_id, "role": "user", "content": f"m{i}", "form": None,
+                "created_at": self.old + timedelta(seconds=i),
+            })
+
+    async def test_draft_expiry_is_cleared_by_the_first_message(self):
+        communicator, chat_id = await open_chat(self)
+        chats = self.db[CHATS_COLLECTION]
+        self.assertIn("expires_at", chats.find_one({"_id": chat_id}))
+
+        await communicator.send_json_to({"role": "user", "content": "Hello"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertNotIn("expires_at", chats.find_one({"_id": chat_id}))
+
+    def test_inactive_chat_is_archived_and_rehydrated_on_read(self):
+        self.db[CHATS_COLLECTION].insert_one({
+            "_id": "empty", "user": None, "title": "", "status": "draft",
+            "created_at": self.old, "updated_at": self.old,
+        })
+
+        self.assertEqual(archive_inactive(), {"chats": 1, "messages": 3, "empty_deleted": 1})
+        self.assertEqual(self.db[MESSAGES_COLLECTION].count_documents({}), 0)
+        self.assertIn("archived_at", self.db[CHATS_COLLECTION].find_one({"_id": self.chat_id}))
+        self.assertIsNone(self.db[CHATS_COLLECTION].find_one({"_id": "empty"}))
+
+        client = APIClient()
+        token = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = client.get(f"/chats/{self.chat_id}/messages/")
+
+        self.assertEqual([m["content"] for m in response.data["results"]], ["m0", "m1", "m2"])
+        self.assertEqual(response.data["results"][0]["created_at"], self.old)
+        self.assertEqual(self.db[ARCHIVES_COLLECTION].count_documents({}), 0)
+        self.assertNotIn("archived_at", self.db[CHATS_COLLECTION].find_one({"_id": self.chat_id}))
+
+    def archive_racing_a_new_message(self, insert):
+        """Archive the chat while ``insert`` adds a message right after the archiver read it."""
+        read = MessageCollection.find_for_chat
+        calls = []
+
+        def read_then_insert(chat_id):
+            messages = read(chat_id)
+            if not calls:
+                insert({"chat_id": chat_id, "role": "user", "content": "late", "created_at": to_mongo_time(timezone.now())})
+            calls.append(chat_id)
+            return messages
+
+        with mock.patch("chat.archive.MessageCollection.find_for_chat", side_effect=read_then_insert):
+            self.assertEqual(ChatArchive.archive_chat(self.chat_id, str(self.user.id)), 3)
+        return [m["content"] for m in MessageCollection.find_for_chat(self.chat_id)]
+
+    def test_message_written_while_archiving_is_kept(self):
+        contents = self.archive_racing_a_new_message(self.db[MESSAGES_COLLECTION].insert_one)
+
+        self.assertEqual(contents, ["m0", "m1", "m2", "late"])
+        self.assertNotIn("archived_at", self.db[CHATS_COLLECTION].find_one({"_id": self.chat_id}))
+        self.assertEqual(self.db[ARCHIVES_COLLECTION].count_documents({}), 0)
+
+    @override_settings(CHAT_MESSAGE_LAYOUT="bucket", CHAT_MESSAGE_BUCKET_SIZE=5)
+    def test_message_pushed_into_a_bucket_while_archiving_is_kept(self):
+        MessageBuckets.restore(self.chat_id, MessageCollection.find_for_chat(self.chat_id))
+        self.db[MESSAGES_COLLECTION].delete_many({})
+
+        # The late message lands in the same, still open bucket as the archived ones.
+        contents = self.archive_racing_a_new_message(MessageBuckets.insert)
+
+        self.assertEqual(contents, ["m0", "m1", "m2", "late"])
+        self.assertEqual(self.db[BUCKETS_COLLECTION].count_documents({}), 1)
+
+    def test_legacy_string_timestamps_are_converted(self):
+        self.db[MESSAGES_COLLECTION].insert_one({
+            "chat_id": self.chat_id, "role": "user", "content": "legacy", "created_at": self.old.isoformat(),
+        })
+
+        call_command("convert_chat_timestamps", stdout=StringIO())
+
+        legacy = self.db[MESSAGES_COLLECTION].find_one({"content": "legacy"})
+        self.assertEqual(legacy["created_at"], self.old)
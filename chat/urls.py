@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import ChatListView, ChatMessagesView, MessageSearchView
+
+urlpatterns = [
+    path("", ChatListView.as_view(), name="chat-list"),
+    path("search/", MessageSearchView.as_view(), name="chat-search"),
+    path("<str:chat_id>/messages/", ChatMessagesView.as_view(), name="chat-messages"),
+]
@@ -1,3 +1,149 @@
-from django.shortcuts import render
+import hashlib
+import json
+from typing import Any, Dict
 
-# Create your views here.
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.authentication import UserJWTAuthentication
+
+from .constants import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    FIELD_ID, FIELD_CREATED_AT, FIELD_UPDATED_AT, FIELD_ARCHIVED_AT,
+)
+from .archive import ChatArchive
+from .cursors import (
+    decode_cursor, decode_message_cursor, decode_search_cursor, encode_cursor, encode_search_cursor,
+)
+from .data import ChatCollection, MessageCollection
+from .search import search_messages
+
+
+def _page_size(request) -> int:
+    try:
+        size = int(request.query_params.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError({"page_size": ["Must be an integer."]})
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _flag(request, name: str) -> bool:
+    """True only for ``?name=1`` or ``?name=true``, so ``0`` and ``false`` stay off."""
+    return request.query_params.get(name, "").strip().lower() in ("1", "true")
+
+
+def _public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename Mongo's ``_id`` to ``id`` and stringify it."""
+    out = {key: value for key, value in doc.items() if key != FIELD_ID}
+    return {"id": str(doc[FIELD_ID]), **out}
+
+
+def _conditional(request, data: Dict[str, Any]) -> Response:
+    """Return ``data`` with a strong ETag, or an empty 304 when the client already has it."""
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    matches = [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+    response = Response(status=status.HTTP_304_NOT_MODIFIED) if etag in matches or "*" in matches else Response(data)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class ChatListView(APIView):
+    """List the authenticated user's chats, most recently updated first."""
+    authentication_classes = [UserJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Return one page of chats; pass ``next`` back as ``cursor`` for the following page."""
+        cursor = request.query_params.get("cursor")
+        size = _page_size(request)
+        chats = ChatCollection.page_user_chats(
+            str(request.user.id), decode_cursor(cursor) if cursor else None, size
+        )
+        last = chats[-1] if len(chats) == size else None
+        return _conditional(request, {
+            "results": [_public(chat) for chat in chats],
+            "next": encode_cursor(last[FIELD_UPDATED_AT], last[FIELD_ID]) if last else None,
+        })
+
+
+class ChatMessagesView(APIView):
+    """Page through one chat's messages without opening a WebSocket."""
+    authentication_classes = [UserJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, chat_id: str):
+        """
+        Return messages oldest first.
+
+        ``after`` continues forward from a cursor (poll it with If-None-Match
+        to cheaply check for new messages); ``before`` loads the page that
+        precedes a cursor, for scrolling back from ``latest=1``.
+        """
+        chat = ChatCollection.get_user_chat(chat_id, str(request.user.id), {FIELD_ID: 1, FIELD_ARCHIVED_AT: 1})
+        if not chat:
+            raise NotFound()
+        if FIELD_ARCHIVED_AT in chat:
+            ChatArchive.rehydrate(chat[FIELD_ID])
+
+        after, before = request.query_params.get("after"), request.query_params.get("before")
+        size = _page_size(request)
+        messages = MessageCollection.page_messages(
+            chat_id,
+            after=self._position(after),
+            before=self._position(before),
+            latest=_flag(request, "latest"),
+            limit=size,
+        )
+        return _conditional(request, {
+            "results": [_public(message) for message in messages],
+            "previous": self._cursor(messages[0]) if messages else (before or None),
+            "next": self._cursor(messages[-1]) if messages else after,
+        })
+
+    @staticmethod
+    def _position(cursor: str):
+        return decode_message_cursor(cursor) if cursor else None
+
+    @staticmethod
+    def _cursor(message: Dict[str, Any]) -> str:
+        return encode_cursor(message[FIELD_CREATED_AT], message[FIELD_ID])
+
+
+class MessageSearchView(APIView):
+    """Full-text search over the authenticated user's chat messages."""
+    authentication_classes = [UserJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Return messages matching ``q``, best match first, each with its chat
+        and an HTML snippet (escaped text, matched terms in <mark>); pass
+        ``next`` back as ``cursor`` for the following page.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": ["This field is required."]})
+        cursor = request.query_params.get("cursor")
+        size = _page_size(request)
+        rows = search_messages(request.user.id, query, decode_search_cursor(cursor) if cursor else None, size)
+        last = rows[-1] if len(rows) == size else None
+        return Response({
+            "results": [
+                {
+                    "id": str(row["id"]),
+                    "chat_id": str(row["chat_id"]),
+                    "chat_title": row["chat__title"],
+                    "role": row["role"],
+                    "created_at": row["created_at"].isoformat(),
+                    "snippet": row["snippet"],
+                    "rank": row["rank"],
+                }
+                for row in rows
+            ],
+            "next": encode_search_cursor(last["rank"], last["created_at"], last["id"]) if last else None,
+        })
@@ -8,13 +8,16 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+from accounts.middleware import JWTAuthMiddleware
 from chat.routing import websocket_urlpatterns
+from config.lifecycle import LifespanApp
 
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
-        "websocket": 
+        "lifespan": LifespanApp(),
+        "websocket": JWTAuthMiddleware(
             URLRouter(websocket_urlpatterns)
-        ,
+        ),
     }
 )
@@ -0,0 +1,35 @@
+"""Small helpers shared by the benchmark management commands."""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+# A database whose name contains one of these is considered safe to seed and
+# wipe ("memory" covers SQLite's in-memory test databases).
+SCRATCH_DATABASE_MARKERS = ("bench", "test", "memory")
+
+
+def is_scratch_database(name: str) -> bool:
+    """True when a database name marks it as a bench or test database."""
+    return any(marker in name.lower() for marker in SCRATCH_DATABASE_MARKERS)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies in seconds as count, mean and p50/p95/p99 in milliseconds."""
+    count = len(latencies)
+    return {
+        "count": count,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
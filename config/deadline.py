@@ -0,0 +1,65 @@
+"""
+Per-request deadlines carried in a context variable.
+
+A chat turn runs inside ``with deadline.budget(seconds):``. Everything it
+awaits sees the same deadline, including work handed to threads with
+``asyncio.to_thread`` (which copies the context). Mongo calls are bounded by
+pymongo's client-side operation timeout, which sends the remaining budget to
+the server as ``maxTimeMS``. HTTP callers use ``remaining()`` as their
+timeout. Nested budgets never extend an outer deadline.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The current request ran out of time budget."""
+
+
+@contextmanager
+def budget(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block under a deadline ``seconds`` from now; None or 0 means no deadline."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    import pymongo
+
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires = min(expires, current)
+    left = expires - time.monotonic()
+    if left <= 0:
+        # pymongo reads a zero timeout as "no limit"; a late request stops here instead.
+        raise DeadlineExceeded()
+    token = _deadline.set(expires)
+    try:
+        with pymongo.timeout(left):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None when there is none."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def check() -> None:
+    """Raise DeadlineExceeded when the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """True for DeadlineExceeded and for pymongo errors caused by the operation timeout."""
+    return isinstance(exc, DeadlineExceeded) or getattr(exc, "timeout", False) is True
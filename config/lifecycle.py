@@ -0,0 +1,97 @@
+"""Process lifecycle: ASGI lifespan warm-up/tear-down and graceful drain of chat sockets."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_consumers: "weakref.WeakSet" = weakref.WeakSet()
+_draining = False
+
+
+def register(consumer) -> None:
+    """Track a live WebSocket consumer so it can be drained on shutdown."""
+    _consumers.add(consumer)
+
+
+def unregister(consumer) -> None:
+    """Stop tracking a consumer once its socket is gone."""
+    _consumers.discard(consumer)
+
+
+def is_draining() -> bool:
+    """True once shutdown has started; consumers refuse new work from then on."""
+    return _draining
+
+
+async def drain(timeout: float | None) -> None:
+    """
+    Let every open chat socket finish its in-flight turn, then close it.
+
+    Consumers close with 1012 (service restart) so clients reconnect to
+    another worker. Sockets still busy after ``timeout`` seconds are left
+    to the server's own shutdown.
+    """
+    global _draining
+    _draining = True
+    consumers = list(_consumers)
+    if not consumers:
+        return
+    logger.info("Draining %d chat socket(s)", len(consumers))
+    tasks = [asyncio.ensure_future(consumer.drain()) for consumer in consumers]
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+
+
+async def startup() -> None:
+    """Open Mongo, HTTP and storage clients (and Mongo indexes) before the worker accepts traffic."""
+    from chat.data import ensure_indexes
+    from chat.fastapi_client import get_http_client
+    from config.mongo import get_mongo_client
+    from forms import gcp_storage
+
+    get_http_client()
+    warmups = {
+        "mongo": lambda: get_mongo_client().admin.command("ping"),
+        "mongo indexes": ensure_indexes,
+    }
+    if gcp_storage.DEFAULT_GCP_BUCKET:
+        warmups["storage"] = gcp_storage.get_bucket
+    for name, warmup in warmups.items():
+        try:
+            await asyncio.to_thread(warmup)
+        except Exception:
+            # A cold dependency should not keep the worker from booting;
+            # the first request will retry the connection.
+            logger.warning("Warm-up failed: %s", name, exc_info=True)
+
+
+async def shutdown() -> None:
+    """Release pooled clients once connections are closed."""
+    from chat.fastapi_client import close_http_client
+
+    await close_http_client()
+
+
+class LifespanApp:
+    """ASGI ``lifespan`` handler wiring startup() and shutdown() into the server."""
+
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await startup()
+                except Exception as exc:
+                    logger.exception("Lifespan startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
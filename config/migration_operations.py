@@ -0,0 +1,29 @@
+"""Migration operations shared by the apps."""
+
+from __future__ import annotations
+
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex
+
+
+class PortableAddIndexConcurrently(AddIndexConcurrently):
+    """
+    Build an index without locking writes on PostgreSQL, and build it the
+    normal way on other databases (SQLite in development and tests).
+    PostgreSQL-only index types (GIN, GiST...) are skipped there.
+
+    Like AddIndexConcurrently, it needs a migration with ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
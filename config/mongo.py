@@ -1,15 +1,45 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any, Dict
+
 from django.conf import settings
-from pymongo import MongoClient
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
 
 _client: MongoClient | None = None
 
 
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword arguments built from the MONGODB_* settings."""
+    options: Dict[str, Any] = {
+        # Chat documents store BSON dates; read them back as aware UTC datetimes.
+        "tz_aware": True,
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+    }
+    if settings.MONGODB_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = settings.MONGODB_MAX_IDLE_TIME_MS
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return options
+
+
 def get_mongo_client() -> MongoClient:
+    """Return the process-wide client, importing pymongo on first use."""
     global _client
     if _client is None:
-        _client = MongoClient(settings.MONGODB_URI)
+        from pymongo import MongoClient
+
+        from .mongo_monitoring import CommandTimer, PoolMonitor
+
+        _client = MongoClient(
+            settings.MONGODB_URI,
+            event_listeners=[CommandTimer(slow_ms=settings.MONGODB_SLOW_MS), PoolMonitor()],
+            **client_options(),
+        )
     return _client
 
 
@@ -0,0 +1,148 @@
+"""pymongo event listeners feeding config.metrics and the slow-operation log."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, Tuple
+
+from pymongo import monitoring
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+COMMAND_SECONDS = metrics.histogram(
+    "mongo_command_seconds",
+    "Server round trip of MongoDB commands.",
+    ["command", "collection", "outcome"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SLOW_COMMANDS = metrics.counter(
+    "mongo_slow_commands_total", "MongoDB commands slower than MONGODB_SLOW_MS.", ["command", "collection"]
+)
+POOL_WAIT_SECONDS = metrics.histogram(
+    "mongo_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+    ["outcome"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+POOL_CHECKOUTS = metrics.counter(
+    "mongo_pool_checkouts_total", "Connection pool checkouts; outcome is ok or the failure reason.", ["outcome"]
+)
+POOL_CHECKINS = metrics.counter("mongo_pool_checkins_total", "Connections returned to the pool.")
+POOL_CONNECTIONS_CREATED = metrics.counter("mongo_pool_connections_created_total", "Connections opened.")
+POOL_CONNECTIONS_CLOSED = metrics.counter(
+    "mongo_pool_connections_closed_total", "Connections closed, by reason.", ["reason"]
+)
+
+# Where each command keeps the predicate worth showing in the slow log.
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+
+def filter_shape(value: Any) -> Any:
+    """Replace literal values with ``?`` so a filter can be logged without user data."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(item) for item in value[:1]]
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """The filter (and sort, if any) of a command, reduced to its shape."""
+    field = _FILTER_FIELDS.get(command_name)
+    if field is None:
+        return {}
+    target = command.get(field)
+    if command_name in ("update", "delete") and target:
+        target = target[0].get("q")
+    shape = {"pipeline" if command_name == "aggregate" else "filter": filter_shape(target)}
+    if "sort" in command:
+        shape["sort"] = dict(command["sort"])
+    return shape
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Records every command's latency and logs the ones slower than ``slow_ms``."""
+
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self._inflight: Dict[Tuple[int, Any], Tuple[str, Dict[str, Any]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        self._inflight[(event.request_id, event.connection_id)] = (
+            collection if isinstance(collection, str) else "",
+            event.command,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, metrics.OUTCOME_OK)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, metrics.OUTCOME_ERROR)
+
+    def _finish(self, event, outcome: str) -> None:
+        collection, command = self._inflight.pop((event.request_id, event.connection_id), ("", {}))
+        seconds = event.duration_micros / 1_000_000
+        COMMAND_SECONDS.observe(seconds, command=event.command_name, collection=collection, outcome=outcome)
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            SLOW_COMMANDS.inc(command=event.command_name, collection=collection)
+            logger.warning(
+                "Slow MongoDB %s on %s.%s: %.1f ms (%s) shape=%s",
+                event.command_name,
+                event.database_name,
+                collection,
+                seconds * 1000,
+                outcome,
+                json.dumps(command_shape(event.command_name, command), default=str),
+            )
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Exports checkout wait time and connection churn for the driver's pool."""
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        POOL_WAIT_SECONDS.observe(event.duration, outcome=metrics.OUTCOME_OK)
+        POOL_CHECKOUTS.inc(outcome=metrics.OUTCOME_OK)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        POOL_WAIT_SECONDS.observe(event.duration, outcome=event.reason)
+        POOL_CHECKOUTS.inc(outcome=event.reason)
+        logger.warning("MongoDB pool checkout failed on %s: %s", event.address, event.reason)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        POOL_CHECKINS.inc()
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        POOL_CONNECTIONS_CREATED.inc()
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        POOL_CONNECTIONS_CLOSED.inc(reason=event.reason)
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        logger.warning("MongoDB pool cleared for %s", event.address)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_check_out_started(self, event) -> None:
+        pass
@@ -0,0 +1,44 @@
+"""Pagination for tables too large to COUNT(*) on every page."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the size of an unfiltered PostgreSQL table from the
+    planner statistics (``pg_class.reltuples``) instead of running COUNT(*).
+
+    Filtered querysets, other databases, and tables that are smaller than
+    ADMIN_ESTIMATED_COUNT_THRESHOLD rows (or not analysed yet) are counted
+    exactly. The estimate follows autovacuum, so the page count can lag
+    the table by a few percent.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        estimate = self._estimate()
+        return estimate if estimate is not None else super().count
+
+    def _estimate(self) -> Optional[int]:
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.where or queryset.query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < getattr(settings, "ADMIN_ESTIMATED_COUNT_THRESHOLD", 100_000):
+            return None
+        return int(row[0])
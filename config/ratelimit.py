@@ -0,0 +1,166 @@
+"""
+Token-bucket rate limiting for chat sockets and HTTP views.
+
+Limits are configured per scope in ``settings.RATE_LIMITS`` as
+``"<requests>/<s|m|h>"``: a bucket holds up to ``<requests>`` tokens and
+refills at that rate, so short bursts pass while the sustained rate is
+capped. Each (scope, identity) pair has its own bucket. Scopes without a
+limit are not limited.
+
+Buckets live in the worker process. Setting ``RATE_LIMIT_CACHE_ALIAS`` to a
+CACHES alias stores them in that cache instead, so every worker sees the
+same budget; updates are read-modify-write, so concurrent hits on one key across
+workers can let a request or two through over the limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+THROTTLED = metrics.counter("rate_limited_total", "Requests and frames refused by a rate limit.", ["scope"])
+
+_PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+
+@dataclass(frozen=True)
+class Rate:
+    capacity: float
+    per_second: float
+
+
+def parse_rate(value: str) -> Optional[Rate]:
+    """Parse ``"20/m"`` into a Rate; empty means unlimited."""
+    if not value:
+        return None
+    count, _, period = value.partition("/")
+    seconds = _PERIODS.get(period.strip()[:1].lower())
+    if seconds is None or float(count) <= 0:
+        raise ValueError(f"Invalid rate {value!r}; expected '<requests>/<s|m|h>'.")
+    return Rate(capacity=float(count), per_second=float(count) / seconds)
+
+
+class RateLimiter:
+    """Token buckets keyed by (scope, identity), local to the process or in a shared cache."""
+
+    def __init__(self, limits: Mapping[str, str], cache_alias: str = "", max_keys: int = 100_000):
+        self.rates: Dict[str, Rate] = {scope: rate for scope, value in limits.items() if (rate := parse_rate(value))}
+        self.cache_alias = cache_alias
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[Tuple[str, str], Tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, scope: str, identity: str, cost: float = 1.0) -> float:
+        """
+        Take ``cost`` tokens from the bucket; return 0 when allowed, otherwise
+        the seconds until enough tokens will be available.
+        """
+        rate = self.rates.get(scope)
+        if rate is None:
+            return 0.0
+        now = time.time()
+        if self.cache_alias:
+            cache = caches[self.cache_alias]
+            key = f"ratelimit:{scope}:{identity}"
+            tokens, wait = self._take(rate, cache.get(key), now, cost)
+            cache.set(key, (tokens, now), timeout=int(rate.capacity / rate.per_second) + 1)
+        else:
+            with self._lock:
+                tokens, wait = self._take(rate, self._buckets.get((scope, identity)), now, cost)
+                self._buckets[(scope, identity)] = (tokens, now)
+                self._buckets.move_to_end((scope, identity))
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+        if wait:
+            THROTTLED.inc(scope=scope)
+        return wait
+
+    async def ahit(self, scope: str, identity: str, cost: float = 1.0) -> float:
+        """:meth:`hit` for the event loop; only a shared cache needs a worker thread."""
+        if self.cache_alias and scope in self.rates:
+            return await asyncio.to_thread(self.hit, scope, identity, cost)
+        return self.hit(scope, identity, cost)
+
+    @staticmethod
+    def _take(rate: Rate, state: Optional[Tuple[float, float]], now: float, cost: float) -> Tuple[float, float]:
+        tokens = rate.capacity
+        if state is not None:
+            tokens = min(rate.capacity, state[0] + (now - state[1]) * rate.per_second)
+        if tokens >= cost:
+            return tokens - cost, 0.0
+        return tokens, (cost - tokens) / rate.per_second
+
+
+def client_ident(scope: Mapping) -> str:
+    """
+    The client address of an ASGI connection, resolved like DRF's
+    ``BaseThrottle.get_ident`` so sockets and views share one identity:
+    with NUM_PROXIES set, the address that many hops back in
+    X-Forwarded-For; without it, the whole header, or the peer address.
+    """
+    headers = dict(scope.get("headers") or [])
+    xff = headers.get(b"x-forwarded-for", b"").decode("latin-1") or None
+    remote_addr = str((scope.get("client") or ("unknown",))[0])
+    num_proxies = api_settings.NUM_PROXIES
+    if num_proxies is not None:
+        if num_proxies == 0 or xff is None:
+            return remote_addr
+        addrs = xff.split(",")
+        return addrs[-min(num_proxies, len(addrs))].strip()
+    return "".join(xff.split()) if xff else remote_addr
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_limiter() -> RateLimiter:
+    """The process-wide limiter built from RATE_LIMITS and RATE_LIMIT_CACHE_ALIAS."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(
+            getattr(settings, "RATE_LIMITS", {}), getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "")
+        )
+    return _limiter
+
+
+def _reset(*, setting, **kwargs) -> None:
+    global _limiter
+    if setting in ("RATE_LIMITS", "RATE_LIMIT_CACHE_ALIAS"):
+        _limiter = None
+
+
+setting_changed.connect(_reset)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the shared RateLimiter.
+
+    The view's ``throttle_scope`` names the limit; requests are keyed by user
+    id, or by client address for anonymous requests. DRF answers refusals with
+    429 and a Retry-After header.
+    """
+
+    def allow_request(self, request, view) -> bool:
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return True
+        user = getattr(request, "user", None)
+        identity = str(user.id) if user is not None and user.is_authenticated else self.get_ident(request)
+        self.retry_after = get_limiter().hit(scope, identity)
+        return not self.retry_after
+
+    def wait(self) -> Optional[float]:
+        return getattr(self, "retry_after", None)
@@ -0,0 +1,123 @@
+"""Production ASGI server: uvicorn workers with graceful drain of chat sockets."""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+import uvicorn
+
+from . import lifecycle
+
+logger = logging.getLogger(__name__)
+
+APP = "config.asgi:application"
+
+# Workers are spawned (not forked) and receive the shared listening socket
+# by pickling, which needs connection pickling enabled.
+multiprocessing.allow_connection_pickling()
+_spawn = multiprocessing.get_context("spawn")
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains open chat sockets before closing connections."""
+
+    async def shutdown(self, sockets=None):
+        # Stop accepting first, then give in-flight chat turns a chance to
+        # finish before uvicorn force-closes the remaining connections. Both
+        # phases share one budget: uvicorn only gets what the drain left.
+        for server in self.servers:
+            server.close()
+        for sock in sockets or []:
+            sock.close()
+        budget = self.config.timeout_graceful_shutdown
+        started = time.monotonic()
+        await lifecycle.drain(budget)
+        if budget is not None:
+            self.config.timeout_graceful_shutdown = max(0.0, budget - (time.monotonic() - started))
+        await super().shutdown(sockets=sockets)
+
+
+def _run_worker(config: uvicorn.Config, sockets) -> None:
+    """Entry point of a spawned worker process."""
+    # Logging is not inherited by spawned processes.
+    config.configure_logging()
+    try:
+        DrainingServer(config).run(sockets=sockets)
+    except KeyboardInterrupt:
+        # The supervisor is stopping us; the traceback adds nothing.
+        pass
+
+
+def build_config(
+    *,
+    host: str,
+    port: int,
+    workers: int,
+    keep_alive: int,
+    drain_timeout: int,
+    log_level: str,
+) -> uvicorn.Config:
+    """
+    Build the uvicorn configuration.
+
+    ``loop="auto"`` and ``http="auto"`` pick uvloop and httptools when they
+    are installed and fall back to asyncio and h11 otherwise.
+    ``drain_timeout`` bounds the whole shutdown: chat sockets drain first and
+    uvicorn's graceful shutdown gets whatever is left.
+    """
+    return uvicorn.Config(
+        APP,
+        host=host,
+        port=port,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        ws="auto",
+        lifespan="on",
+        timeout_keep_alive=keep_alive,
+        timeout_graceful_shutdown=drain_timeout,
+        proxy_headers=True,
+        log_level=log_level,
+    )
+
+
+def serve(config: uvicorn.Config) -> None:
+    """
+    Run the server, supervising ``config.workers`` processes when above one.
+
+    Workers share one listening socket. SIGTERM/SIGINT are forwarded to
+    every worker, each of which drains its sockets and runs the lifespan
+    shutdown; workers that die unexpectedly are replaced.
+    """
+    if config.workers <= 1:
+        DrainingServer(config).run()
+        return
+
+    sock = config.bind_socket()
+    stop = threading.Event()
+
+    def spawn():
+        process = _spawn.Process(target=_run_worker, args=(config, [sock]))
+        process.start()
+        return process
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    processes = [spawn() for _ in range(config.workers)]
+    logger.info("Started %d workers", len(processes))
+    while not stop.wait(1):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning("Worker %s exited with %s; restarting", process.pid, process.exitcode)
+                processes[index] = spawn()
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+    sock.close()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.authentication import UserJWTAuthentication
+from accounts.models import User
+
+from . import deadline, lifecycle, metrics
+from .mongo_monitoring import COMMAND_SECONDS, CommandTimer, command_shape
+from .ratelimit import THROTTLED, RateLimiter, client_ident
+from .server import DrainingServer, build_config
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram("test_seconds", "Test.", ["stage", "outcome"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="a", outcome="ok")
+        histogram.observe(0.5, stage="a", outcome="ok")
+
+        lines = histogram.render()
+
+        self.assertIn('test_seconds_bucket{stage="a",outcome="ok",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="a",outcome="ok",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="a",outcome="ok",le="+Inf"} 2', lines)
+        self.assertIn('test_seconds_count{stage="a",outcome="ok"} 2', lines)
+
+    def test_span_records_error_outcome(self):
+        histogram = metrics.Histogram("test_span_seconds", "Test.", ["outcome"])
+        with self.assertRaises(RuntimeError), metrics.timed(histogram):
+            raise RuntimeError
+
+        self.assertEqual(histogram.count(outcome="error"), 1)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_requires_token(self):
+        metrics.counter("test_events_total", "Test.").inc()
+
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"test_events_total 1", response.content)
+
+
+class MongoMonitoringTests(SimpleTestCase):
+    def test_command_shape_hides_values(self):
+        shape = command_shape("update", {"update": "messages", "updates": [{"q": {"_id": 1, "n": {"$gt": 2}}}]})
+
+        self.assertEqual(shape, {"filter": {"_id": "?", "n": {"$gt": "?"}}})
+
+    def test_slow_command_is_timed_and_logged(self):
+        timer = CommandTimer(slow_ms=10)
+        command = {"find": "slow_test", "filter": {"chat_id": "secret"}}
+        timer.started(SimpleNamespace(request_id=1, connection_id=("h", 1), command_name="find", command=command))
+
+        with self.assertLogs("config.mongo_monitoring", "WARNING") as logs:
+            timer.succeeded(SimpleNamespace(
+                request_id=1, connection_id=("h", 1), command_name="find",
+                database_name="db", duration_micros=25_000,
+            ))
+
+        self.assertEqual(COMMAND_SECONDS.count(command="find", collection="slow_test", outcome="ok"), 1)
+        self.assertIn('{"filter": {"chat_id": "?"}}', logs.output[0])
+        self.assertNotIn("secret", logs.output[0])
+
+
+class RateLimitTests(TestCase):
+    def test_bucket_allows_a_burst_then_refills(self):
+        limiter = RateLimiter({"test.scope": "2/s"})
+
+        with mock.patch("config.ratelimit.time.time", return_value=100.0):
+            self.assertEqual([limiter.hit("test.scope", "u1") for _ in range(3)], [0.0, 0.0, 0.5])
+            self.assertEqual(limiter.hit("test.scope", "u2"), 0.0)
+            self.assertEqual(limiter.hit("other.scope", "u1"), 0.0)
+        with mock.patch("config.ratelimit.time.time", return_value=100.5):
+            self.assertEqual(limiter.hit("test.scope", "u1"), 0.0)
+        self.assertEqual(THROTTLED.value(scope="test.scope"), 1)
+
+    def test_invalid_rate_is_rejected(self):
+        with self.assertRaises(ValueError):
+            RateLimiter({"test.scope": "10/fortnight"})
+
+    @override_settings(RATE_LIMITS={"forms.update": "1/m"})
+    def test_throttled_view_answers_429(self):
+        user = User.objects.create(email="throttle@example.com")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {UserJWTAuthentication.create_access_token(user_id=str(user.id))}")
+        url = f"/forms/{uuid.uuid4()}/update/"
+
+        self.assertEqual(client.put(url).status_code, 404)
+        response = client.put(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_nested_budget_never_extends_the_outer_one(self):
+        self.assertIsNone(deadline.remaining())
+        with deadline.budget(1):
+            with deadline.budget(60):
+                self.assertLessEqual(deadline.remaining(), 1)
+            deadline.check()
+        self.assertIsNone(deadline.remaining())
+
+    def test_spent_budget_raises(self):
+        with deadline.budget(0.001):
+            time.sleep(0.005)
+            with self.assertRaises(deadline.DeadlineExceeded):
+                deadline.check()
+            with self.assertRaises(deadline.DeadlineExceeded):
+                with deadline.budget(1):
+                    pass
+
+
+class DrainingServerTests(SimpleTestCase):
+    async def test_uvicorn_only_gets_what_the_drain_left(self):
+        config = build_config(host="127.0.0.1", port=0, workers=1, keep_alive=5, drain_timeout=1, log_level="error")
+        server = DrainingServer(config)
+        server.servers = []
+        budgets = []
+
+        async def slow_drain(timeout):
+            budgets.append(timeout)
+            await asyncio.sleep(0.2)
+
+        async def uvicorn_shutdown(self, sockets=None):
+            budgets.append(self.config.timeout_graceful_shutdown)
+
+        with mock.patch.object(lifecycle, "drain", slow_drain), \
+                mock.patch("uvicorn.Server.shutdown", uvicorn_shutdown):
+            await server.shutdown()
+
+        self.assertEqual(budgets[0], 1)
+        self.assertGreater(budgets[1], 0.5)
+        self.assertLessEqual(budgets[1], 0.8)
+
+
+class ClientIdentTests(SimpleTestCase):
+    scope = {"client": ("10.0.0.2", 5000), "headers": [(b"x-forwarded-for", b"203.0.113.7, 10.0.0.1")]}
+
+    def test_without_num_proxies_the_whole_header_is_the_key(self):
+        self.assertEqual(client_ident(self.scope), "203.0.113.7,10.0.0.1")
+        self.assertEqual(client_ident({"client": ("10.0.0.2", 5000)}), "10.0.0.2")
+
+    @override_settings(REST_FRAMEWORK={"NUM_PROXIES": 2})
+    def test_num_proxies_picks_the_client_hop(self):
+        self.assertEqual(client_ident(self.scope), "203.0.113.7")
+
+    @override_settings(REST_FRAMEWORK={"NUM_PROXIES": 0})
+    def test_zero_proxies_trusts_only_the_peer(self):
+        self.assertEqual(client_ident(self.scope), "10.0.0.2")
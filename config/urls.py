@@ -17,8 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('accounts.urls')),
     path('forms/', include('forms.urls')),
+    path('chats/', include('chat.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,22 @@
+"""Operational endpoints served by the project itself."""
+
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@require_GET
+def metrics_view(request):
+    """Expose this worker's metrics in the Prometheus text format."""
+    if not metrics.ENABLED:
+        raise Http404
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,11 +1,23 @@
 from django.contrib import admin
 
+from config.pagination import EstimatedCountPaginator
+
 from .models import Form
 
 @admin.register(Form)
 class FormAdmin(admin.ModelAdmin):
-    """Admin configuration for browsing and searching saved forms."""
+    """
+    Admin configuration for browsing and searching saved forms.
+
+    Searches run on the trigram indexes of title and user email; ids match
+    exactly on the primary key. The paginator and show_full_result_count
+    avoid a COUNT(*) of the whole table on each page.
+    """
     list_display = ("id", "user", "title", "pdf_bucket_url", "created_at", "updated_at")
-    search_fields = ("id", "title", "pdf_bucket_url", "user__email")
+    list_select_related = ("user",)
+    search_fields = ("id__exact", "title", "user__email")
     list_filter = ("created_at",)
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ("user",)
@@ -2,4 +2,6 @@ from django.conf import settings
 
 DEFAULT_GCP_BUCKET = getattr(settings, "GCP_BUCKET_NAME", "")
 DEFAULT_GCP_CREDENTIALS_JSON = getattr(settings, "GCP_CREDENTIALS_JSON", None)
-DEFAULT_GCP_PROJECT_ID = getattr(settings, "GCP_PROJECT_ID", None)
\ No newline at end of file
+DEFAULT_GCP_PROJECT_ID = getattr(settings, "GCP_PROJECT_ID", None)
+DEFAULT_BULK_MAX_FILES = getattr(settings, "FORMS_BULK_MAX_FILES", 20)
+DEFAULT_BULK_UPLOAD_WORKERS = getattr(settings, "FORMS_BULK_UPLOAD_WORKERS", 8)
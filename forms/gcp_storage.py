@@ -3,13 +3,21 @@ from __future__ import annotations
 """Utilities for uploading and downloading PDF files in GCP Cloud Storage."""
 
 from dataclasses import dataclass
+from functools import lru_cache
 from io import BytesIO
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from google.cloud import storage
+from config import metrics
 
 from .configs import *
 
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+OPERATION_SECONDS = metrics.histogram(
+    "gcp_storage_operation_seconds", "Latency of GCP Storage calls.", ["operation", "outcome"]
+)
+
 @dataclass(frozen=True)
 class GCPStorageConfig:
     """Configuration for connecting to a GCP Storage bucket."""
@@ -24,6 +32,8 @@ def get_storage_client(config: Optional[GCPStorageConfig] = None) -> storage.Cli
     Uses explicit service-account JSON if provided; otherwise relies on
     Application Default Credentials (ADC) in the runtime environment.
     This function does not validate bucket access; it only creates a client.
+    Clients are cached per configuration so their HTTP session and
+    credentials are reused across calls.
     """
     if config is None:
         config = GCPStorageConfig(
@@ -32,6 +42,15 @@ def get_storage_client(config: Optional[GCPStorageConfig] = None) -> storage.Cli
             project_id=DEFAULT_GCP_PROJECT_ID,
         )
 
+    return _cached_storage_client(config)
+
+
+@lru_cache(maxsize=None)
+def _cached_storage_client(config: GCPStorageConfig) -> storage.Client:
+    # Imported here: the Google SDK costs tens of milliseconds at boot and
+    # only storage-backed requests need it.
+    from google.cloud import storage
+
     if config.credentials_json:
         return storage.Client.from_service_account_json(
             config.credentials_json,
@@ -80,7 +99,8 @@ def upload_pdf(
     """
     bucket = get_bucket(config)
     blob = bucket.blob(destination_path)
-    blob.upload_from_string(file_bytes, content_type=content_type)
+    with metrics.timed(OPERATION_SECONDS, operation="upload"):
+        blob.upload_from_string(file_bytes, content_type=content_type)
     return blob.public_url
 
 
@@ -90,16 +110,20 @@ def upload_pdf_fileobj(
     destination_path: str,
     content_type: str = "application/pdf",
     config: Optional[GCPStorageConfig] = None,
+    bucket: Optional[storage.Bucket] = None,
 ) -> str:
     """
     Upload a PDF from a file-like object and return the public URL.
 
     Use this for streaming uploads (e.g., from Django file uploads).
     The file object must be opened in binary mode.
+    Pass an already resolved bucket to reuse one client across many uploads.
     """
-    bucket = get_bucket(config)
+    if bucket is None:
+        bucket = get_bucket(config)
     blob = bucket.blob(destination_path)
-    blob.upload_from_file(file_obj, content_type=content_type)
+    with metrics.timed(OPERATION_SECONDS, operation="upload"):
+        blob.upload_from_file(file_obj, content_type=content_type)
     return blob.public_url
 
 
@@ -116,7 +140,8 @@ def download_pdf(
     """
     bucket = get_bucket(config)
     blob = bucket.blob(source_path)
-    return blob.download_as_bytes()
+    with metrics.timed(OPERATION_SECONDS, operation="download"):
+        return blob.download_as_bytes()
 
 
 def download_pdf_to_fileobj(
@@ -133,6 +158,55 @@ def download_pdf_to_fileobj(
     """
     bucket = get_bucket(config)
     blob = bucket.blob(source_path)
-    blob.download_to_file(file_obj)
+    with metrics.timed(OPERATION_SECONDS, operation="download"):
+        blob.download_to_file(file_obj)
     file_obj.seek(0)
     return file_obj
+
+
+def delete_objects(
+    *,
+    paths: list[str],
+    config: Optional[GCPStorageConfig] = None,
+    bucket: Optional[storage.Bucket] = None,
+) -> None:
+    """
+    Delete the named objects through one batched HTTP request.
+
+    Use this to roll back uploads whose database rows could not be written.
+    Pass an already resolved bucket to reuse the client that uploaded them.
+    """
+    if not paths:
+        return
+    if bucket is None:
+        bucket = get_bucket(config)
+    with metrics.timed(OPERATION_SECONDS, operation="delete_batch"), bucket.client.batch():
+        for path in paths:
+            bucket.blob(path).delete()
+
+
+def delete_prefix(
+    *,
+    prefix: str,
+    batch_size: int = 100,
+    config: Optional[GCPStorageConfig] = None,
+) -> int:
+    """
+    Delete every object under a prefix and return how many were removed.
+
+    Objects are listed a page at a time and deleted through one batched
+    HTTP request per page. Re-running after a failure simply picks up
+    whatever is still listed, so the call is idempotent.
+    """
+    bucket = get_bucket(config)
+    deleted = 0
+    while True:
+        with metrics.timed(OPERATION_SECONDS, operation="list"):
+            blobs = list(bucket.list_blobs(prefix=prefix, max_results=batch_size))
+        if not blobs:
+            break
+        with metrics.timed(OPERATION_SECONDS, operation="delete_batch"), bucket.client.batch():
+            for blob in blobs:
+                blob.delete()
+        deleted += len(blobs)
+    return deleted
@@ -0,0 +1,216 @@
+"""
+Load test for the forms list endpoint, optionally comparing pooled and unpooled databases.
+
+The command creates bench users and forms in the default database, so it
+refuses to run unless that database's name marks it as a bench or test
+database, or --allow-any-database is given. --cleanup deletes the bench
+users and their forms afterwards.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from accounts.authentication import UserJWTAuthentication
+from accounts.models import User
+from config.bench import is_scratch_database, summarize
+from forms.models import Form
+from forms.serializers import FormListQuerySerializer
+
+BENCH_EMAIL = "bench-forms@example.com"
+BACKGROUND_EMAIL = "bench-forms-background@example.com"
+# LTB form names, so title searches see realistic, overlapping words.
+BENCH_TITLES = ("N4 Notice to End your Tenancy", "L1 Application to Evict", "T2 Application about Tenant Rights",
+                "N12 Notice for Landlord's Own Use", "T6 Maintenance Application", "L2 Application to End a Tenancy")
+
+
+class Command(BaseCommand):
+    help = (
+        "Hit GET /forms/ from concurrent threads and report throughput and latency. "
+        "Use --compare with DB_ENGINE=postgresql to run pooled and unpooled setups side by side, "
+        "and --explain with --background to check the search and date filters use indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Total requests to send.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client threads.")
+        parser.add_argument("--seed", type=int, default=200, help="Forms to create for the bench user.")
+        parser.add_argument(
+            "--background", type=int, default=0,
+            help="Forms to create for another user, so the bench user's rows are a slice of a large table.",
+        )
+        parser.add_argument("--q", default="", help="Title search sent as ?q=.")
+        parser.add_argument("--days", type=int, default=0, help="Send ?created_after= this many days back.")
+        parser.add_argument(
+            "--explain", action="store_true",
+            help="Print the query plans of the list, search and date-range queries instead of load testing.",
+        )
+        parser.add_argument("--compare", action="store_true", help="Run with DB_POOL=1 and DB_POOL=0 in subprocesses.")
+        parser.add_argument(
+            "--allow-any-database", action="store_true",
+            help="Seed the default database even though its name does not contain 'bench' or 'test'.",
+        )
+        parser.add_argument("--cleanup", action="store_true", help="Delete the bench users and their forms afterwards.")
+        parser.add_argument("--json", action="store_true", help="Print a single JSON result.")
+
+    def handle(self, *args, **options):
+        self._check_database(options)
+        if options["compare"]:
+            return self._compare(options)
+        try:
+            self._run(options)
+        finally:
+            if options["cleanup"]:
+                self._cleanup()
+
+    @staticmethod
+    def _check_database(options):
+        name = str(connections["default"].settings_dict.get("NAME", ""))
+        if options["allow_any_database"] or is_scratch_database(name):
+            return
+        raise CommandError(
+            f"Refusing to seed bench data into {name!r}: use a database named for benchmarks or tests, "
+            "or pass --allow-any-database."
+        )
+
+    @staticmethod
+    def _cleanup():
+        """Delete the bench users; their forms go with them."""
+        deleted, _ = User.objects.filter(email__in=[BENCH_EMAIL, BACKGROUND_EMAIL]).delete()
+        return deleted
+
+    def _run(self, options):
+        user = self._seed(BENCH_EMAIL, options["seed"])
+        if options["background"]:
+            self._seed(BACKGROUND_EMAIL, options["background"])
+        if options["explain"]:
+            return self._explain(user, options)
+        token = UserJWTAuthentication.create_access_token(user_id=str(user.id))
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}", "HTTP_HOST": "localhost"}
+        url = f"/forms/?{urlencode(self._params(options))}"
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        per_thread = options["requests"] // options["concurrency"]
+
+        def worker():
+            client = Client()
+            local, failed = [], 0
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                response = client.get(url, **headers)
+                local.append(time.perf_counter() - started)
+                failed += response.status_code != 200
+            connections.close_all()
+            with lock:
+                latencies.extend(local)
+                errors.append(failed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        database = settings.DATABASES["default"]
+        result = {
+            "engine": database["ENGINE"],
+            "pooled": bool(database.get("OPTIONS", {}).get("pool")),
+            "conn_max_age": database.get("CONN_MAX_AGE", 0),
+            "concurrency": options["concurrency"],
+            "requests_per_sec": round(len(latencies) / elapsed, 1),
+            "errors": sum(errors),
+            **summarize(latencies),
+        }
+        self.stdout.write(json.dumps(result) if options["json"] else json.dumps(result, indent=2))
+
+    def _seed(self, email: str, count: int) -> User:
+        """Create a bench user and top its forms up to ``count`` rows, spread over the last year."""
+        user = User.objects.by_email(email).first() or User.objects.create(email=email)
+        missing = count - Form.objects.filter(user=user).count()
+        now = timezone.now()
+        forms = [
+            Form(
+                user=user,
+                title=f"{BENCH_TITLES[i % len(BENCH_TITLES)]} #{i}",
+                pdf_bucket_url=f"https://example.com/{i}.pdf",
+            )
+            for i in range(max(0, missing))
+        ]
+        Form.objects.bulk_create(forms, batch_size=5000)
+        # auto_now_add ignores assigned values; spread the rows out afterwards.
+        for i, form in enumerate(forms):
+            form.created_at = now - timedelta(minutes=i * 7)
+        Form.objects.bulk_update(forms, ["created_at"], batch_size=5000)
+        if forms and connections["default"].vendor == "postgresql":
+            with connections["default"].cursor() as cursor:
+                cursor.execute("ANALYZE forms")
+        return user
+
+    @staticmethod
+    def _params(options):
+        params = {}
+        if options["q"]:
+            params["q"] = options["q"]
+        if options["days"]:
+            params["created_after"] = (timezone.now() - timedelta(days=options["days"])).isoformat()
+        return params
+
+    def _explain(self, user: User, options):
+        """Show which indexes the list endpoint's queries use, as JSON."""
+        shapes = {
+            "list": {},
+            "search": {"q": options["q"] or "evict"},
+            "date_range": {"created_after": (timezone.now() - timedelta(days=options["days"] or 7)).isoformat()},
+        }
+        plans = {}
+        for name, params in shapes.items():
+            serializer = FormListQuerySerializer(data=params)
+            serializer.is_valid(raise_exception=True)
+            queryset = Form.objects.filter(user=user).order_by("-created_at").filter_list(serializer.validated_data)
+            plan = queryset[:10].explain()
+            plans[name] = {
+                "uses_index": any(marker in plan for marker in ("Index Scan", "Index Only Scan", "Bitmap Index Scan", "USING INDEX", "USING COVERING INDEX")),
+                "plan": plan.splitlines(),
+            }
+        self.stdout.write(json.dumps({"engine": settings.DATABASES["default"]["ENGINE"], **plans}, indent=2))
+
+    def _compare(self, options):
+        """Re-run this command in fresh processes with pooling on and off."""
+        results = {}
+        runs = (("pooled", {"DB_POOL": "1"}), ("unpooled", {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"}))
+        for index, (label, env) in enumerate(runs):
+            flags = ["--allow-any-database"] if options["allow_any_database"] else []
+            if options["cleanup"] and index == len(runs) - 1:
+                flags.append("--cleanup")
+            output = subprocess.run(
+                [
+                    sys.executable, "manage.py", "bench_forms_list", "--json",
+                    "--requests", str(options["requests"]),
+                    "--concurrency", str(options["concurrency"]),
+                    "--seed", str(options["seed"]),
+                    "--background", str(options["background"]),
+                    "--q", options["q"],
+                    "--days", str(options["days"]),
+                    *flags,
+                ],
+                env={**os.environ, **env},
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[label] = json.loads(output.strip().splitlines()[-1])
+        self.stdout.write(json.dumps(results, indent=2))
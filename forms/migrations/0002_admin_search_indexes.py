@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 15:57
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+from config.migration_operations import PortableAddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built CONCURRENTLY on PostgreSQL, outside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('forms', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PortableAddIndexConcurrently(
+            model_name='form',
+            index=models.Index(fields=['-created_at', '-id'], name='forms_created_at_id_idx'),
+        ),
+        PortableAddIndexConcurrently(
+            model_name='form',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('title', models.TextField())), name='gin_trgm_ops'), name='forms_title_trgm'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-19 16:01
+
+from django.db import migrations, models
+
+from config.migration_operations import PortableAddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The index is built CONCURRENTLY on PostgreSQL, outside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('forms', '0002_admin_search_indexes'),
+    ]
+
+    operations = [
+        PortableAddIndexConcurrently(
+            model_name='form',
+            index=models.Index(fields=['user', '-created_at'], name='forms_user_created_at_idx'),
+        ),
+    ]
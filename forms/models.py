@@ -1,18 +1,84 @@
 import uuid
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.functions import Cast, Upper
 from accounts.models import User
 
+
+TITLE_MAX_LENGTH = 255
+
+
+def form_title(name: str) -> str:
+    """A title derived from a filename, cut to fit Form.title."""
+    return (name or "")[:TITLE_MAX_LENGTH]
+
+
+def title_ci():
+    """UPPER(title::text): what PostgreSQL evaluates for title__icontains, and what forms_title_trgm indexes."""
+    return Upper(Cast("title", models.TextField()))
+
+
+class FormQuerySet(models.QuerySet):
+    """Query helpers for forms.Form."""
+
+    def search(self, query: str):
+        """
+        Fuzzy title search through the forms_title_trgm index.
+
+        On PostgreSQL a title matches when ``query`` is similar to a word in it
+        (pg_trgm word similarity, so typos still match) or contains it, and
+        results are ordered by that similarity, newest first among equals.
+        Other databases fall back to a case-insensitive substring match and
+        keep the existing ordering.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(title__icontains=query)
+        return (
+            self.alias(title_ci=title_ci())
+            .filter(Q(title_ci__trigram_word_similar=query.upper()) | Q(title__icontains=query))
+            .annotate(similarity=TrigramWordSimilarity(query.upper(), title_ci()))
+            .order_by("-similarity", "-created_at")
+        )
+
+    def filter_list(self, params):
+        """
+        Apply validated FormListQuerySerializer data: ``created_after`` is
+        inclusive, ``created_before`` exclusive, and ``q`` goes through
+        :meth:`search`.
+        """
+        queryset = self
+        if "created_after" in params:
+            queryset = queryset.filter(created_at__gte=params["created_after"])
+        if "created_before" in params:
+            queryset = queryset.filter(created_at__lt=params["created_before"])
+        if query := params.get("q", "").strip():
+            queryset = queryset.search(query)
+        return queryset
+
+
 class Form(models.Model):
     """Metadata for a saved PDF form stored in GCP for a specific user."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=TITLE_MAX_LENGTH)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="forms")
     pdf_bucket_url = models.URLField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = FormQuerySet.as_manager()
+
     class Meta:
         db_table = "forms"
+        indexes = [
+            # Admin change list order (-created_at, then -pk).
+            models.Index(fields=["-created_at", "-id"], name="forms_created_at_id_idx"),
+            # A user's forms, newest first, and their date-range filters.
+            models.Index(fields=["user", "-created_at"], name="forms_user_created_at_idx"),
+            # Trigram index for title__icontains and FormQuerySet.search.
+            GinIndex(OpClass(title_ci(), name="gin_trgm_ops"), name="forms_title_trgm"),
+        ]
 
     def __str__(self) -> str:
         """Readable identifier for admin screens and logs."""
@@ -9,3 +9,10 @@ class FormSerializer(serializers.ModelSerializer):
         model = Form
         fields = ("id", "user", "title", "pdf_bucket_url", "created_at", "updated_at")
         read_only_fields = ("id", "created_at", "updated_at")
+
+
+class FormListQuerySerializer(serializers.Serializer):
+    """Validate the search and date-range query parameters of the forms list."""
+    q = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    created_after = serializers.DateTimeField(required=False, input_formats=["iso-8601", "%Y-%m-%d"])
+    created_before = serializers.DateTimeField(required=False, input_formats=["iso-8601", "%Y-%m-%d"])
@@ -1,3 +1,166 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.authentication import UserJWTAuthentication
+from accounts.models import User
+
+from .configs import DEFAULT_BULK_MAX_FILES
+from .models import Form
+
+
+def pdf(name):
+    return SimpleUploadedFile(name, b"%PDF-1.4", content_type="application/pdf")
+
+
+def fake_upload(*, file_obj, destination_path, bucket=None):
+    if file_obj.name.startswith("broken"):
+        raise OSError("upload failed")
+    return f"https://storage/{destination_path}"
+
+
+@override_settings(RATE_LIMITS={})
+@mock.patch("forms.views.get_bucket")
+@mock.patch("forms.views.upload_pdf_fileobj", side_effect=fake_upload)
+class BulkSaveFormTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="bulk@example.com")
+        token = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def post(self, files, **data):
+        return self.client.post("/forms/bulk/", {"files": files, **data}, format="multipart")
+
+    def test_all_saved_is_201(self, upload, _bucket):
+        response = self.post([pdf("a.pdf"), pdf("b.pdf")], titles=["Lease"])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(upload.call_count, 2)
+        self.assertEqual(sorted(Form.objects.values_list("title", flat=True)), ["Lease", "b.pdf"])
+        self.assertEqual([r["form"]["title"] for r in response.data["results"]], ["Lease", "b.pdf"])
+
+    def test_partial_failure_is_207(self, upload, _bucket):
+        with self.assertLogs("forms.views", "ERROR"):
+            response = self.post([pdf("a.pdf"), pdf("broken.pdf")])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["results"][1], {"index": 1, "filename": "broken.pdf", "error": "upload_failed"})
+        self.assertEqual(Form.objects.count(), 1)
+
+    def test_every_upload_failing_is_502(self, upload, _bucket):
+        with self.assertLogs("forms.views", "ERROR"):
+            response = self.post([pdf("broken-1.pdf"), pdf("broken-2.pdf")])
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertFalse(Form.objects.exists())
+
+    def test_too_many_files_is_400(self, upload, _bucket):
+        response = self.post([pdf(f"{i}.pdf") for i in range(DEFAULT_BULK_MAX_FILES + 1)])
+
+        self.assertEqual(response.status_code, 400)
+        upload.assert_not_called()
+
+    def test_missing_files_is_400(self, upload, _bucket):
+        response = self.client.post("/forms/bulk/", {}, format="multipart")
+
+        self.assertEqual(response.status_code, 400)
+        upload.assert_not_called()
+
+    def test_long_filename_is_cut_to_fit_the_title(self, upload, _bucket):
+        response = self.post([pdf("x" * 300 + ".pdf")])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(Form.objects.get().title), 255)
+
+    def test_overlong_title_is_400_before_uploading(self, upload, _bucket):
+        response = self.post([pdf("a.pdf"), pdf("b.pdf")], titles=["Lease", "x" * 256])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["indexes"], [1])
+        upload.assert_not_called()
+        self.assertFalse(Form.objects.exists())
+
+    @mock.patch("forms.views.delete_objects")
+    def test_failed_insert_deletes_the_uploads(self, delete_objects, upload, _bucket):
+        with mock.patch("forms.views.Form.objects.bulk_create", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError), self.assertLogs("forms.views", "ERROR"):
+                self.post([pdf("a.pdf"), pdf("broken.pdf"), pdf("c.pdf")])
+
+        uploaded = {c.kwargs["destination_path"] for c in upload.call_args_list if c.kwargs["file_obj"].name != "broken.pdf"}
+        delete_objects.assert_called_once()
+        self.assertEqual(set(delete_objects.call_args.kwargs["paths"]), uploaded)
+        self.assertEqual(len(uploaded), 2)
+
+
+class FormListFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="lister@example.com")
+        token = UserJWTAuthentication.create_access_token(user_id=str(self.user.id))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        for title, created_at in (
+            ("Lease agreement", "2026-03-01T09:00:00Z"),
+            ("Deposit receipt", "2026-03-02T00:00:00Z"),
+            ("Sublease addendum", "2026-03-03T12:00:00Z"),
+        ):
+            form = Form.objects.create(user=self.user, title=title, pdf_bucket_url=f"https://storage/{title}")
+            Form.objects.filter(pk=form.pk).update(created_at=created_at)
+        other = User.objects.create(email="other@example.com")
+        Form.objects.create(user=other, title="Lease of someone else", pdf_bucket_url="https://storage/other")
+
+    def titles(self, **params):
+        response = self.client.get("/forms/", params)
+        self.assertEqual(response.status_code, 200)
+        return [form["title"] for form in response.data["results"]]
+
+    def test_unfiltered_is_newest_first(self):
+        self.assertEqual(self.titles(), ["Sublease addendum", "Deposit receipt", "Lease agreement"])
+
+    def test_q_matches_titles_case_insensitively(self):
+        # SQLite has no pg_trgm, so the search falls back to icontains.
+        self.assertEqual(self.titles(q="LEASE"), ["Sublease addendum", "Lease agreement"])
+        self.assertEqual(self.titles(q="  "), ["Sublease addendum", "Deposit receipt", "Lease agreement"])
+
+    def test_created_after_is_inclusive(self):
+        self.assertEqual(self.titles(created_after="2026-03-02"), ["Sublease addendum", "Deposit receipt"])
+
+    def test_created_before_is_exclusive(self):
+        self.assertEqual(self.titles(created_before="2026-03-02T00:00:00Z"), ["Lease agreement"])
+        self.assertEqual(
+            self.titles(created_after="2026-03-01", created_before="2026-03-03", q="receipt"), ["Deposit receipt"]
+        )
+
+    def test_bad_date_is_400(self):
+        response = self.client.get("/forms/", {"created_after": "last tuesday"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("created_after", response.data)
+
+
+class BenchFormsListTests(TestCase):
+    def test_refuses_a_database_not_named_for_benchmarks(self):
+        with mock.patch.dict(connection.settings_dict, {"NAME": "mylittlelawyer"}):
+            with self.assertRaises(CommandError):
+                call_command("bench_forms_list", "--explain", "--seed", "3", stdout=StringIO())
+
+        self.assertFalse(User.objects.exists())
+
+    def test_cleanup_removes_the_seeded_rows(self):
+        out = StringIO()
+        with mock.patch.dict(connection.settings_dict, {"NAME": "mylittlelawyer"}):
+            call_command(
+                "bench_forms_list", "--explain", "--seed", "3", "--background", "2",
+                "--allow-any-database", "--cleanup", stdout=out,
+            )
+
+        self.assertIn("search", json.loads(out.getvalue()))
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Form.objects.exists())
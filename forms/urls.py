@@ -1,9 +1,10 @@
 from django.urls import path
 
-from .views import SaveFormView, UpdateFormView, UserFormsListView
+from .views import BulkSaveFormView, SaveFormView, UpdateFormView, UserFormsListView
 
 urlpatterns = [
     path("", UserFormsListView.as_view(), name="user-forms-list"),
     path("save/", SaveFormView.as_view(), name="forms-save"),
+    path("bulk/", BulkSaveFormView.as_view(), name="forms-bulk-save"),
     path("<uuid:form_id>/update/", UpdateFormView.as_view(), name="forms-update"),
 ]
@@ -1,4 +1,6 @@
+import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from rest_framework import status
 from rest_framework.generics import ListAPIView
@@ -6,11 +8,15 @@ from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from accounts.authentication import UserJWTAuthentication
-from .models import Form
-from .serializers import FormSerializer
-from .gcp_storage import upload_pdf_fileobj
+from config.ratelimit import TokenBucketThrottle
+from .models import TITLE_MAX_LENGTH, Form, form_title
+from .serializers import FormListQuerySerializer, FormSerializer
+from .configs import DEFAULT_BULK_MAX_FILES, DEFAULT_BULK_UPLOAD_WORKERS
+from .gcp_storage import delete_objects, get_bucket, upload_pdf_fileobj
 from .paginations import FormsPagination
 
+logger = logging.getLogger(__name__)
+
 class UserFormsListView(ListAPIView):
     """Return a paginated list of forms belonging to the authenticated user."""
     authentication_classes = [UserJWTAuthentication]
@@ -18,13 +24,23 @@ class UserFormsListView(ListAPIView):
     pagination_class = FormsPagination
 
     def get_queryset(self):
-        """Limit results to the current user, newest first."""
-        return Form.objects.filter(user=self.request.user).order_by("-created_at")
+        """
+        Limit results to the current user, newest first.
+
+        ``created_after`` (inclusive) and ``created_before`` (exclusive) take
+        a date or datetime; ``q`` searches titles, best match first.
+        """
+        params = FormListQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return Form.objects.filter(user=self.request.user).order_by("-created_at").filter_list(params.validated_data)
+
 
 class SaveFormView(APIView):
     """Upload a PDF to GCP and create the corresponding Form record."""
     authentication_classes = [UserJWTAuthentication]
     parser_classes = [MultiPartParser, FormParser]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "forms.save"
 
     def post(self, request):
         """Handle multipart upload and persist the GCP URL on success."""
@@ -52,10 +68,98 @@ class SaveFormView(APIView):
         )
 
 
+class BulkSaveFormView(APIView):
+    """Upload many PDFs concurrently and create their Form records in one insert."""
+    authentication_classes = [UserJWTAuthentication]
+    parser_classes = [MultiPartParser, FormParser]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "forms.bulk"
+
+    def post(self, request):
+        """
+        Handle a multipart upload with repeated ``files`` (and optional ``titles``).
+
+        Uploads run on a bounded thread pool sharing one bucket handle; every
+        successful upload is inserted with a single ``bulk_create``. Failures
+        are reported per item, so the response is 201 when everything was
+        saved, 207 when some items failed and 502 when none could be stored.
+        If the insert itself fails, the uploaded objects are deleted again.
+        """
+        files = request.FILES.getlist("files")
+        if not files:
+            return Response(
+                {"detail": "files is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > DEFAULT_BULK_MAX_FILES:
+            return Response(
+                {"detail": f"At most {DEFAULT_BULK_MAX_FILES} files per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        titles = request.data.getlist("titles")
+        # Checked before uploading: one overlong title would fail the whole insert.
+        too_long = [index for index, title in enumerate(titles) if len(title) > TITLE_MAX_LENGTH]
+        if too_long:
+            return Response(
+                {"detail": f"Titles must be at most {TITLE_MAX_LENGTH} characters.", "indexes": too_long},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bucket = get_bucket()
+        object_names = [f"forms/{request.user.id}/{uuid.uuid4()}.pdf" for _ in files]
+
+        def upload(file_obj, object_name):
+            return upload_pdf_fileobj(file_obj=file_obj, destination_path=object_name, bucket=bucket)
+
+        workers = min(DEFAULT_BULK_UPLOAD_WORKERS, len(files))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(upload, file_obj, name) for file_obj, name in zip(files, object_names)]
+
+        results = []
+        forms = []
+        uploaded = []
+        for index, (file_obj, object_name, future) in enumerate(zip(files, object_names, futures)):
+            try:
+                pdf_url = future.result()
+            except Exception:
+                logger.exception("Bulk upload failed: filename=%s", file_obj.name)
+                results.append({"index": index, "filename": file_obj.name, "error": "upload_failed"})
+                continue
+            uploaded.append(object_name)
+            title = titles[index] if index < len(titles) else form_title(file_obj.name)
+            form = Form(user=request.user, title=title, pdf_bucket_url=pdf_url)
+            forms.append(form)
+            results.append({"index": index, "filename": file_obj.name, "form": form})
+
+        if not forms:
+            return Response({"results": results}, status=status.HTTP_502_BAD_GATEWAY)
+
+        try:
+            Form.objects.bulk_create(forms)
+        except Exception:
+            try:
+                delete_objects(paths=uploaded, bucket=bucket)
+            except Exception:
+                logger.exception("Bulk upload cleanup failed: objects=%s", uploaded)
+            raise
+
+        for result in results:
+            if "form" in result:
+                result["form"] = FormSerializer(result["form"]).data
+
+        return Response(
+            {"results": results},
+            status=status.HTTP_201_CREATED if len(forms) == len(files) else status.HTTP_207_MULTI_STATUS
+        )
+
+
 class UpdateFormView(APIView):
     """Replace the stored PDF and/or update metadata for a user's form."""
     authentication_classes = [UserJWTAuthentication]
     parser_classes = [MultiPartParser, FormParser]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "forms.update"
 
     def put(self, request, form_id):
         """Upload a new PDF and/or update title for the selected form."""